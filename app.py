@@ -1,15 +1,41 @@
 import os
+import base64
 import random
 import requests
 import subprocess
 import re
+import json
 import logging
 import datetime
+import hashlib
+import hmac
 import time
+import threading
 import traceback
-from collections import defaultdict
-from flask import Flask, render_template, request, session, jsonify, redirect, url_for, Response
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, render_template, request, session, jsonify, redirect, url_for, Response, send_from_directory
+from flask.json.tag import JSONTag
 from dotenv import load_dotenv
+from session_store import create_session_interface, register_binary_type
+from backend_clients import OLLAMA_CLIENT, ALLTALK_CLIENT, get_pool_stats
+from health_monitor import CircuitBreaker, HealthMonitor
+from ollama_pool import OllamaPool
+from prompt_builder import build_prompt, estimate_tokens
+from text_engine import TextEngine
+from tts_jobs import TTSJobQueue
+from tts_cache import AudioCache, cache_key
+from registry import Registry
+from llm_scheduler import LLMScheduler, SchedulerBusy
+from opening_pool import OpeningPool
+from redo_spares import SpareReplies
+from journal import AdventureJournal
+from world_state import WorldState
+from log_pipeline import configure_logging, tail_lines, follow
+from metrics import Metrics, THROUGHPUT_BUCKETS
+from trace_recorder import TraceRecorder
+from request_profiler import RequestProfiler
 
 # Load environment variables
 load_dotenv()
@@ -17,18 +43,163 @@ load_dotenv()
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'fallback_secret_key_12345')
 
-# Configure logging
-log_filename = f"rpg_adventure_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-logging.basicConfig(
-    filename=log_filename,
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+# Configure logging: request threads hand records to a queue, one thread writes the rotated file
+log_filename = os.getenv('LOG_FILE') or f"rpg_adventure_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+LOG_HANDLER = configure_logging(
+    log_filename,
+    level=os.getenv('LOG_LEVEL', 'DEBUG').upper(),
+    third_party_level=os.getenv('LOG_LEVEL_THIRD_PARTY', 'WARNING').upper(),
+    max_bytes=int(os.getenv('LOG_MAX_MB', 10)) * 1024 * 1024,
+    backups=int(os.getenv('LOG_BACKUPS', 5)),
+    queue_size=int(os.getenv('LOG_QUEUE_SIZE', 10000))
 )
+LOG_TAIL_LINES = 200
+MAX_LOG_TAIL_LINES = 5000
+# A followed /logs stream holds a worker thread and ends after this long; EventSource clients reconnect on their own
+LOG_FOLLOW_SECONDS = float(os.getenv('LOG_FOLLOW_SECONDS', 60))
+# At most this many /logs followers at once (0 disables following)
+LOG_MAX_FOLLOWERS = int(os.getenv('LOG_MAX_FOLLOWERS', 2))
+LOG_FOLLOWERS = threading.BoundedSemaphore(LOG_MAX_FOLLOWERS) if LOG_MAX_FOLLOWERS > 0 else None
 
-OLLAMA_API_URL = "http://localhost:11434/api/generate"
-OLLAMA_HEALTH_URL = "http://localhost:11434/api/tags"
+# Keep conversation and world state server-side; the cookie only carries a session id
+session_interface = create_session_interface()
+if session_interface is not None:
+    app.session_interface = session_interface
+
+# The world state is kept in its compact binary form by every session backend
+class TagWorldState(JSONTag):
+    """Cookie session tag for WorldState"""
+    __slots__ = ()
+    key = " ws"
+
+    def check(self, value):
+        return isinstance(value, WorldState)
+
+    def to_json(self, value):
+        return base64.b64encode(value.to_bytes()).decode("ascii")
+
+    def to_python(self, value):
+        return WorldState.from_bytes(base64.b64decode(value))
+
+register_binary_type("world", WorldState)
+if session_interface is None:
+    app.session_interface.serializer.register(TagWorldState, index=0)
+
+# Continue from Ollama's returned KV context instead of resending the history.
+# The context is large, so it is only kept with a server-side session store.
+KV_CONTEXT_REUSE = os.getenv('KV_CONTEXT_REUSE', 'true').lower() == 'true' and session_interface is not None
+
+# Fields of a finished Ollama generation kept for callers that ask for them
+GENERATION_META_FIELDS = ("context", "prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration")
+
+# Comma-separated Ollama servers; generations are routed across all of them
+OLLAMA_URLS = [url.strip() for url in os.getenv('OLLAMA_URLS', 'http://localhost:11434').split(',') if url.strip()]
 ALLTALK_API_URL = os.getenv('TTS_API_URL', 'http://localhost:7851/api/tts-generate')
 TTS_AUDIO_BASE_URL = os.getenv('TTS_AUDIO_URL', 'http://localhost:7851/outputs')
+# Voice list and health probe live on the same AllTalk server as the TTS API
+ALLTALK_BASE_URL = ALLTALK_API_URL.split('/api/', 1)[0]
+
+# Circuit breakers skip calls to a backend that is known to be down
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 3))
+BREAKER_RESET_TIMEOUT = float(os.getenv('BREAKER_RESET_TIMEOUT', 30))
+OLLAMA_POOL = OllamaPool(OLLAMA_URLS, BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+TTS_BREAKER = CircuitBreaker("tts", BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+HEALTH_CHECK_INTERVAL = float(os.getenv('HEALTH_CHECK_INTERVAL', 10))
+
+# Latency of each stage of a turn and Ollama's own counters, served on /metrics
+METRICS = Metrics()
+# Stages that don't depend on a model are labelled with an empty one
+STAGE_SECONDS = METRICS.histogram("rpg_stage_seconds", "Wall time of each stage of a turn", ("stage", "model"))
+OLLAMA_REQUEST_SECONDS = METRICS.histogram("rpg_ollama_request_seconds", "Wall time of successful Ollama generations", ("model",))
+OLLAMA_ERRORS = METRICS.counter("rpg_ollama_errors_total", "Failed Ollama generation attempts", ("model",))
+OLLAMA_PROMPT_TOKENS = METRICS.counter("rpg_ollama_prompt_tokens_total", "Prompt tokens evaluated by Ollama", ("model",))
+OLLAMA_PROMPT_EVAL_SECONDS = METRICS.counter("rpg_ollama_prompt_eval_seconds_total", "Time Ollama spent evaluating prompts", ("model",))
+OLLAMA_EVAL_TOKENS = METRICS.counter("rpg_ollama_eval_tokens_total", "Tokens generated by Ollama", ("model",))
+OLLAMA_EVAL_SECONDS = METRICS.counter("rpg_ollama_eval_seconds_total", "Time Ollama spent generating tokens", ("model",))
+OLLAMA_EVAL_RATE = METRICS.histogram("rpg_ollama_eval_tokens_per_second", "Generation speed reported by Ollama", ("model",), THROUGHPUT_BUCKETS)
+
+# Admission control for generations: a global cap, one per session, round-robin across sessions
+LLM_SCHEDULER = LLMScheduler(
+    max_concurrent=int(os.getenv('LLM_MAX_CONCURRENT', 2)),
+    max_queue=int(os.getenv('LLM_MAX_QUEUE', 32)),
+    max_per_session=int(os.getenv('LLM_MAX_PER_SESSION', 2)),
+    queue_timeout=float(os.getenv('LLM_QUEUE_TIMEOUT', 60))
+)
+
+# Synthesize narration audio in the background so replies don't wait on AllTalk
+TTS_ASYNC = os.getenv('TTS_ASYNC', 'true').lower() == 'true'
+TTS_JOBS = TTSJobQueue(
+    workers=int(os.getenv('TTS_WORKERS', 2)),
+    parallel=int(os.getenv('TTS_PLAYLIST_PARALLEL', 2))
+)
+# Narration is spoken in sentence chunks of at least this many characters
+TTS_MIN_CHUNK_CHARS = int(os.getenv('TTS_MIN_CHUNK_CHARS', 40))
+DEFAULT_TTS_VOICE = 'FemaleBritishAccent_WhyLucyWhy_Voice_2.wav'
+# Synthesized clips are kept locally by content hash; TTS_CACHE_MAX_MB=0 disables the cache
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', 'tts_cache')
+TTS_CACHE_MAX_MB = int(os.getenv('TTS_CACHE_MAX_MB', 256))
+TTS_CACHE = AudioCache(TTS_CACHE_DIR, TTS_CACHE_MAX_MB * 1024 * 1024) if TTS_CACHE_MAX_MB > 0 else None
+# POST /tts/prewarm needs this token in X-Prewarm-Token; unset, only TTS_PREWARM can start a run
+TTS_PREWARM_TOKEN = os.getenv('TTS_PREWARM_TOKEN')
+TTS_PREWARM_LOCK = threading.Lock()
+CACHE_KEY_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# Openings generated ahead of time per model, genre, role and censored mode (and voice,
+# when their audio is rendered too); off unless OPENING_POOL_SIZE is set
+OPENING_POOL_SIZE = int(os.getenv('OPENING_POOL_SIZE', 0))
+OPENING_POOL_TTS = os.getenv('OPENING_POOL_TTS', 'true').lower() == 'true'
+OPENING_POOL_KEY = "opening-pool"  # scheduler key shared by all background openings
+DEFAULT_CHARACTER_NAME = "Alex"
+
+# Per-adventure save files: one small record per turn, a full snapshot every JOURNAL_SNAPSHOT_EVERY records
+JOURNAL_DIR = os.getenv('JOURNAL_DIR', 'journals')
+JOURNAL_SNAPSHOT_EVERY = int(os.getenv('JOURNAL_SNAPSHOT_EVERY', 50))
+JOURNAL_COMPRESS = os.getenv('JOURNAL_COMPRESS', 'true').lower() == 'true'
+JOURNAL = AdventureJournal(JOURNAL_DIR, JOURNAL_SNAPSHOT_EVERY, JOURNAL_COMPRESS)
+JOURNAL_FIELDS = ("conversation", "last_ai_reply", "character_name", "selected_genre", "role", "censored", "ollama_model")
+MAX_SAVES_LISTED = 20
+
+# Opt-in capture of player input for benchmarks.replay; set TRACE_DIR to record, one file per run
+TRACE_DIR = os.getenv('TRACE_DIR')
+TRACE_RECORDER = TraceRecorder(os.path.join(
+    TRACE_DIR, f"trace_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.trace.gz"
+)) if TRACE_DIR else None
+TRACED_ROUTES = {"/model-selection", "/change-model", "/set-voice", "/setup", "/setup/stream", "/command", "/command/stream"}
+# Client-side bookkeeping that would be stale on replay
+UNTRACED_FIELDS = {"world_version", "turn_id"}
+
+# On-demand profiling of single commands, for whoever holds PROFILE_TOKEN; unset, nothing is profiled
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN')
+PROFILER = RequestProfiler(
+    os.getenv('PROFILE_DIR', 'profiles'),
+    max_profiles=int(os.getenv('PROFILE_MAX_FILES', 20)),
+    interval=float(os.getenv('PROFILE_INTERVAL_MS', 5)) / 1000
+) if PROFILE_TOKEN else None
+
+# Rendered world state text per (session, world version), so a turn renders it once
+WORLD_STATE_CACHE = OrderedDict()
+WORLD_STATE_CACHE_LOCK = threading.Lock()
+WORLD_STATE_CACHE_SIZE = 2000
+
+# Alternative replies generated in the background after each turn, so /redo can answer at once
+REDO_SPARES = int(os.getenv('REDO_SPARES', 0))
+REDO_SPARE_WORKERS = int(os.getenv('REDO_SPARE_WORKERS', 4))
+REDO_SPARE_STORE = SpareReplies()
+SPARE_EXECUTOR = ThreadPoolExecutor(max_workers=REDO_SPARE_WORKERS, thread_name_prefix="redo-spare") if REDO_SPARES > 0 else None
+
+# Context window per model ("model=tokens,..." overrides the default); prompts
+# are trimmed to fit, leaving room for the reply
+MODEL_CONTEXT_TOKENS = int(os.getenv('MODEL_CONTEXT_TOKENS', 4096))
+MODEL_CONTEXT_OVERRIDES = {
+    name.strip(): int(tokens)
+    for name, _, tokens in (
+        item.partition('=') for item in os.getenv('MODEL_CONTEXT_OVERRIDES', '').split(',') if '=' in item
+    )
+}
+RESPONSE_TOKEN_RESERVE = int(os.getenv('RESPONSE_TOKEN_RESERVE', 512))
+PROMPT_PINNED_TURNS = int(os.getenv('PROMPT_PINNED_TURNS', 4))
+# Share of the budget freed each time old turns are dropped; larger means rarer prompt cache misses
+PROMPT_TRIM_FRACTION = float(os.getenv('PROMPT_TRIM_FRACTION', 0.25))
 
 # Enhanced DM system prompt with player freedom
 DM_SYSTEM_PROMPT = """
@@ -60,11 +231,23 @@ Craft IMMEDIATE and PERMANENT consequences for every action. Follow these rules:
    - Environments change permanently based on actions
    - Player choices open/close future narrative paths
    - Resources are gained/lost permanently
+"""
 
+# Per-turn world state. It changes almost every turn, so prompts place it after
+# the conversation history to keep everything before it byte-stable for the
+# backend's prompt-prefix cache.
+WORLD_STATE_PROMPT = """
 Current World State:
 {player_choices}
 """
 
+# Known English voices, used when none can be discovered
+FALLBACK_VOICES = [
+    "British Female (FemaleBritishAccent_WhyLucyWhy_Voice_2.wav)",
+    "American Female (FemaleAmericanAccent_WhyLucyWhy_Voice_1.wav)",
+    "American Male (MaleAmericanAccent_WhyLucyWhy_Voice_1.wav)"
+]
+
 def get_available_voices():
     """Scan available TTS voices with better detection"""
     voices = []
@@ -72,7 +255,7 @@ def get_available_voices():
     
     # 1. Check API endpoint first
     try:
-        response = requests.get("http://localhost:7851/api/get-voices", timeout=3)
+        response = ALLTALK_CLIENT.get(f"{ALLTALK_BASE_URL}/api/get-voices", timeout=3)
         if response.status_code == 200:
             voice_data = response.json()
             # Format: "Voice Name (filename.extension)"
@@ -118,13 +301,8 @@ def get_available_voices():
             logging.warning(f"Error scanning {voice_dir}: {str(e)}")
     
     # 3. Fallback to known English voices
-    fallback_voices = [
-        "British Female (FemaleBritishAccent_WhyLucyWhy_Voice_2.wav)",
-        "American Female (FemaleAmericanAccent_WhyLucyWhy_Voice_1.wav)",
-        "American Male (MaleAmericanAccent_WhyLucyWhy_Voice_1.wav)"
-    ]
     logging.info("Using fallback voices")
-    return fallback_voices
+    return list(FALLBACK_VOICES)
 
 # Initialize session data
 def init_session():
@@ -133,49 +311,28 @@ def init_session():
         session['censored'] = False
         session['conversation'] = ""
         session['last_ai_reply'] = ""
-        session['character_name'] = "Alex"
+        session['character_name'] = DEFAULT_CHARACTER_NAME
         session['selected_genre'] = ""
         session['role'] = ""
         session['adventure_started'] = False
         session['theme'] = "fantasy"  # Default theme
-        session['player_choices'] = {
-            "allies": [],
-            "enemies": [],
-            "discoveries": [],
-            "reputation": 0,
-            "resources": {},
-            "factions": defaultdict(int),
-            "completed_quests": [],
-            "active_quests": [],
-            "world_events": [],
-            "consequences": [],
-            "player_creations": []  # Track player-created entities
-        }
-        session['installed_models'] = get_installed_models()
-        
-        # Set default model if available
-        if session['installed_models']:
-            session['ollama_model'] = session['installed_models'][0]
-        else:
-            session['ollama_model'] = "llama3:instruct"
+        session['world'] = WorldState()
+        # Set default model if available; the lists themselves are shared, not per session
+        installed_models = MODEL_REGISTRY.get()
+        session['ollama_model'] = installed_models[0] if installed_models else "llama3:instruct"
             
         session['tts_enabled'] = True
         
-        # Get available voices and set the default
-        session['available_voices'] = get_available_voices()
-        session['tts_voice'] = session['available_voices'][0] if session['available_voices'] else ""
+        # Set the default voice
+        available_voices = VOICE_REGISTRY.get()
+        session['tts_voice'] = available_voices[0] if available_voices else ""
         
         logging.info("Session initialized successfully")
     except Exception as e:
         logging.error(f"Error initializing session: {str(e)}")
         # Set fallback values
-        session['available_voices'] = [
-            "British Female (FemaleBritishAccent_WhyLucyWhy_Voice_2.wav)",
-            "American Female (FemaleAmericanAccent_WhyLucyWhy_Voice_1.wav)"
-        ]
-        session['tts_voice'] = session['available_voices'][0]
+        session['tts_voice'] = FALLBACK_VOICES[0]
         session['ollama_model'] = "llama3:instruct"  # Fallback model
-        session['installed_models'] = ["llama3:instruct"]
 
 # Function to load banned words from file
 def load_banwords():
@@ -191,17 +348,63 @@ def load_banwords():
         logging.error(f"Error loading banwords: {e}")
     return banwords
 
+# Prompt questions removed from the end of AI replies
+QUESTION_PHRASES = [
+    "what will you do", "how do you respond", "what do you do",
+    "what is your next move", "what would you like to do",
+    "what would you like to say", "how will you proceed"
+]
+QUESTION_PATTERN = re.compile(
+    r'(' + '|'.join(re.escape(phrase) for phrase in QUESTION_PHRASES) + r')[.?]?$', 
+    re.IGNORECASE
+)
+TRAILING_PUNCTUATION = re.compile(r'[,.]+$')
+
+# Sentence ends: terminal punctuation, optional closing quotes/brackets, then space
+SENTENCE_BOUNDARY = re.compile(r'[.!?]+["\')\]]*(?:\s+|$)')
+# Text up to the last sentence end that is already followed by whitespace
+COMPLETE_SENTENCES = re.compile(r'.*[.!?]["\')\]]*\s', re.DOTALL)
+
+# Player input openings that mark a narrative command
+NARRATIVE_TRIGGERS = [
+    "i bend the story to",
+    "i reshape reality so that",
+    "suddenly,",
+    "miraculously,",
+    "unexpectedly,",
+    "against all odds,",
+    "i wish that",
+    "let there be",
+    "reality shifts so that",
+    "i create",
+    "i manifest"
+]
+
+# Phrases in AI replies that signal a world event of each category
+KEY_PHRASES = {
+    "ally": ["joins you", "helps you", "becomes your ally", "supports you", "swears loyalty"],
+    "enemy": ["attacks you", "becomes hostile", "swears revenge", "hunts you", "betrays you"],
+    "resource": ["find", "acquire", "obtain", "gain", "create", "invent"],
+    "location": ["enter", "arrive at", "reach", "discover", "create", "build"],
+    "faction": ["guards", "thieves guild", "rebel alliance", "royal court", "new faction"],
+    "reality": ["reality shifts", "world changes", "fabric bends", "laws of physics alter"]
+}
+
+def reload_banwords():
+    """Reload banwords.txt and rebuild the compiled text matcher"""
+    global BANWORDS, TEXT_ENGINE
+    BANWORDS = load_banwords()
+    TEXT_ENGINE = TextEngine(BANWORDS, KEY_PHRASES, NARRATIVE_TRIGGERS)
+
 # Load banned words at startup
-BANWORDS = load_banwords()
+reload_banwords()
 
 # Function to retrieve installed Ollama models via CLI
 def get_installed_models():
     try:
-        # First try API method
-        response = requests.get(OLLAMA_HEALTH_URL, timeout=5)
-        if response.status_code == 200:
-            models = [model['model'] for model in response.json().get('models', []) 
-                     if 'model' in model]
+        # First try API method: the merged /api/tags of every backend
+        if OLLAMA_POOL.refresh(OLLAMA_CLIENT)['status'] == 'up':
+            models = OLLAMA_POOL.models()
             logging.info(f"Found {len(models)} models via API")
             return models
     except Exception as e:
@@ -240,6 +443,18 @@ def get_installed_models():
         logging.error(f"Error getting installed models: {e}")
         return ["llama3:instruct", "mistral", "phi3"]
 
+# Installed models and voices are discovered once per process and refreshed in the
+# background every REGISTRY_TTL seconds, instead of on every new visitor
+REGISTRY_TTL = float(os.getenv('REGISTRY_TTL', 300))
+def on_models_changed(models):
+    """Pooled openings may come from a model that was removed or replaced"""
+    if OPENING_POOL is not None:
+        logging.info(f"Model list changed ({len(models)} models); dropping pooled openings")
+        OPENING_POOL.invalidate()
+
+MODEL_REGISTRY = Registry("models", get_installed_models, ttl=REGISTRY_TTL, fallback=["llama3:instruct"], on_change=on_models_changed)
+VOICE_REGISTRY = Registry("voices", get_available_voices, ttl=REGISTRY_TTL, fallback=FALLBACK_VOICES)
+
 # Role-specific starting scenarios
 ROLE_STARTERS = {
     "Fantasy": {
@@ -355,113 +570,182 @@ def get_role_starter(genre, role):
     except:
         return f"As {role}, you begin your adventure when"
 
-def get_full_system_prompt(character_name, role, genre, player_choices):
-    """Build the complete system prompt with role context"""
+def get_dm_prompt(character_name, role, genre):
+    """Build the static part of the system prompt: rules, character, genre and role"""
     return DM_SYSTEM_PROMPT.format(
         character_name=character_name,
         role=role,
-        genre=genre,
-        player_choices=get_current_state(player_choices))
+        genre=genre)
+
+def get_world_state_prompt(world_state):
+    """Build the per-turn world state block from rendered world state text"""
+    return WORLD_STATE_PROMPT.format(player_choices=world_state)
+
+@STAGE_SECONDS.time("system_prompt", "")
+def get_full_system_prompt(character_name, role, genre, world_state):
+    """Build the complete system prompt with role context"""
+    return get_dm_prompt(character_name, role, genre) + get_world_state_prompt(world_state)
     
 
-def get_current_state(player_choices):
+def get_context_tokens(model):
+    """Context window size used for a model"""
+    return MODEL_CONTEXT_OVERRIDES.get(model, MODEL_CONTEXT_TOKENS)
+
+@STAGE_SECONDS.time("prompt", labels_from=lambda model, *args, **kwargs: (model or "",))
+def compose_prompt(model, character_name, role, genre, world_state, conversation, tail, cut=0):
+    """Build a prompt that fits the model's token budget; returns (prompt, usage).
+    
+    Layout: static DM prompt, conversation history from turn `cut` on,
+    world state (as rendered by get_current_state), then the tail. Only the
+    last two change between consecutive turns, until the history outgrows
+    the budget and usage["cut"] moves forward.
+    """
+    system_prompt = get_dm_prompt(character_name, role, genre)
+    state = get_world_state_prompt(world_state).strip()
+    budget = get_context_tokens(model) - RESPONSE_TOKEN_RESERVE
+    # The overhead covers the instruction line build_generation_payload appends
+    return build_prompt(system_prompt, conversation, tail, budget, PROMPT_PINNED_TURNS, overhead=32, state=state,
+                        cut=cut, trim_fraction=PROMPT_TRIM_FRACTION)
+
+def assemble_prompt(conversation, tail):
+    """Build a prompt for the current session (see compose_prompt)"""
+    prompt, usage = compose_prompt(
+        session.get('ollama_model'),
+        session['character_name'],
+        session['role'],
+        session['selected_genre'],
+        render_world_state(),
+        conversation,
+        tail,
+        cut=session.get('history_cut', 0)
+    )
+    # Turns before the cut stay dropped, so later prompts keep the same prefix
+    session['history_cut'] = usage['cut']
+    session['prompt_usage'] = usage
+    logging.debug(f"Prompt token usage: {usage}")
+    return prompt
+
+def get_world():
+    """The session's WorldState, converted from an older session's player_choices dict if needed"""
+    world = session.get('world')
+    if world is None:
+        world = WorldState.from_dict(session.pop('player_choices', None) or {})
+        session['world'] = world
+    return world
+
+def bump_world_version():
+    """Mark the session's world state as changed; call after every change to it"""
+    session['world_version'] = session.get('world_version', 0) + 1
+
+def render_world_state():
+    """get_current_state for the session's world, rendered once per world version"""
+    key = (get_session_id(), session.get('world_version', 0))
+    with WORLD_STATE_CACHE_LOCK:
+        text = WORLD_STATE_CACHE.get(key)
+        if text is not None:
+            WORLD_STATE_CACHE.move_to_end(key)
+            return text
+    text = get_current_state(get_world())
+    with WORLD_STATE_CACHE_LOCK:
+        WORLD_STATE_CACHE[key] = text
+        while len(WORLD_STATE_CACHE) > WORLD_STATE_CACHE_SIZE:
+            WORLD_STATE_CACHE.popitem(last=False)
+    return text
+
+def world_state_fields():
+    """World state fields of a turn response; the text is left out if the client has this version"""
+    version = session.get('world_version', 0)
+    if request.form.get('world_version') == str(version):
+        return {"world_version": version}
+    return {"world_version": version, "world_state": render_world_state()}
+
+def get_current_state(world):
     """Generate a string representation of the current world state"""
     try:
-        state = [
-            f"### Current World State ###",
-            f"Allies: {', '.join(player_choices['allies']) if player_choices['allies'] else 'None'}",
-            f"Enemies: {', '.join(player_choices['enemies']) if player_choices['enemies'] else 'None'}",
-            f"Reputation: {player_choices['reputation']}",
-            f"Active Quests: {', '.join(player_choices['active_quests']) if player_choices['active_quests'] else 'None'}",
-            f"Completed Quests: {', '.join(player_choices['completed_quests']) if player_choices['completed_quests'] else 'None'}",
-        ]
-        
-        # Add resources if any exist
-        if player_choices['resources']:
-            state.append("Resources:")
-            for resource, amount in player_choices['resources'].items():
-                state.append(f"  - {resource}: {amount}")
-        
-        # Add faction relationships if any exist
-        if player_choices['factions']:
-            state.append("Faction Relationships:")
-            for faction, level in player_choices['factions'].items():
-                state.append(f"  - {faction}: {'+' if level > 0 else ''}{level}")
-        
-        # Add recent world events
-        if player_choices['world_events']:
-            state.append("Recent World Events:")
-            for event in player_choices['world_events'][-3:]:
-                state.append(f"  - {event}")
-        
-        # Add recent consequences
-        if player_choices['consequences']:
-            state.append("Recent Consequences:")
-            for cons in player_choices['consequences'][-3:]:
-                state.append(f"  - {cons}")
-        
-        # Add player creations
-        if player_choices['player_creations']:
-            state.append("Player Creations:")
-            for creation in player_choices['player_creations'][-3:]:
-                state.append(f"  - {creation}")
-        
-        return "\n".join(state)
+        return world.render()
     except Exception as e:
         logging.error(f"Error in get_current_state: {str(e)}")
         return "World state unavailable"
 
-def get_ai_response(prompt, model, censored=False, max_retries=3):
-    """Get response from Ollama with retry mechanism"""
-    if not model:
-        return "No AI model selected. Please choose a model first."
+def build_generation_payload(prompt, model, censored=False, stream=False, context=None, options=None):
+    """Build the /api/generate request body shared by blocking and streaming calls.
     
-    # Check Ollama health first
-    try:
-        health_resp = requests.get(OLLAMA_HEALTH_URL, timeout=5)
-        if health_resp.status_code != 200:
-            return "Ollama is not running. Please start Ollama service."
-    except:
-        return "Ollama is not running. Please start Ollama service."
+    `options` overrides sampling options such as temperature or seed.
+    """
+    # A continued context already carries the instruction line from its first prompt
+    if context is None:
+        # Add player freedom emphasis
+        if not censored:
+            prompt += "\n[IMPORTANT: Players can attempt ANY action. Always accept player actions as valid starting points.]"
+        
+        if censored:
+            prompt += "\n[IMPORTANT: Content must be strictly family-friendly. Avoid any NSFW themes, violence, or mature content.]"
     
-    # Add player freedom emphasis
-    if not censored:
-        prompt += "\n[IMPORTANT: Players can attempt ANY action. Always accept player actions as valid starting points.]"
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": stream,
+        "options": {
+            "temperature": 0.8,
+            "stop": ["\n\n"],
+            "num_ctx": get_context_tokens(model),
+            "min_p": 0.05,
+            "top_k": 40,
+            "presence_penalty": 0.5,
+            "frequency_penalty": 0.5
+        }
+    }
+    if options:
+        payload["options"].update(options)
+    if context is not None:
+        payload["context"] = context
+    return payload
+
+@STAGE_SECONDS.time("generation", labels_from=lambda prompt, model, *args, **kwargs: (model or "",))
+def get_ai_response(prompt, model, censored=False, max_retries=3, context=None, meta=None, session_id=None, options=None):
+    """Get response from Ollama with retry mechanism.
     
-    if censored:
-        prompt += "\n[IMPORTANT: Content must be strictly family-friendly. Avoid any NSFW themes, violence, or mature content.]"
+    Pass a previously returned `context` to continue from it. If `meta` is a
+    dict it receives the returned context and Ollama's timing counters.
+    `session_id` keeps a player's generations on the same backend.
+    """
+    if not model:
+        return "No AI model selected. Please choose a model first."
+    
+    payload = build_generation_payload(prompt, model, censored, context=context, options=options)
     
     for attempt in range(max_retries):
+        # Skip the call entirely while every backend is known to be down
+        backend = OLLAMA_POOL.choose(model, session_id)
+        if backend is None:
+            return "Ollama is not running. Please start Ollama service."
         try:
-            response = requests.post(
-                OLLAMA_API_URL,
-                json={
-                    "model": model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.8,
-                        "stop": ["\n\n"],
-                        "min_p": 0.05,
-                        "top_k": 40,
-                        "presence_penalty": 0.5,
-                        "frequency_penalty": 0.5
-                    }
-                },
-                timeout=60
-            )
+            start = time.perf_counter()
+            with OLLAMA_POOL.lease(backend):
+                response = OLLAMA_CLIENT.post(
+                    backend.api_url,
+                    json=payload,
+                    timeout=60
+                )
+            backend.breaker.record_success()
             response.raise_for_status()
             json_resp = response.json()
             
             # Validate response content
             if not json_resp.get("response", "").strip():
                 raise ValueError("Empty response from AI")
+            
+            if meta is not None:
+                meta.update({field: json_resp.get(field) for field in GENERATION_META_FIELDS})
+            observe_generation(model, json_resp, time.perf_counter() - start)
                 
             return json_resp["response"].strip()
             
         except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
-            logging.error(f"Ollama connection error (attempt {attempt+1}/{max_retries}): {e}")
-            if attempt < max_retries - 1:
+            logging.error(f"Ollama connection error on {backend.url} (attempt {attempt+1}/{max_retries}): {e}")
+            backend.breaker.record_failure()
+            OLLAMA_ERRORS.inc(1, model)
+            if attempt < max_retries - 1 and not OLLAMA_POOL.is_open():
                 time.sleep(2)
                 continue
             return "Ollama connection failed. Check if Ollama is running and accessible."
@@ -469,6 +753,7 @@ def get_ai_response(prompt, model, censored=False, max_retries=3):
         except Exception as e:
             logging.error(f"Unexpected error in get_ai_response: {e}")
             logging.error(traceback.format_exc())
+            OLLAMA_ERRORS.inc(1, model)
             if attempt < max_retries - 1:
                 time.sleep(1)
                 continue
@@ -476,6 +761,57 @@ def get_ai_response(prompt, model, censored=False, max_retries=3):
     
     return "AI failed to respond after multiple attempts."
 
+def stream_ai_response(prompt, model, censored=False, context=None, meta=None, session_id=None):
+    """Yield response tokens from Ollama as they are generated"""
+    backend = OLLAMA_POOL.choose(model, session_id) if model else None
+    if backend is None:
+        return
+    
+    payload = build_generation_payload(prompt, model, censored, stream=True, context=context)
+    start = time.perf_counter()
+    
+    try:
+        # Ollama streams one JSON object per line until "done" is set
+        with OLLAMA_POOL.lease(backend), \
+                OLLAMA_CLIENT.post(backend.api_url, json=payload, stream=True, timeout=60) as response:
+            backend.breaker.record_success()
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                token = chunk.get("response", "")
+                if token:
+                    yield token
+                if chunk.get("done"):
+                    if meta is not None:
+                        meta.update({field: chunk.get(field) for field in GENERATION_META_FIELDS})
+                    elapsed = time.perf_counter() - start
+                    STAGE_SECONDS.observe(elapsed, "generation", model)
+                    observe_generation(model, chunk, elapsed)
+                    break
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+        logging.error(f"Ollama streaming connection error on {backend.url}: {e}")
+        backend.breaker.record_failure()
+        OLLAMA_ERRORS.inc(1, model)
+    except Exception as e:
+        logging.error(f"Ollama streaming error: {e}")
+        OLLAMA_ERRORS.inc(1, model)
+
+def observe_generation(model, result, seconds):
+    """Record a finished generation and the token counts and timings Ollama reported for it"""
+    OLLAMA_REQUEST_SECONDS.observe(seconds, model)
+    # Durations are in nanoseconds; a fully cached prompt has no prompt_eval fields
+    prompt_tokens = result.get("prompt_eval_count") or 0
+    eval_tokens = result.get("eval_count") or 0
+    eval_seconds = (result.get("eval_duration") or 0) / 1e9
+    OLLAMA_PROMPT_TOKENS.inc(prompt_tokens, model)
+    OLLAMA_PROMPT_EVAL_SECONDS.inc((result.get("prompt_eval_duration") or 0) / 1e9, model)
+    OLLAMA_EVAL_TOKENS.inc(eval_tokens, model)
+    OLLAMA_EVAL_SECONDS.inc(eval_seconds, model)
+    if eval_tokens and eval_seconds:
+        OLLAMA_EVAL_RATE.observe(eval_tokens / eval_seconds, model)
+
 def generate_fallback_response(genre, role, character_name):
     """Generate a fallback response when AI fails"""
     starters = {
@@ -512,75 +848,176 @@ def generate_fallback_response(genre, role, character_name):
     
     return random.choice(genre_starter) + action
 
-def speak(text, voice=None):
-    """Generate TTS audio with improved error handling"""
+@STAGE_SECONDS.time("tts", "")
+def speak(text, voice=None, censored=None):
+    """Generate TTS audio with improved error handling.
+    
+    Voice and censored mode default to the session's; pass both when calling
+    outside a request, e.g. from a TTS worker.
+    """
     if not text.strip():
         return None
     
     # Use session voice if not specified
     if not voice:
-        voice = session.get('tts_voice', 'FemaleBritishAccent_WhyLucyWhy_Voice_2.wav')
+        voice = session.get('tts_voice', DEFAULT_TTS_VOICE)
+    if censored is None:
+        censored = session.get('censored')
     
     # Extract filename from formatted voice string
     if '(' in voice and ')' in voice:
         # Extract filename from "Voice Name (filename.ext)"
         voice = re.search(r'\((.*?)\)', voice).group(1)
     
+    text_filtering = "none" if not censored else "moderate"
+    key = cache_key(voice, text_filtering, text)
+    if TTS_CACHE is not None and TTS_CACHE.get(key):
+        return f"/tts/audio/{key}.wav"
+    
+    # Don't wait on AllTalk while it is known to be down
+    if not TTS_BREAKER.allow_request():
+        return None
+    
     try:
-        # Generate unique filename with timestamp
-        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        output_name = f"tts_{timestamp}"
+        # Name the output after its content so concurrent players never overwrite each other
+        output_name = f"tts_{key[:32]}"
         
         payload = {
             "text_input": text,
             "character_voice_gen": voice,
             "output_file_name": output_name,
-            "text_filtering": "none" if not session.get('censored') else "moderate"
+            "text_filtering": text_filtering
         }
         
-        response = requests.post(ALLTALK_API_URL, data=payload, timeout=10)
+        response = ALLTALK_CLIENT.post(ALLTALK_API_URL, data=payload, timeout=10)
+        TTS_BREAKER.record_success()
         response.raise_for_status()
         
         # Verify successful generation
         if response.status_code == 200:
             base = TTS_AUDIO_BASE_URL.rstrip('/')  # Ensure no trailing slash
-            return f"{base}/{output_name}.wav"
+            audio_url = f"{base}/{output_name}.wav"
+            if TTS_CACHE is not None and cache_audio(key, audio_url):
+                return f"/tts/audio/{key}.wav"
+            return audio_url
         else:
             logging.error(f"TTS returned non-200 status: {response.status_code}")
             return None
         
-    except requests.exceptions.ConnectionError:
-        logging.error("AllTalk TTS not running. Audio disabled.")
-        session['tts_enabled'] = False
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+        logging.error(f"AllTalk TTS unreachable: {e}")
+        TTS_BREAKER.record_failure()
         return None
     except Exception as e:
         logging.error(f"TTS error: {e}")
         return None
 
+def cache_audio(key, audio_url):
+    """Copy a clip from AllTalk's output folder into the local TTS cache"""
+    try:
+        response = ALLTALK_CLIENT.get(audio_url, timeout=10)
+        response.raise_for_status()
+        return TTS_CACHE.put(key, response.content)
+    except Exception as e:
+        logging.warning(f"Could not cache TTS audio {audio_url}: {e}")
+        return False
+
+def prewarm_tts_cache(voices=None, censored=False):
+    """Synthesize every role starter in each voice so openings play from the cache.
+    
+    Starters are split the same way replies are, so the opening's first clip
+    is a cache hit. Returns the number of clips now cached.
+    """
+    if TTS_CACHE is None:
+        return 0
+    if voices is None:
+        voices = VOICE_REGISTRY.get()
+    
+    cached = 0
+    for voice in voices:
+        for roles in ROLE_STARTERS.values():
+            for starter in roles.values():
+                for chunk in split_sentences(starter):
+                    if speak(chunk, voice, censored):
+                        cached += 1
+    logging.info(f"TTS cache pre-warmed with {cached} clips")
+    return cached
+
+def start_tts_prewarm():
+    """Run prewarm_tts_cache on a background thread; False when a run is already going"""
+    if not TTS_PREWARM_LOCK.acquire(blocking=False):
+        return False
+    
+    def run():
+        try:
+            prewarm_tts_cache()
+        finally:
+            TTS_PREWARM_LOCK.release()
+    
+    threading.Thread(target=run, name="tts-prewarm", daemon=True).start()
+    return True
+
+def split_sentences(text, min_chars=TTS_MIN_CHUNK_CHARS):
+    """Split narration into sentence chunks of at least min_chars for TTS"""
+    chunks = []
+    current = ""
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        current += text[start:match.end()]
+        start = match.end()
+        if len(current.strip()) >= min_chars:
+            chunks.append(current.strip())
+            current = ""
+    current = (current + text[start:]).strip()
+    if current:
+        if chunks and len(current) < min_chars:
+            chunks[-1] += " " + current
+        else:
+            chunks.append(current)
+    return chunks
+
+def start_tts_playlist():
+    """Open a TTS playlist for the current session, or None if TTS is off"""
+    # Skip the playlist while AllTalk is known to be down
+    if not session.get('tts_enabled', True) or not TTS_ASYNC or TTS_BREAKER.is_open():
+        return None
+    voice = session.get('tts_voice') or DEFAULT_TTS_VOICE
+    return TTS_JOBS.create(speak, voice, bool(session.get('censored')))
+
+def request_tts(text, job_id=None, spoken_words=0):
+    """Queue TTS for a finished reply.
+    
+    Returns (audio_url, job_id): the URL when synthesized inline, or the id of
+    a playlist to poll via /tts/<job_id>. Pass the job_id of a playlist opened
+    while streaming; its first `spoken_words` words are already queued.
+    """
+    if job_id is None:
+        if not session.get('tts_enabled', True):
+            return None, None
+        if not TTS_ASYNC:
+            return speak(text), None
+        job_id = start_tts_playlist()
+        if job_id is None:
+            return None, None
+    
+    remainder = " ".join(text.split()[spoken_words:])
+    for chunk in split_sentences(remainder):
+        TTS_JOBS.add(job_id, chunk)
+    TTS_JOBS.close(job_id)
+    return None, job_id
+
+@STAGE_SECONDS.time("sanitize", "")
 def sanitize_response(response, censored=False):
     """Clean and sanitize AI response"""
     if not response:
         return "The story continues..."
 
     try:
-        # Only remove player prompt questions, not descriptive text
-        question_phrases = [
-            "what will you do", "how do you respond", "what do you do",
-            "what is your next move", "what would you like to do",
-            "what would you like to say", "how will you proceed"
-        ]
-
-        # Create a pattern that matches these phrases only at the end
-        question_pattern = re.compile(
-            r'(' + '|'.join(re.escape(phrase) for phrase in question_phrases) + r')[.?]?$', 
-            re.IGNORECASE
-        )
-        
         # Remove prompt questions only if they appear at the end
-        response = question_pattern.sub('', response).strip()
+        response = QUESTION_PATTERN.sub('', response).strip()
         
         # Remove any remaining trailing punctuation issues
-        response = re.sub(r'[,.]+$', '', response).strip()
+        response = TRAILING_PUNCTUATION.sub('', response).strip()
 
         # Add proper ending punctuation if missing
         if response and response[-1] not in ('.', '!', '?'):
@@ -588,77 +1025,375 @@ def sanitize_response(response, censored=False):
 
         # Censor content if needed
         if censored:
-            for word in BANWORDS:
-                if word:
-                    pattern = re.compile(r'\b' + re.escape(word) + r'\b', re.IGNORECASE)
-                    response = pattern.sub('****', response)
+            response = censor_text(response)
 
         return response
     except Exception as e:
         logging.error(f"Error sanitizing response: {str(e)}")
         return response
 
+def censor_text(text):
+    """Mask banned words in a piece of text"""
+    return TEXT_ENGINE.censor(text)
+
+# Streamed generations waiting for the browser to commit them to the session.
+# The cookie session is written before a streamed body starts, so the final
+# text is parked here and applied by /command/stream/finish.
+PENDING_STREAMS = {}
+PENDING_STREAMS_LOCK = threading.Lock()
+PENDING_STREAM_TTL = 600  # seconds
+
+def register_stream(kind, **context):
+    """Register a new streamed turn and return its id"""
+    turn_id = uuid.uuid4().hex
+    now = time.time()
+    with PENDING_STREAMS_LOCK:
+        # Drop turns whose browser never came back to finish them
+        expired = [key for key, entry in PENDING_STREAMS.items() if now - entry['created'] > PENDING_STREAM_TTL]
+        for key in expired:
+            del PENDING_STREAMS[key]
+        PENDING_STREAMS[turn_id] = dict(context, kind=kind, text="", meta={}, spoken_words=0, done=False, created=now)
+    return turn_id
+
+def claim_stream(turn_id):
+    """Return a finished streamed turn for committing, or None if it isn't done yet.
+    
+    A claimed turn is not handed out again, so a repeated finish call
+    can't commit it twice.
+    """
+    with PENDING_STREAMS_LOCK:
+        entry = PENDING_STREAMS.get(turn_id)
+        if entry is None or not entry['done'] or entry.get('claimed'):
+            return None
+        entry['claimed'] = True
+        return entry
+
+def pop_stream(turn_id):
+    """Remove and return a streamed turn"""
+    with PENDING_STREAMS_LOCK:
+        return PENDING_STREAMS.pop(turn_id, None)
+
+def sse_event(event, data):
+    """Format a server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+class NarrationStream:
+    """Turns a streamed turn's tokens into server-sent events.
+    
+    Shared by stream_turn and the coroutine streams in asgi.py. With a
+    tts_job playlist, each completed sentence is queued for TTS while the
+    rest of the reply is still being generated. The prefix is shown and
+    spoken but kept out of the saved text, so an empty generation still
+    reaches the fallback in /command/stream/finish.
+    """
+    
+    def __init__(self, turn_id, censored, prefix="", tts_job=None):
+        self.turn_id = turn_id
+        self.censored = censored
+        self.tts_job = tts_job
+        self.parts = []
+        self.pending = prefix
+        self.speech = prefix
+        self.spoken_words = 0
+    
+    def start(self):
+        return sse_event("start", {"turn_id": self.turn_id, "tts_job": self.tts_job})
+    
+    def busy(self, error):
+        """The scheduler refused the turn; it will never be finished"""
+        pop_stream(self.turn_id)
+        return sse_event("busy", {"message": str(error), "retry_after": error.retry_after})
+    
+    def feed(self, token):
+        """Take one token; returns the events to send for it"""
+        self.parts.append(token)
+        self.pending += token
+        if self.tts_job:
+            self.speech += token
+            match = COMPLETE_SENTENCES.match(self.speech)
+            # The last sentence waits for /command/stream/finish, after sanitizing
+            if match and len(match.group(0).strip()) >= TTS_MIN_CHUNK_CHARS:
+                sentence, self.speech = match.group(0), self.speech[match.end():]
+                TTS_JOBS.add(self.tts_job, censor_text(sentence) if self.censored else sentence)
+                self.spoken_words += len(sentence.split())
+        if self.censored:
+            # Hold text back until a sentence ends so banned phrases are masked whole
+            match = COMPLETE_SENTENCES.match(self.pending)
+            if not match:
+                return []
+            chunk, self.pending = censor_text(match.group(0)), self.pending[match.end():]
+        else:
+            chunk, self.pending = self.pending, ""
+        return [sse_event("token", {"text": chunk})]
+    
+    def finish(self, meta):
+        """Store the generated text for /command/stream/finish; returns the last events"""
+        events = []
+        if self.pending:
+            events.append(sse_event("token", {"text": censor_text(self.pending) if self.censored else self.pending}))
+        
+        with PENDING_STREAMS_LOCK:
+            entry = PENDING_STREAMS.get(self.turn_id)
+            if entry is not None:
+                entry['text'] = "".join(self.parts).strip()
+                entry['meta'] = meta
+                entry['spoken_words'] = self.spoken_words
+                entry['done'] = True
+        events.append(sse_event("done", {"turn_id": self.turn_id}))
+        return events
+
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
+
+def stream_turn(turn_id, prompt, model, censored, prefix="", context=None, tts_job=None, reply=None):
+    """Stream AI tokens for a registered turn as server-sent events.
+    
+    While the generation waits for a scheduler slot, "queued" events report
+    its queue position. A ready-made reply is sent as-is, without calling
+    the model.
+    """
+    session_id = get_session_id()
+    narration = NarrationStream(turn_id, censored, prefix, tts_job)
+    
+    def generate():
+        yield narration.start()
+        if reply is not None:
+            yield from narration.feed(reply)
+            yield from narration.finish({})
+            return
+        
+        ticket = None
+        try:
+            ticket = LLM_SCHEDULER.enqueue(session_id)
+            deadline = time.time() + LLM_SCHEDULER.queue_timeout
+            while not ticket.wait(1):
+                if time.time() > deadline:
+                    LLM_SCHEDULER.expire(ticket)
+                yield sse_event("queued", {"position": ticket.position()})
+        except SchedulerBusy as e:
+            yield narration.busy(e)
+            return
+        finally:
+            # Also runs if the client disconnects while queued
+            if ticket is not None and not ticket.granted:
+                ticket.release()
+        
+        with ticket:
+            meta = {}
+            for token in stream_ai_response(prompt, model, censored, context=context, meta=meta, session_id=session_id):
+                yield from narration.feed(token)
+            yield from narration.finish(meta)
+    
+    return Response(generate(), mimetype='text/event-stream', headers=STREAM_HEADERS)
+
 def process_narrative_command(user_input):
     """Process narrative commands that bend the story"""
     try:
-        triggers = [
-            "i bend the story to",
-            "i reshape reality so that",
-            "suddenly,",
-            "miraculously,",
-            "unexpectedly,",
-            "against all odds,",
-            "i wish that",
-            "let there be",
-            "reality shifts so that",
-            "i create",
-            "i manifest"
-        ]
-        
-        for trigger in triggers:
-            if user_input.lower().startswith(trigger):
-                return f"Player (narrative command): {user_input}"
+        if TEXT_ENGINE.match_trigger(user_input):
+            return f"Player (narrative command): {user_input}"
         
         return f"Player: {user_input}"
     except Exception as e:
         logging.error(f"Error in process_narrative_command: {str(e)}")
         return f"Player: {user_input}"
 
-def update_world_state(action, response, player_choices):
+@STAGE_SECONDS.time("world_state", "")
+def update_world_state(action, response, world):
     """Update world state based on player action and consequence"""
     try:
-        # Record the consequence with timestamp
-        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        player_choices['consequences'].append(f"[{timestamp}] {action} → {response[:100]}...")
-        
-        # Keep only the last 5 consequences
-        if len(player_choices['consequences']) > 5:
-            player_choices['consequences'] = player_choices['consequences'][-5:]
-        
-        # Detect and track key events
-        key_phrases = {
-            "ally": ["joins you", "helps you", "becomes your ally", "supports you", "swears loyalty"],
-            "enemy": ["attacks you", "becomes hostile", "swears revenge", "hunts you", "betrays you"],
-            "resource": ["find", "acquire", "obtain", "gain", "create", "invent"],
-            "location": ["enter", "arrive at", "reach", "discover", "create", "build"],
-            "faction": ["guards", "thieves guild", "rebel alliance", "royal court", "new faction"],
-            "reality": ["reality shifts", "world changes", "fabric bends", "laws of physics alter"]
-        }
+        # Record the consequence with timestamp; the WorldState keeps only the last few
+        timestamp = int(time.time())
+        world.record_consequence(f"{action} → {response[:100]}...", timestamp)
         
-        for category, phrases in key_phrases.items():
-            for phrase in phrases:
-                if phrase in response.lower():
-                    player_choices['world_events'].append(f"{timestamp}: {category.upper()} event")
-                    break
+        # Detect and track key events in a single pass over the reply
+        categories = TEXT_ENGINE.detect_categories(response)
+        for category in KEY_PHRASES:
+            if category in categories:
+                world.record_event(f"{category.upper()} event", timestamp)
         
         # Track reality-bending events
-        if any(phrase in response.lower() for phrase in key_phrases["reality"]):
-            player_choices['world_events'].append(f"{timestamp}: REALITY ALTERED")
+        if "reality" in categories:
+            world.record_event("REALITY ALTERED", timestamp)
     except Exception as e:
         logging.error(f"Error updating world state: {str(e)}")
+    finally:
+        bump_world_version()
+
+def journal_state():
+    """The part of the session an adventure journal keeps"""
+    state = {field: session.get(field) for field in JOURNAL_FIELDS}
+    state['player_choices'] = get_world().to_dict()
+    return state
+
+def start_journal():
+    """Open a new journal for the session's adventure"""
+    try:
+        journal_id = JOURNAL.create(
+            journal_state(),
+            character_name=session['character_name'],
+            role=session['role'],
+            genre=session['selected_genre'],
+            owner=get_session_id()
+        )
+    except Exception as e:
+        logging.error(f"Could not start adventure journal: {e}")
+        return
+    remember_journal(journal_id)
 
-def handle_special_command(cmd):
+def remember_journal(journal_id):
+    """Make journal_id the session's current journal and list it first in /saves"""
+    session['journal_id'] = journal_id
+    session['journal_ids'] = ([journal_id] + [other for other in session.get('journal_ids', []) if other != journal_id])[:MAX_SAVES_LISTED]
+
+def journal_turn():
+    """Append the turn that just finished to the session's journal"""
+    if not session.get('journal_id'):
+        return
+    try:
+        JOURNAL.record(session['journal_id'], journal_state())
+    except Exception as e:
+        logging.error(f"Could not write adventure journal: {e}")
+
+def owns_journal(journal_id):
+    """Whether the journal was started by this session; other players' ids can't be loaded"""
+    info = JOURNAL.info(journal_id)
+    return info is not None and info.get('owner') == get_session_id()
+
+def restore_journal_state(journal_id, state):
+    """Replace the session's adventure with one loaded from a journal"""
+    for field in ("conversation", "last_ai_reply", "character_name", "selected_genre", "role"):
+        session[field] = state.get(field) or ""
+    session['censored'] = bool(state.get('censored'))
+    session['world'] = WorldState.from_dict(state.get('player_choices') or {})
+    session.pop('player_choices', None)
+    bump_world_version()
+    # Keep the current model if the saved one is no longer installed
+    if state.get('ollama_model') in MODEL_REGISTRY.get():
+        session['ollama_model'] = state['ollama_model']
+    session['adventure_started'] = True
+    remember_journal(journal_id)
+    session.pop('pending_stream', None)
+    clear_kv_context()
+
+def strip_last_reply(conversation):
+    """The conversation without its last Dungeon Master reply"""
+    last_dm_pos = conversation.rfind("Dungeon Master:")
+    if last_dm_pos != -1:
+        conversation = conversation[:last_dm_pos].rstrip()
+    return conversation
+
+def spare_fingerprint(prompt, model, censored):
+    """Identifies the story point a spare reply was generated for"""
+    raw = json.dumps([prompt, model, bool(censored)])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+def queue_redo_spares():
+    """Generate REDO_SPARES alternatives to the session's last reply in the background.
+    
+    Each spare uses its own seed and temperature, and waits for a background
+    slot in LLM_SCHEDULER, so players' own turns always go first.
+    """
+    if SPARE_EXECUTOR is None or OLLAMA_POOL.is_open():
+        return
+    model = session.get('ollama_model')
+    censored = session['censored']
+    prompt, _ = compose_prompt(
+        model,
+        session['character_name'],
+        session['role'],
+        session['selected_genre'],
+        render_world_state(),
+        strip_last_reply(session['conversation']),
+        "Dungeon Master:",
+        cut=session.get('history_cut', 0)
+    )
+    session_id = get_session_id()
+    fingerprint = spare_fingerprint(prompt, model, censored)
+    REDO_SPARE_STORE.reset(session_id, fingerprint)
+    for index in range(REDO_SPARES):
+        options = {"seed": random.randrange(2**31), "temperature": round(0.7 + 0.15 * (index % 3), 2)}
+        SPARE_EXECUTOR.submit(generate_spare, session_id, fingerprint, index, prompt, model, censored, options)
+
+def generate_spare(session_id, fingerprint, index, prompt, model, censored, options):
+    """Generate one spare reply on a worker thread and store it if still current"""
+    try:
+        # Skip work for a story that has moved on while this waited for a thread
+        if not REDO_SPARE_STORE.wanted(session_id, fingerprint):
+            return
+        ticket = LLM_SCHEDULER.acquire(f"{session_id}/spare{index}", background=True)
+    except SchedulerBusy:
+        return
+    try:
+        with ticket:
+            if not REDO_SPARE_STORE.wanted(session_id, fingerprint):
+                return
+            meta = {}
+            ai_reply = get_ai_response(prompt, model, censored, max_retries=1, meta=meta, session_id=session_id, options=options)
+        if not is_failed_reply(ai_reply):
+            REDO_SPARE_STORE.add(session_id, fingerprint, (ai_reply, meta))
+    except Exception as e:
+        logging.error(f"Spare generation failed: {e}")
+
+def redo_turn():
+    """Regenerate the last Dungeon Master reply; a turn generator like setup_turn.
+    
+    Takes a spare made by queue_redo_spares when one is ready, otherwise
+    generates the reply live.
+    """
+    try:
+        if not session['last_ai_reply']:
+            return jsonify({"status": "error", "message": "Nothing to redo"})
+        
+        # Drop the last Dungeon Master response; the session keeps it until the new one arrives
+        conversation = strip_last_reply(session['conversation'])
+        
+        # Rebuild prompt with current state
+        prompt = assemble_prompt(conversation, "Dungeon Master:")
+        
+        spare = None
+        if REDO_SPARES > 0:
+            fingerprint = spare_fingerprint(prompt, session['ollama_model'], session['censored'])
+            spare = REDO_SPARE_STORE.take(get_session_id(), fingerprint)
+        if spare is not None:
+            ai_reply, meta = spare
+        else:
+            meta = {}
+            ai_reply = yield dict(
+                prompt=prompt,
+                model=session['ollama_model'],
+                censored=session['censored'],
+                meta=meta
+            )
+            if not ai_reply:
+                return jsonify({"status": "error", "message": "Nothing to redo"})
+            # Spares ran out; make more for the next reroll
+            queue_redo_spares()
+        
+        # The stored KV context included the reply being redone
+        clear_kv_context()
+        store_kv_context(meta)
+        ai_reply = sanitize_response(ai_reply, session['censored'])
+        session['conversation'] = conversation + f"\nDungeon Master: {ai_reply}"
+        session['last_ai_reply'] = ai_reply
+        journal_turn()
+        
+        audio_url, tts_job = request_tts(ai_reply)
+        
+        return jsonify({
+            "status": "success",
+            "message": ai_reply,
+            "audio_url": audio_url,
+            "tts_job": tts_job
+        })
+    except Exception as e:
+        logging.error(f"Error handling special command: {str(e)}")
+        return jsonify({"status": "error", "message": "Command processing failed"})
+
+def handle_special_command(user_input):
     """Process special commands like /censored, /consequences, etc."""
+    cmd = user_input.lower()
     try:
         if cmd == "/censored":
             session['censored'] = not session['censored']
@@ -669,66 +1404,89 @@ def handle_special_command(cmd):
             })
             
         if cmd == "/consequences":
-            consequences = session['player_choices']['consequences'][-5:]
+            consequences = get_world().consequence_lines()[-5:]
             return jsonify({
                 "status": "info",
                 "message": "\n".join([f"{i+1}. {c}" for i, c in enumerate(consequences)]) if consequences else "No consequences recorded yet."
             })
             
-        if cmd == "/redo":
-            if session['last_ai_reply']:
-                # Find the last Dungeon Master response
-                last_dm_pos = session['conversation'].rfind("Dungeon Master:")
-                if last_dm_pos != -1:
-                    session['conversation'] = session['conversation'][:last_dm_pos].rstrip()
-                
-                # Rebuild prompt with current state
-                system_prompt = get_full_system_prompt(
-                    session['character_name'],
-                    session['role'],
-                    session['selected_genre'],
-                    session['player_choices']
-                )
-                
-                ai_reply = get_ai_response(system_prompt + "\n\n" + session['conversation'], 
-                                          session['ollama_model'], 
-                                          session['censored'])
-                if ai_reply:
-                    ai_reply = sanitize_response(ai_reply, session['censored'])
-                    session['conversation'] += f"\nDungeon Master: {ai_reply}"
-                    session['last_ai_reply'] = ai_reply
-                    
-                    audio_url = speak(ai_reply) if session.get('tts_enabled', True) else None
-                    
-                    return jsonify({
-                        "status": "success",
-                        "message": ai_reply,
-                        "audio_url": audio_url
-                    })
-            return jsonify({"status": "error", "message": "Nothing to redo"})
-        
         if cmd == "/save":
             try:
-                with open("adventure.txt", "w", encoding="utf-8") as f:
-                    f.write(session['conversation'])
-                    f.write("\n\n### Persistent World State ###\n")
-                    f.write(get_current_state(session['player_choices']))
-                return jsonify({"status": "success", "message": "Adventure saved to adventure.txt"})
+                if not session.get('journal_id'):
+                    start_journal()
+                else:
+                    JOURNAL.checkpoint(session['journal_id'], journal_state())
+                return jsonify({
+                    "status": "success",
+                    "message": f"Adventure saved. Resume it any time with /load {session['journal_id']}"
+                })
             except Exception as e:
                 logging.error(f"Error saving adventure: {e}")
                 return jsonify({"status": "error", "message": "Error saving adventure"})
         
+        if cmd == "/saves":
+            saves = [info for info in map(JOURNAL.info, session.get('journal_ids', [])) if info]
+            if not saves:
+                return jsonify({"status": "info", "message": "No saved adventures yet."})
+            lines = [
+                f"{info['id']}: {info.get('character_name')} the {info.get('role')} ({info.get('genre')}), "
+                f"{info['records']} entries, last {datetime.datetime.fromtimestamp(info['updated']).strftime('%Y-%m-%d %H:%M')}"
+                for info in saves
+            ]
+            return jsonify({"status": "info", "message": "\n".join(lines)})
+        
+        if cmd.startswith("/load"):
+            journal_id = cmd[len("/load"):].strip()
+            if not journal_id:
+                return jsonify({"status": "error", "message": "Usage: /load <id> (see /saves)"})
+            try:
+                state = JOURNAL.load(journal_id) if owns_journal(journal_id) else None
+            except Exception as e:
+                logging.error(f"Error loading adventure {journal_id}: {e}")
+                state = None
+            if state is None:
+                return jsonify({"status": "error", "message": f"No saved adventure {journal_id}"})
+            restore_journal_state(journal_id, state)
+            return jsonify({
+                "status": "success",
+                "message": session['last_ai_reply'],
+                "consequence": f"Adventure {journal_id} loaded",
+                **world_state_fields()
+            })
+        
+        if cmd.startswith("/profile"):
+            # The token is case-sensitive, so it is read from the original input
+            token = user_input[len("/profile"):].strip()
+            if PROFILER is None or not is_profile_token(token):
+                return jsonify({"status": "error", "message": "Profiling is not available"})
+            session['profile_next'] = True
+            return jsonify({"status": "info", "message": "Your next command will be profiled."})
+        
         if cmd == "/debug":
             debug_info = {
-                "ollama_health": check_ollama_health(),
-                "tts_health": check_tts_health(),
+                "ollama_health": HEALTH_MONITOR.status("ollama"),
+                "tts_health": HEALTH_MONITOR.status("tts"),
                 "session_model": session.get('ollama_model'),
                 "adventure_started": session.get('adventure_started'),
                 "selected_genre": session.get('selected_genre'),
                 "character_name": session.get('character_name'),
                 "role": session.get('role'),
                 "tts_voice": session.get('tts_voice'),
-                "available_voices": session.get('available_voices')
+                "available_voices": VOICE_REGISTRY.get(),
+                "registries": {
+                    "models": MODEL_REGISTRY.snapshot(),
+                    "voices": VOICE_REGISTRY.snapshot()
+                },
+                "http_pools": get_pool_stats(),
+                "llm_scheduler": LLM_SCHEDULER.stats(),
+                "tts_cache": TTS_CACHE.stats() if TTS_CACHE is not None else None,
+                "opening_pool": OPENING_POOL.stats() if OPENING_POOL is not None else None,
+                "redo_spares": REDO_SPARE_STORE.stats() if REDO_SPARES > 0 else None,
+                "log_records_dropped": LOG_HANDLER.dropped,
+                "trace": TRACE_RECORDER.stats() if TRACE_RECORDER is not None else None,
+                "profiling": PROFILER is not None,
+                "prompt_usage": session.get('prompt_usage'),
+                "kv_context_tokens": len(session.get('kv_context') or [])
             }
             return jsonify({
                 "status": "info",
@@ -741,21 +1499,15 @@ def handle_special_command(cmd):
         logging.error(f"Error handling special command: {str(e)}")
         return jsonify({"status": "error", "message": "Command processing failed"})
 
+@STAGE_SECONDS.time("health_ollama", "")
 def check_ollama_health():
-    try:
-        response = requests.get(OLLAMA_HEALTH_URL, timeout=3)
-        return {
-            "status": "up" if response.status_code == 200 else "down",
-            "status_code": response.status_code,
-            "models": [model['model'] for model in response.json().get('models', []) 
-                      if 'model' in model][:3]
-        }
-    except Exception as e:
-        return {"status": "down", "error": str(e)}
+    """Probe every Ollama backend; up while any of them answers"""
+    return OLLAMA_POOL.refresh(OLLAMA_CLIENT)
 
+@STAGE_SECONDS.time("health_tts", "")
 def check_tts_health():
     try:
-        response = requests.get("http://localhost:7851", timeout=3)
+        response = ALLTALK_CLIENT.get(ALLTALK_BASE_URL, timeout=3)
         return {
             "status": "up" if response.status_code == 200 else "down",
             "status_code": response.status_code
@@ -763,6 +1515,35 @@ def check_tts_health():
     except Exception as e:
         return {"status": "down", "error": str(e)}
 
+# Probe backends in the background; request handlers read the cached results
+HEALTH_MONITOR = HealthMonitor(interval=HEALTH_CHECK_INTERVAL)
+HEALTH_MONITOR.register("ollama", check_ollama_health)
+HEALTH_MONITOR.register("tts", check_tts_health, TTS_BREAKER)
+HEALTH_MONITOR.start()
+
+# Discover models and voices in the background so the first visitor doesn't wait
+MODEL_REGISTRY.refresh(wait=False)
+VOICE_REGISTRY.refresh(wait=False)
+
+@app.before_request
+def record_trace():
+    """Append the player's input to the trace file when recording is on"""
+    if TRACE_RECORDER is None or request.method != 'POST' or request.path not in TRACED_ROUTES:
+        return
+    try:
+        form = {key: value for key, value in request.form.items() if key not in UNTRACED_FIELDS}
+        # Never write the profiling token to a trace
+        if form.get('command', '').lower().startswith('/profile'):
+            return
+        TRACE_RECORDER.record(get_session_id(), request.path, form)
+    except Exception as e:
+        logging.error(f"Could not record trace: {e}")
+
+@app.context_processor
+def inject_installed_models():
+    """Expose the shared model list to templates"""
+    return {"installed_models": MODEL_REGISTRY.get()}
+
 @app.route('/')
 def index():
     try:
@@ -789,13 +1570,13 @@ def model_selection():
                 return redirect(url_for('setup'))
             else:
                 return render_template('model_selection.html', 
-                                      models=session.get('installed_models', []),
+                                      models=MODEL_REGISTRY.get(),
                                       error="Please select a model",
                                       theme=session.get('theme', 'fantasy'))
         
         # GET request - show model selection
         return render_template('model_selection.html', 
-                              models=session.get('installed_models', []),
+                              models=MODEL_REGISTRY.get(),
                               theme=session.get('theme', 'fantasy'))
     except Exception as e:
         logging.error(f"Error in model_selection route: {str(e)}")
@@ -805,8 +1586,9 @@ def model_selection():
 def change_model():
     try:
         selected_model = request.form.get('model')
-        if selected_model and selected_model in session.get('installed_models', []):
+        if selected_model and selected_model in MODEL_REGISTRY.get():
             session['ollama_model'] = selected_model
+            clear_kv_context()
             return jsonify({'status': 'success', 'message': f'Model changed to {selected_model}'})
         return jsonify({'status': 'error', 'message': 'Invalid model selection'})
     except Exception as e:
@@ -828,128 +1610,282 @@ def get_roles():
 def get_voices():
     """API endpoint to get available voices"""
     try:
-        # Ensure we have voices in the session
-        if 'available_voices' not in session or not session['available_voices']:
-            # If not, try to get them
-            session['available_voices'] = get_available_voices()
-            session['tts_voice'] = session['available_voices'][0] if session['available_voices'] else ""
-        
-        return jsonify({"voices": session['available_voices']})
+        return jsonify({"voices": VOICE_REGISTRY.get()})
     except Exception as e:
         logging.error(f"Error getting voices: {str(e)}")
-        return jsonify({"voices": [
-            "British Female (FemaleBritishAccent_WhyLucyWhy_Voice_2.wav)",
-            "American Female (FemaleAmericanAccent_WhyLucyWhy_Voice_1.wav)",
-            "American Male (MaleAmericanAccent_WhyLucyWhy_Voice_1.wav)"
-        ]})
+        return jsonify({"voices": FALLBACK_VOICES})
 
 @app.route('/set-voice', methods=['POST'])
 def set_voice():
     """Set the selected TTS voice"""
     voice = request.form.get('voice')
-    if voice and voice in session.get('available_voices', []):
+    if voice and voice in VOICE_REGISTRY.get():
         session['tts_voice'] = voice
         return jsonify({'status': 'success', 'message': f'Voice set to {voice}'})
     return jsonify({'status': 'error', 'message': 'Invalid voice selection'})
 
+def prepare_setup(form):
+    """Validate setup form data and store the new character in the session.
+    
+    Returns (full_prompt, initial_context, role_starter), or None when the
+    genre selection is invalid.
+    """
+    genre_id = form.get('genre')
+    role = form.get('role')
+    character_name = form.get('character_name', '').strip() or "Alex"
+    tts_voice = form.get('tts_voice', '')
+    
+    logging.info(f"Received setup data: genre_id={genre_id}, role={role}, name={character_name}, voice={tts_voice}")
+    
+    if genre_id not in genres:
+        return None
+    
+    selected_genre, role_list = genres[genre_id]
+    
+    # Handle "Random" genre selection
+    if selected_genre == "Random":
+        available = [v for k, v in genres.items() if k != "5"]
+        selected_genre, role_list = random.choice(available)
+    
+    # Validate role selection
+    if not role or role not in role_list:
+        logging.warning(f"Invalid role selected: {role}. Valid roles: {role_list}")
+        role = random.choice(role_list) if role_list else "Adventurer"
+        logging.info(f"Using random role: {role}")
+    
+    # Validate voice selection
+    available_voices = VOICE_REGISTRY.get()
+    if tts_voice and tts_voice in available_voices:
+        session['tts_voice'] = tts_voice
+    else:
+        # Use first available voice if selection invalid
+        session['tts_voice'] = available_voices[0] if available_voices else ""
+    
+    session['selected_genre'] = selected_genre
+    session['role'] = role
+    session['character_name'] = character_name
+    
+    # Get role-specific starter
+    role_starter = get_role_starter(selected_genre, role)
+    
+    # Build initial context using role starter as the intro prompt
+    initial_context = build_opening_context(selected_genre, role, character_name, role_starter)
+    
+    # Create prompt with role starter as the starting point
+    full_prompt = assemble_prompt(initial_context, "\nDungeon Master: " + role_starter)
+    
+    return full_prompt, initial_context, role_starter
+
+def build_opening_context(genre, role, character_name, role_starter):
+    """The adventure setting block every conversation starts with"""
+    return (
+        f"### Adventure Setting ###\n"
+        f"Genre: {genre}\n"
+        f"Player Character: {character_name} the {role}\n"
+        f"Starting Scenario: {role_starter}\n"
+    )
+
+def is_failed_reply(ai_reply):
+    """True for an empty reply or one of get_ai_response's error messages"""
+    return not ai_reply or ai_reply.strip() == "" or ai_reply.startswith(("Ollama", "An error", "AI failed", "No AI model"))
+
+def prefix_role_starter(role_starter, ai_reply):
+    """Ensure the role starter is included in the opening narration"""
+    if not ai_reply.startswith(role_starter):
+        return role_starter + " " + ai_reply
+    return ai_reply
+
+def complete_setup(initial_context, role_starter, ai_reply, meta=None, tts_job=None, spoken_words=0):
+    """Apply the opening AI reply to the session and build the /setup response"""
+    selected_genre = session['selected_genre']
+    role = session['role']
+    character_name = session['character_name']
+    
+    # Handle empty responses or errors
+    if is_failed_reply(ai_reply):
+        logging.warning(f"AI response issue: {ai_reply}, using fallback")
+        # Even in fallback, use the role starter
+        ai_reply = role_starter + " " + generate_fallback_response(selected_genre, role, character_name)
+        clear_kv_context()
+    else:
+        store_kv_context(meta or {})
+        ai_reply = prefix_role_starter(role_starter, ai_reply)
+    
+    ai_reply = sanitize_response(ai_reply, session['censored'])
+    session['conversation'] = initial_context + "\n\nDungeon Master: " + ai_reply
+    session.pop('history_cut', None)
+    session['last_ai_reply'] = ai_reply
+    get_world().record_consequence(f"Start: {ai_reply.split('.')[0]}", stamp=0)
+    bump_world_version()
+    session['adventure_started'] = True
+    start_journal()
+    queue_redo_spares()
+    
+    # Generate TTS audio if needed
+    audio_url, tts_job = request_tts(ai_reply, tts_job, spoken_words)
+    
+    return {
+        "status": "success",
+        "message": ai_reply,
+        "audio_url": audio_url,
+        "tts_job": tts_job
+    }
+
+def opening_key(model, genre, role, censored, voice):
+    """Pool key for an opening; the voice only matters when its audio is pre-rendered"""
+    return (model, genre, role, bool(censored), voice if OPENING_POOL_TTS else None)
+
+def generate_opening(key):
+    """Generate one pooled opening for an opening_key.
+    
+    Runs on the pool's thread, outside any request: the prompt is built for
+    the default character name, which take_opening swaps for the player's.
+    Each opening gets its own seed and temperature so a key's openings
+    differ. Waits for a background slot in LLM_SCHEDULER, behind players.
+    Returns (role_starter, ai_reply), or None if no usable reply came back.
+    """
+    model, genre, role, censored, voice = key
+    if OLLAMA_POOL.is_open():
+        return None
+    
+    role_starter = get_role_starter(genre, role)
+    initial_context = build_opening_context(genre, role, DEFAULT_CHARACTER_NAME, role_starter)
+    prompt, _ = compose_prompt(model, DEFAULT_CHARACTER_NAME, role, genre, get_current_state(WorldState()),
+                               initial_context, "\nDungeon Master: " + role_starter)
+    try:
+        ticket = LLM_SCHEDULER.acquire(OPENING_POOL_KEY, background=True)
+    except SchedulerBusy:
+        return None
+    options = {"seed": random.randrange(2**31), "temperature": round(0.7 + 0.15 * random.randrange(3), 2)}
+    with ticket:
+        ai_reply = get_ai_response(prompt, model, censored, max_retries=1, options=options)
+    if is_failed_reply(ai_reply):
+        return None
+    
+    # Synthesize the opening in the player's voice the way request_tts will split it,
+    # so it plays from the cache (sentences naming the character miss after renaming)
+    if voice and TTS_CACHE is not None and not TTS_BREAKER.is_open():
+        text = sanitize_response(prefix_role_starter(role_starter, ai_reply), censored)
+        chunks = split_sentences(" ".join(text.split())) if TTS_ASYNC else [text]
+        for chunk in chunks:
+            speak(chunk, voice, censored)
+    
+    return role_starter, ai_reply
+
+OPENING_POOL = OpeningPool(generate_opening, size=OPENING_POOL_SIZE) if OPENING_POOL_SIZE > 0 else None
+
+def take_opening():
+    """A pre-generated opening for the session's character, or None.
+    
+    Returns (initial_context, role_starter, ai_reply) ready for
+    complete_setup. Taking one, or missing, queues a refill.
+    """
+    if OPENING_POOL is None:
+        return None
+    key = opening_key(session['ollama_model'], session['selected_genre'], session['role'], session['censored'],
+                      session.get('tts_voice') or DEFAULT_TTS_VOICE)
+    pooled = OPENING_POOL.take(key)
+    if pooled is None:
+        return None
+    
+    role_starter, ai_reply = pooled
+    character_name = session['character_name']
+    if character_name != DEFAULT_CHARACTER_NAME:
+        ai_reply = re.sub(rf'\b{DEFAULT_CHARACTER_NAME}\b', lambda match: character_name, ai_reply)
+    initial_context = build_opening_context(session['selected_genre'], session['role'], character_name, role_starter)
+    return initial_context, role_starter, ai_reply
+
+def step_turn(turn, reply=None):
+    """Advance a turn generator by one step.
+    
+    Returns (ai_call, None) when the turn needs an AI reply, where ai_call
+    holds the keyword arguments for get_ai_response, or (None, response)
+    when the turn is finished.
+    """
+    try:
+        return turn.send(reply), None
+    except StopIteration as done:
+        return None, done.value
+
+def get_session_id():
+    """Stable id for the current player, used to schedule their AI calls"""
+    if 'session_id' not in session:
+        session['session_id'] = uuid.uuid4().hex
+    return session['session_id']
+
+def busy_response(error):
+    """429 response for a generation the scheduler refused"""
+    response = jsonify({"status": "busy", "message": str(error), "retry_after": error.retry_after})
+    return response, 429, {"Retry-After": str(error.retry_after)}
+
+def run_turn(turn):
+    """Run a turn generator to completion with blocking AI calls.
+    
+    Each call waits for a slot from LLM_SCHEDULER; if the queue is full the
+    turn is abandoned at its AI call and a 429 is returned.
+    """
+    ai_call, response = step_turn(turn)
+    while ai_call is not None:
+        try:
+            ticket = LLM_SCHEDULER.acquire(get_session_id())
+        except SchedulerBusy as e:
+            turn.close()
+            return busy_response(e)
+        with ticket:
+            reply = get_ai_response(session_id=ticket.key, **ai_call)
+        ai_call, response = step_turn(turn, reply)
+    return response
+
+def setup_turn(form):
+    """Start the adventure from the setup form.
+    
+    A turn generator: it yields the AI call for the opening narration and
+    returns the response. run_turn drives it with a blocking call; asgi.py
+    awaits the call instead, so no thread waits on Ollama.
+    """
+    try:
+        if not session.get('ollama_model'):
+            return redirect(url_for('model_selection'))
+        
+        prepared = prepare_setup(form)
+        if prepared is None:
+            return jsonify({"status": "error", "message": "Invalid genre selection"})
+        
+        full_prompt, initial_context, role_starter = prepared
+        
+        # Start from a pre-generated opening when one is ready; it has no KV context
+        pooled = take_opening()
+        if pooled is not None:
+            return jsonify(complete_setup(*pooled))
+        
+        # Get AI response, or go straight to the fallback while Ollama is down
+        meta = {}
+        if OLLAMA_POOL.is_open():
+            ai_reply = ""
+        else:
+            ai_reply = yield dict(
+                prompt=full_prompt,
+                model=session['ollama_model'],
+                censored=session['censored'],
+                meta=meta
+            )
+        
+        return jsonify(complete_setup(initial_context, role_starter, ai_reply, meta))
+    except Exception as e:
+        logging.exception(f"Critical error in setup: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": "Character creation failed. Please try again."
+        }), 500
+
 @app.route('/setup', methods=['GET', 'POST'])
 def setup():
+    if request.method == 'POST':
+        return run_turn(setup_turn(request.form))
+    
     try:
         if not session.get('ollama_model'):
             return redirect(url_for('model_selection'))
-            
-        if request.method == 'POST':
-            genre_id = request.form.get('genre')
-            role = request.form.get('role')
-            character_name = request.form.get('character_name', '').strip() or "Alex"
-            tts_voice = request.form.get('tts_voice', '')
-            
-            logging.info(f"Received setup data: genre_id={genre_id}, role={role}, name={character_name}, voice={tts_voice}")
-            
-            if genre_id in genres:
-                selected_genre, role_list = genres[genre_id]
-                
-                # Handle "Random" genre selection
-                if selected_genre == "Random":
-                    available = [v for k, v in genres.items() if k != "5"]
-                    selected_genre, role_list = random.choice(available)
-                
-                # Validate role selection
-                if not role or role not in role_list:
-                    logging.warning(f"Invalid role selected: {role}. Valid roles: {role_list}")
-                    role = random.choice(role_list) if role_list else "Adventurer"
-                    logging.info(f"Using random role: {role}")
-                
-                # Validate voice selection
-                if tts_voice and tts_voice in session['available_voices']:
-                    session['tts_voice'] = tts_voice
-                else:
-                    # Use first available voice if selection invalid
-                    session['tts_voice'] = session['available_voices'][0] if session['available_voices'] else ""
-                
-                session['selected_genre'] = selected_genre
-                session['role'] = role
-                session['character_name'] = character_name
-                
-                # Get role-specific starter
-                role_starter = get_role_starter(selected_genre, role)
-                
-                # Build initial context using role starter as the intro prompt
-                initial_context = (
-                    f"### Adventure Setting ###\n"
-                    f"Genre: {selected_genre}\n"
-                    f"Player Character: {character_name} the {role}\n"
-                    f"Starting Scenario: {role_starter}\n"
-                )
-                
-                # Build full system prompt
-                system_prompt = get_full_system_prompt(
-                    character_name, 
-                    role, 
-                    selected_genre,
-                    session['player_choices']
-                )
-                
-                # Create prompt with role starter as the starting point
-                full_prompt = (
-                    system_prompt + "\n\n" + 
-                    initial_context + "\n\n" +
-                    "Dungeon Master: " + role_starter  # Use role starter as the intro
-                )
-                
-                # Get AI response
-                ai_reply = get_ai_response(
-                    full_prompt,
-                    session['ollama_model'],
-                    session['censored']
-                )
-                
-                # Handle empty responses or errors
-                if not ai_reply or ai_reply.strip() == "" or ai_reply.startswith("Ollama") or ai_reply.startswith("An error"):
-                    logging.warning(f"AI response issue: {ai_reply}, using fallback")
-                    # Even in fallback, use the role starter
-                    ai_reply = role_starter + " " + generate_fallback_response(selected_genre, role, character_name)
-                else:
-                    # Ensure the role starter is included in the response
-                    if not ai_reply.startswith(role_starter):
-                        ai_reply = role_starter + " " + ai_reply
-                
-                ai_reply = sanitize_response(ai_reply, session['censored'])
-                session['conversation'] = initial_context + "\n\nDungeon Master: " + ai_reply
-                session['last_ai_reply'] = ai_reply
-                session['player_choices']['consequences'].append(f"Start: {ai_reply.split('.')[0]}")
-                session['adventure_started'] = True
-                
-                # Generate TTS audio if needed
-                audio_url = speak(ai_reply) if session.get('tts_enabled', True) else None
-                
-                return jsonify({
-                    "status": "success",
-                    "message": ai_reply,
-                    "audio_url": audio_url
-                })
-            
-            return jsonify({"status": "error", "message": "Invalid genre selection"})
         
         # GET request - render setup page
         return render_template('setup.html', genres=genres, theme=session.get('theme', 'fantasy'))
@@ -960,6 +1896,61 @@ def setup():
             "message": "Character creation failed. Please try again."
         }), 500
 
+def open_setup_stream(form):
+    """Check the setup form and register a streamed opening.
+    
+    Returns the stream_turn arguments for it, or a response to send
+    instead. The Flask route streams with blocking calls; asgi.py streams
+    the same turn on the event loop.
+    """
+    try:
+        if not session.get('ollama_model'):
+            return jsonify({"status": "error", "message": "No AI model selected"}), 400
+        
+        prepared = prepare_setup(form)
+        if prepared is None:
+            return jsonify({"status": "error", "message": "Invalid genre selection"})
+        
+        full_prompt, initial_context, role_starter = prepared
+        
+        # A pre-generated opening is sent at once, and while Ollama is down the empty
+        # reply leads to the fallback; otherwise refuse up front when the queue is full
+        reply = None
+        pooled = take_opening()
+        if pooled is not None:
+            initial_context, role_starter, reply = pooled
+        elif OLLAMA_POOL.is_open():
+            reply = ""
+        else:
+            try:
+                LLM_SCHEDULER.check(get_session_id())
+            except SchedulerBusy as e:
+                return busy_response(e)
+        
+        turn_id = register_stream("setup", initial_context=initial_context, role_starter=role_starter)
+        session['pending_stream'] = turn_id
+        
+        return dict(
+            turn_id=turn_id,
+            prompt=full_prompt,
+            model=session['ollama_model'],
+            censored=session['censored'],
+            prefix=role_starter + " ",
+            reply=reply
+        )
+    except Exception as e:
+        logging.exception(f"Critical error in streamed setup: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": "Character creation failed. Please try again."
+        }), 500
+
+@app.route('/setup/stream', methods=['POST'])
+def setup_stream():
+    """Start the adventure and stream the opening narration as server-sent events"""
+    opened = open_setup_stream(request.form)
+    return stream_turn(**opened) if isinstance(opened, dict) else opened
+
 @app.route('/game')
 def game():
     try:
@@ -971,7 +1962,7 @@ def game():
             session['character_name'],
             session['role'],
             session['selected_genre'],
-            session['player_choices']
+            render_world_state()
         )
         
         return render_template('game.html', system_prompt=system_prompt, theme=session.get('theme', 'fantasy'))
@@ -979,19 +1970,102 @@ def game():
         logging.error(f"Error in game route: {str(e)}")
         return redirect(url_for('index'))
 
-@app.route('/command', methods=['POST'])
-def process_command():
+def get_state_fingerprint():
+    """Fingerprint of everything a stored KV context depends on besides the conversation.
+    
+    Consequences and world events are left out: they are derived from
+    narration the model has already seen.
+    """
+    choices = get_world().to_dict()
+    structural = {key: value for key, value in choices.items() if key not in ('consequences', 'world_events')}
+    raw = json.dumps([session.get('ollama_model'), session.get('censored'), structural], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+def store_kv_context(meta):
+    """Remember Ollama's returned context so the next turn can continue from it"""
+    if KV_CONTEXT_REUSE and meta.get('context'):
+        session['kv_context'] = meta['context']
+        session['kv_fingerprint'] = get_state_fingerprint()
+    else:
+        clear_kv_context()
+
+def clear_kv_context():
+    """Force the next turn to rebuild its prompt from the full history"""
+    session.pop('kv_context', None)
+    session.pop('kv_fingerprint', None)
+
+def build_command_prompt(formatted_input):
+    """Build the prompt for a regular player command.
+    
+    Returns (prompt, context). While the session holds a valid Ollama context,
+    only the new player line and cue are sent on top of it; otherwise the
+    full history is rebuilt and context is None.
+    """
+    tail = formatted_input + "\nDungeon Master:"
+    context = session.get('kv_context') if KV_CONTEXT_REUSE else None
+    if context and session.get('kv_fingerprint') == get_state_fingerprint():
+        delta = "\n" + tail
+        budget = get_context_tokens(session.get('ollama_model')) - RESPONSE_TOKEN_RESERVE
+        # A context that has outgrown the window is rebuilt with the rolling history
+        if len(context) + estimate_tokens(delta) <= budget:
+            session['prompt_usage'] = {
+                "mode": "context",
+                "budget": budget,
+                "context": len(context),
+                "input": estimate_tokens(delta)
+            }
+            return delta, context
+    return assemble_prompt(session['conversation'], tail), None
+
+def complete_command(user_input, formatted_input, ai_reply, meta=None, tts_job=None, spoken_words=0):
+    """Apply a finished AI reply to the session and build the /command response"""
+    # Fallback response if empty or an error message
+    if is_failed_reply(ai_reply):
+        ai_reply = generate_fallback_response(
+            session['selected_genre'], 
+            session['role'], 
+            session['character_name']
+        )
+        clear_kv_context()
+    else:
+        store_kv_context(meta or {})
+    
+    ai_reply = sanitize_response(ai_reply, session['censored'])
+    session['conversation'] += "\n" + formatted_input + "\nDungeon Master: " + ai_reply
+    session['last_ai_reply'] = ai_reply
+    
+    # Update world state
+    update_world_state(user_input, ai_reply, get_world())
+    journal_turn()
+    queue_redo_spares()
+    
+    # Generate TTS audio if needed
+    audio_url, tts_job = request_tts(ai_reply, tts_job, spoken_words)
+    
+    return {
+        "status": "success",
+        "message": ai_reply,
+        "consequence": ai_reply.split('.')[0],
+        **world_state_fields(),
+        "audio_url": audio_url,
+        "tts_job": tts_job
+    }
+
+def command_turn(form):
+    """Process one player command; a turn generator like setup_turn"""
     try:
         if not session.get('adventure_started', False):
             return jsonify({"status": "error", "message": "Adventure not started"})
         
-        user_input = request.form.get('command', '').strip()
+        user_input = form.get('command', '').strip()
         if not user_input:
             return jsonify({"status": "error", "message": "Empty command"})
         
         # Handle special commands
         if user_input.startswith("/"):
-            return handle_special_command(user_input.lower())
+            if user_input.lower() == "/redo":
+                return (yield from redo_turn())
+            return handle_special_command(user_input)
         
         # Handle create commands
         if user_input.lower().startswith("create "):
@@ -1000,81 +2074,172 @@ def process_command():
                 entity_type = parts[1].lower()
                 entity_name = " ".join(parts[2:])
                 
-                # Add to world state
-                if entity_type in ["npc", "character", "ally"]:
-                    session['player_choices']['allies'].append(entity_name)
-                    session['player_choices']['player_creations'].append(f"{entity_name} (NPC)")
-                elif entity_type in ["location", "place"]:
-                    session['player_choices']['discoveries'].append(entity_name)
-                    session['player_choices']['player_creations'].append(f"{entity_name} (Location)")
-                elif entity_type in ["item", "object", "artifact"]:
-                    session['player_choices']['resources'][entity_name] = 1
-                    session['player_choices']['player_creations'].append(f"{entity_name} (Item)")
-                elif entity_type in ["faction", "group"]:
-                    session['player_choices']['factions'][entity_name] = 0
-                    session['player_choices']['player_creations'].append(f"{entity_name} (Faction)")
-                
-                # Keep only the last 5 creations
-                if len(session['player_choices']['player_creations']) > 5:
-                    session['player_choices']['player_creations'] = session['player_choices']['player_creations'][-5:]
+                # Add to world state; the WorldState keeps only the last 5 creations
+                get_world().create(entity_type, entity_name)
+                bump_world_version()
                     
                 return jsonify({
                     "status": "success",
                     "message": f"You create {entity_name}",
                     "consequence": f"New {entity_type} added to the world",
-                    "world_state": get_current_state(session['player_choices'])
+                    **world_state_fields()
                 })
         
         # Process regular command
         formatted_input = process_narrative_command(user_input)
         
-        # Build system prompt with current state
-        system_prompt = get_full_system_prompt(
-            session['character_name'],
-            session['role'],
-            session['selected_genre'],
-            session['player_choices']
-        )
+        # Get AI response, or go straight to the fallback while Ollama is down
+        meta = {}
+        if OLLAMA_POOL.is_open():
+            ai_reply = ""
+        else:
+            prompt, context = build_command_prompt(formatted_input)
+            ai_reply = yield dict(
+                prompt=prompt,
+                model=session['ollama_model'],
+                censored=session['censored'],
+                context=context,
+                meta=meta
+            )
         
-        # Build full conversation
-        full_conversation = (
-            system_prompt + "\n\n" +
-            session['conversation'] + "\n" +
-            formatted_input + "\n" +
-            "Dungeon Master:"
-        )
+        return jsonify(complete_command(user_input, formatted_input, ai_reply, meta))
         
-        # Get AI response
-        ai_reply = get_ai_response(full_conversation, session['ollama_model'], session['censored'])
+    except Exception as e:
+        logging.error(f"Error in command route: {str(e)}")
+        logging.error(traceback.format_exc())
+        return jsonify({
+            "status": "error",
+            "message": "Reality itself seems unstable... Try again!",
+            "debug": str(e)
+        }), 500
+
+def matches_token(token, expected):
+    """Constant-time check of a client-supplied token; always False when no token is configured"""
+    return bool(token) and bool(expected) and hmac.compare_digest(token.encode('utf-8'), expected.encode('utf-8'))
+
+def is_profile_token(token):
+    return matches_token(token, PROFILE_TOKEN)
+
+def profiling_requested():
+    """True when this command should be profiled: an X-Profile header with the token, or an armed /profile"""
+    if PROFILER is None:
+        return False
+    return is_profile_token(request.headers.get('X-Profile', '')) or session.pop('profile_next', False)
+
+def profile_command(run):
+    """Run a command under the profiler; the response names the profile in X-Profile-Id"""
+    result, profile_id = PROFILER.profile(run, label="command")
+    response = app.make_response(result)
+    response.headers['X-Profile-Id'] = profile_id
+    return response
+
+@app.route('/command', methods=['POST'])
+def process_command():
+    if profiling_requested():
+        return profile_command(lambda: run_turn(command_turn(request.form)))
+    return run_turn(command_turn(request.form))
+
+@app.route('/command/stream', methods=['POST'])
+def stream_command():
+    """Stream the narration for a regular player command as server-sent events"""
+    opened = open_command_stream(request.form)
+    if not isinstance(opened, dict):
+        return opened
+    if profiling_requested():
+        return profile_stream(opened)
+    return stream_turn(**opened)
+
+def profile_stream(opened):
+    """Run a streamed command to the end under the profiler.
+    
+    The whole turn runs on this thread so the profilers see all of it; its
+    events are then sent at once, with X-Profile-Id naming the profile.
+    """
+    return profile_command(lambda: Response(
+        stream_turn(**opened).get_data(),
+        mimetype='text/event-stream',
+        headers=STREAM_HEADERS
+    ))
+
+def open_command_stream(form):
+    """Check a streamed command and register its turn.
+    
+    Returns the stream_turn arguments for it, or a response to send instead.
+    """
+    try:
+        if not session.get('adventure_started', False):
+            return jsonify({"status": "error", "message": "Adventure not started"})
         
-        # Fallback response if empty
-        if not ai_reply or ai_reply.strip() == "" or ai_reply.startswith("Ollama") or ai_reply.startswith("An error"):
-            ai_reply = generate_fallback_response(
-                session['selected_genre'], 
-                session['role'], 
-                session['character_name']
-            )
+        user_input = form.get('command', '').strip()
+        if not user_input:
+            return jsonify({"status": "error", "message": "Empty command"})
         
-        ai_reply = sanitize_response(ai_reply, session['censored'])
-        session['conversation'] += "\n" + formatted_input + "\nDungeon Master: " + ai_reply
-        session['last_ai_reply'] = ai_reply
+        # Special and create commands don't call the AI, so they stay on /command
+        if user_input.startswith("/") or user_input.lower().startswith("create "):
+            return jsonify({"status": "error", "message": "Use /command for this input"}), 400
         
-        # Update world state
-        update_world_state(user_input, ai_reply, session['player_choices'])
+        # Refuse up front when the generation queue is already full
+        try:
+            LLM_SCHEDULER.check(get_session_id())
+        except SchedulerBusy as e:
+            return busy_response(e)
         
-        # Generate TTS audio if needed
-        audio_url = speak(ai_reply) if session.get('tts_enabled', True) else None
+        formatted_input = process_narrative_command(user_input)
+        prompt, context = build_command_prompt(formatted_input)
+        tts_job = start_tts_playlist()
+        turn_id = register_stream("command", user_input=user_input, formatted_input=formatted_input, tts_job=tts_job)
+        session['pending_stream'] = turn_id
         
+        return dict(
+            turn_id=turn_id,
+            prompt=prompt,
+            model=session['ollama_model'],
+            censored=session['censored'],
+            context=context,
+            tts_job=tts_job
+        )
+    except Exception as e:
+        logging.error(f"Error in streamed command route: {str(e)}")
+        logging.error(traceback.format_exc())
         return jsonify({
-            "status": "success",
-            "message": ai_reply,
-            "consequence": ai_reply.split('.')[0],
-            "world_state": get_current_state(session['player_choices']),
-            "audio_url": audio_url
-        })
+            "status": "error",
+            "message": "Reality itself seems unstable... Try again!",
+            "debug": str(e)
+        }), 500
+
+@app.route('/command/stream/finish', methods=['POST'])
+def finish_stream():
+    """Commit a finished streamed turn to the session"""
+    try:
+        turn_id = request.form.get('turn_id', '')
+        if not turn_id or turn_id != session.get('pending_stream'):
+            return jsonify({"status": "error", "message": "Unknown stream"}), 400
+        
+        # An unfinished turn is left as it is, so the client can try again
+        entry = claim_stream(turn_id)
+        if entry is None:
+            return jsonify({"status": "error", "message": "Stream not finished"}), 409
         
+        try:
+            if entry['kind'] == "setup":
+                result = complete_setup(entry['initial_context'], entry['role_starter'], entry['text'], entry['meta'])
+            else:
+                result = complete_command(
+                    entry['user_input'],
+                    entry['formatted_input'],
+                    entry['text'],
+                    entry['meta'],
+                    entry.get('tts_job'),
+                    entry['spoken_words']
+                )
+        except Exception:
+            entry['claimed'] = False
+            raise
+        pop_stream(turn_id)
+        session.pop('pending_stream', None)
+        return jsonify(result)
     except Exception as e:
-        logging.error(f"Error in command route: {str(e)}")
+        logging.error(f"Error finishing stream: {str(e)}")
         logging.error(traceback.format_exc())
         return jsonify({
             "status": "error",
@@ -1082,6 +2247,32 @@ def process_command():
             "debug": str(e)
         }), 500
 
+@app.route('/tts/<job_id>')
+def tts_status(job_id):
+    """Report the state of a background TTS job"""
+    status = TTS_JOBS.status(job_id)
+    if status is None:
+        return jsonify({"status": "error", "message": "Unknown TTS job"}), 404
+    return jsonify(status)
+
+@app.route('/tts/audio/<key>.wav')
+def tts_audio(key):
+    """Serve a clip from the local TTS cache"""
+    if TTS_CACHE is None or not CACHE_KEY_PATTERN.match(key):
+        return jsonify({"status": "error", "message": "Unknown clip"}), 404
+    return send_from_directory(os.path.abspath(TTS_CACHE_DIR), f"{key}.wav", mimetype='audio/wav', max_age=86400)
+
+@app.route('/tts/prewarm', methods=['POST'])
+def tts_prewarm():
+    """Fill the TTS cache with every role starter in every voice, in the background"""
+    if not matches_token(request.headers.get('X-Prewarm-Token', ''), TTS_PREWARM_TOKEN):
+        return jsonify({"status": "error", "message": "Not allowed"}), 403
+    if TTS_CACHE is None:
+        return jsonify({"status": "error", "message": "TTS cache is disabled"}), 400
+    if not start_tts_prewarm():
+        return jsonify({"status": "error", "message": "Pre-warming is already running"}), 409
+    return jsonify({"status": "success", "message": "Pre-warming TTS cache", "tts_cache": TTS_CACHE.stats()})
+
 @app.route('/help')
 def show_help():
     try:
@@ -1094,29 +2285,65 @@ def show_help():
 def health_check():
     return jsonify({
         "status": "healthy",
-        "ollama": check_ollama_health(),
-        "tts": check_tts_health()
+        "ollama": HEALTH_MONITOR.status("ollama"),
+        "tts": HEALTH_MONITOR.status("tts"),
+        "llm_scheduler": LLM_SCHEDULER.stats()
     }), 200
 
+for name, description in (
+        ("active", "Player generations running"),
+        ("queued", "Player generations waiting for a slot"),
+        ("background_active", "Background generations running"),
+        ("background_queued", "Background generations waiting for a slot"),
+        ("wait_p50", "Median recent queue wait in seconds"),
+        ("wait_p95", "95th percentile recent queue wait in seconds")):
+    METRICS.gauge(f"rpg_llm_scheduler_{name}", description, lambda name=name: {(): LLM_SCHEDULER.stats()[name]})
+METRICS.gauge("rpg_log_records_dropped", "Log records dropped because the log queue was full", lambda: {(): LOG_HANDLER.dropped})
+
+@app.route('/metrics')
+def show_metrics():
+    """Prometheus text exposition of stage latencies and Ollama throughput"""
+    try:
+        return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+    except Exception as e:
+        logging.error(f"Error rendering metrics: {e}")
+        return str(e), 500
+
 @app.route('/logs')
 def show_logs():
+    """Last lines of the log (?lines=N); with ?follow=1 they are streamed as server-sent events, then new ones as they are written"""
     try:
-        with open(log_filename, 'r') as log_file:
-            logs = log_file.readlines()
-        return Response('\n'.join(logs[-200:]), mimetype='text/plain')
+        count = min(max(request.args.get('lines', LOG_TAIL_LINES, type=int), 0), MAX_LOG_TAIL_LINES)
+        lines, offset = tail_lines(log_filename, count)
+        if request.args.get('follow') != '1':
+            return Response(''.join(f"{line}\n" for line in lines), mimetype='text/plain')
     except Exception as e:
         return str(e), 500
-
-if __name__ == '__main__':
-    port = int(os.environ.get('PORT', 5000))
-    debug_mode = os.environ.get('DEBUG', 'False').lower() == 'true'
-    
-    print(f"Starting RPG Adventure WebUI on port {port}...")
-    print(f"Debug mode: {'ON' if debug_mode else 'OFF'}")
     
-    # Pre-check Ollama status
-    ollama_status = check_ollama_health()
-    tts_status = check_tts_health()
+    # Each follower holds a worker thread until it disconnects or times out
+    if LOG_FOLLOWERS is None or not LOG_FOLLOWERS.acquire(blocking=False):
+        return "Too many log followers", 429, {"Retry-After": str(int(LOG_FOLLOW_SECONDS))}
+
+    def generate():
+        for line in lines:
+            yield sse_event("log", {"line": line})
+        for line in follow(log_filename, offset, duration=LOG_FOLLOW_SECONDS):
+            # None is a keepalive, so a closed connection is noticed while the log is quiet
+            yield sse_event("log", {"line": line}) if line is not None else ": keepalive\n\n"
+        yield sse_event("done", {"reason": "timeout"})
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+    # Runs when the server closes the response, even if the generator never started
+    response.call_on_close(LOG_FOLLOWERS.release)
+    return response
+
+def startup_checks():
+    """Probe the backends once before serving and report their status"""
+    ollama_status = HEALTH_MONITOR.refresh("ollama")
+    tts_status = HEALTH_MONITOR.refresh("tts")
     
     print(f"Ollama status: {ollama_status['status']}")
     print(f"TTS status: {tts_status['status']}")
@@ -1124,6 +2351,31 @@ if __name__ == '__main__':
     if ollama_status['status'] != 'up':
         print("WARNING: Ollama is not running. AI features will not work.")
     
+    # Optionally synthesize the role starters before the first player arrives
+    if os.getenv('TTS_PREWARM', 'false').lower() == 'true' and tts_status['status'] == 'up':
+        start_tts_prewarm()
+    
+    # Optionally fill the opening pool for the default model before the first player arrives
+    if OPENING_POOL is not None and os.getenv('OPENING_POOL_PREWARM', 'false').lower() == 'true' and ollama_status['status'] == 'up':
+        models = MODEL_REGISTRY.get()
+        voices = VOICE_REGISTRY.get()
+        if models:
+            # Players who keep the default voice get voices[0]
+            OPENING_POOL.fill(
+                opening_key(models[0], genre, role, False, voices[0] if voices else DEFAULT_TTS_VOICE)
+                for genre, roles in ROLE_STARTERS.items()
+                for role in roles
+            )
+
+if __name__ == '__main__':
+    # Threaded development server; production runs asgi.py (see README)
+    port = int(os.environ.get('PORT', 5000))
+    debug_mode = os.environ.get('DEBUG', 'False').lower() == 'true'
+    
+    print(f"Starting RPG Adventure WebUI development server on port {port}...")
+    print(f"Debug mode: {'ON' if debug_mode else 'OFF'}")
+    startup_checks()
+    
     try:
         app.run(
             host='0.0.0.0', 
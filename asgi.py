@@ -0,0 +1,496 @@
+"""Production entry point: serves the app on an asyncio event loop.
+
+    python asgi.py
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+The game loop endpoints (POST /setup, POST /command, their streamed
+versions and /health) run as coroutines. While a turn waits on Ollama it
+holds no thread, only an open socket in a shared non-blocking connection
+pool, so one process can keep hundreds of turns in flight. Session and prompt work around the AI call runs
+in short thread-pool hops. Every other route is the unchanged Flask app,
+run on a thread pool of WSGI_THREADS threads.
+
+Run a single process: sessions, pending streams and TTS jobs live in memory.
+"""
+import asyncio
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from flask.ctx import RequestContext
+
+import app as webui
+from app import Response, app, request
+from backend_clients import HTTP_CONNECT_TIMEOUT
+from llm_scheduler import SchedulerBusy
+
+ASYNC_POOL_SIZE = int(os.getenv('ASYNC_POOL_SIZE', 200))
+WSGI_THREADS = int(os.getenv('WSGI_THREADS', 32))
+
+WSGI_EXECUTOR = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix="wsgi")
+
+_client = None
+
+
+def get_client():
+    """Shared non-blocking HTTP client, created on the serving event loop"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(60, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=ASYNC_POOL_SIZE, max_keepalive_connections=ASYNC_POOL_SIZE)
+        )
+    return _client
+
+
+async def async_ai_response(prompt, model, censored=False, max_retries=3, context=None, meta=None, session_id=None):
+    """Non-blocking twin of app.get_ai_response, with the same routing, breakers and retries"""
+    if not model:
+        return "No AI model selected. Please choose a model first."
+
+    payload = webui.build_generation_payload(prompt, model, censored, context=context)
+
+    for attempt in range(max_retries):
+        # Skip the call entirely while every backend is known to be down
+        backend = webui.OLLAMA_POOL.choose(model, session_id)
+        if backend is None:
+            return "Ollama is not running. Please start Ollama service."
+        try:
+            start = time.perf_counter()
+            with webui.OLLAMA_POOL.lease(backend):
+                response = await get_client().post(backend.api_url, json=payload)
+            backend.breaker.record_success()
+            response.raise_for_status()
+            json_resp = response.json()
+
+            # Validate response content
+            if not json_resp.get("response", "").strip():
+                raise ValueError("Empty response from AI")
+
+            if meta is not None:
+                meta.update({field: json_resp.get(field) for field in webui.GENERATION_META_FIELDS})
+            elapsed = time.perf_counter() - start
+            webui.STAGE_SECONDS.observe(elapsed, "generation", model)
+            webui.observe_generation(model, json_resp, elapsed)
+
+            return json_resp["response"].strip()
+
+        except (httpx.ConnectError, httpx.TimeoutException) as e:
+            logging.error(f"Ollama connection error on {backend.url} (attempt {attempt+1}/{max_retries}): {e}")
+            backend.breaker.record_failure()
+            webui.OLLAMA_ERRORS.inc(1, model)
+            if attempt < max_retries - 1 and not webui.OLLAMA_POOL.is_open():
+                await asyncio.sleep(2)
+                continue
+            return "Ollama connection failed. Check if Ollama is running and accessible."
+
+        except Exception as e:
+            logging.error(f"Unexpected error in async_ai_response: {e}")
+            logging.error(traceback.format_exc())
+            webui.OLLAMA_ERRORS.inc(1, model)
+            if attempt < max_retries - 1:
+                await asyncio.sleep(1)
+                continue
+            return "An error occurred while processing your request. Check server logs for details."
+
+    return "AI failed to respond after multiple attempts."
+
+
+async def async_stream_ai_response(prompt, model, censored=False, context=None, meta=None, session_id=None):
+    """Non-blocking twin of app.stream_ai_response: yield tokens as Ollama generates them"""
+    backend = webui.OLLAMA_POOL.choose(model, session_id) if model else None
+    if backend is None:
+        return
+
+    payload = webui.build_generation_payload(prompt, model, censored, stream=True, context=context)
+    start = time.perf_counter()
+
+    try:
+        # Ollama streams one JSON object per line until "done" is set
+        with webui.OLLAMA_POOL.lease(backend):
+            async with get_client().stream("POST", backend.api_url, json=payload) as response:
+                backend.breaker.record_success()
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    token = chunk.get("response", "")
+                    if token:
+                        yield token
+                    if chunk.get("done"):
+                        if meta is not None:
+                            meta.update({field: chunk.get(field) for field in webui.GENERATION_META_FIELDS})
+                        elapsed = time.perf_counter() - start
+                        webui.STAGE_SECONDS.observe(elapsed, "generation", model)
+                        webui.observe_generation(model, chunk, elapsed)
+                        break
+    except (httpx.ConnectError, httpx.TimeoutException) as e:
+        logging.error(f"Ollama streaming connection error on {backend.url}: {e}")
+        backend.breaker.record_failure()
+        webui.OLLAMA_ERRORS.inc(1, model)
+    except Exception as e:
+        logging.error(f"Ollama streaming error: {e}")
+        webui.OLLAMA_ERRORS.inc(1, model)
+
+
+async def run_turn_async(turn, session_id):
+    """Run a turn generator, awaiting its AI calls on the event loop.
+
+    The steps between AI calls touch the session (possibly SQLite) and may
+    synthesize TTS inline, so they run in the thread pool; asyncio.to_thread
+    copies the context, so the Flask request context goes with them. Queued
+    calls wait for their scheduler slot on the loop as well.
+    """
+    ai_call, response = await asyncio.to_thread(webui.step_turn, turn)
+    while ai_call is not None:
+        try:
+            ticket = await webui.LLM_SCHEDULER.acquire_async(session_id)
+        except SchedulerBusy as e:
+            turn.close()
+            return webui.busy_response(e)
+        with ticket:
+            reply = await async_ai_response(session_id=session_id, **ai_call)
+        ai_call, response = await asyncio.to_thread(webui.step_turn, turn, reply)
+    return response
+
+
+async def read_body(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        body.extend(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return bytes(body)
+
+
+def build_environ(scope, body):
+    """Translate an ASGI HTTP scope into a WSGI environ (PEP 3333)"""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client")
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0] if client else "",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def encode_headers(headers):
+    return [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+
+
+async def push_request_context(scope, body):
+    """Push a Flask request context whose session was opened in the thread pool.
+
+    Opening the session may read SQLite, so it is done in a thread-pool hop
+    before the context is pushed on the event loop.
+    """
+    environ = build_environ(scope, body)
+    flask_request = app.request_class(environ)
+    flask_request.json_module = app.json
+    session = await asyncio.to_thread(app.session_interface.open_session, app, flask_request)
+    if session is None:
+        session = app.session_interface.make_null_session(app)
+    ctx = RequestContext(app, environ, flask_request, session)
+    ctx.push()
+    return ctx
+
+
+async def serve_turn(scope, receive, send, make_turn):
+    """Serve a game loop endpoint as a coroutine inside a Flask request context"""
+    body = await read_body(receive)
+    ctx = await push_request_context(scope, body)
+    try:
+        try:
+            # before_request handlers may write the trace file
+            response = await asyncio.to_thread(app.preprocess_request)
+            if response is None and make_turn is webui.command_turn and webui.profiling_requested():
+                # Profiled turns run blocking on one thread so the profilers see all of it
+                response = await asyncio.to_thread(webui.profile_command, lambda: webui.run_turn(make_turn(request.form)))
+            elif response is None:
+                response = await run_turn_async(make_turn(request.form), webui.get_session_id())
+            response = app.make_response(response)
+            # Saving the session may write to SQLite
+            response = await asyncio.to_thread(app.process_response, response)
+        except Exception as e:
+            logging.exception(f"Error serving {scope['path']}: {e}")
+            response = app.make_response(({"status": "error", "message": "Internal server error"}, 500))
+        await send({
+            "type": "http.response.start",
+            "status": response.status_code,
+            "headers": encode_headers(response.headers.items())
+        })
+        await send({"type": "http.response.body", "body": response.get_data()})
+    finally:
+        ctx.pop()
+
+
+async def serve_health(send):
+    body = json.dumps({
+        "status": "healthy",
+        "ollama": webui.HEALTH_MONITOR.status("ollama"),
+        "tts": webui.HEALTH_MONITOR.status("tts"),
+        "llm_scheduler": webui.LLM_SCHEDULER.stats()
+    }).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def wait_for_disconnect(receive):
+    """Return once the client goes away; the request body must already be read"""
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def stream_narration(send, session_id, turn_id, prompt, model, censored, prefix="", context=None, tts_job=None, reply=None):
+    """Coroutine twin of app.stream_turn: queue for a slot and stream the tokens as they arrive"""
+    narration = webui.NarrationStream(turn_id, censored, prefix, tts_job)
+
+    async def emit(*events):
+        for event in events:
+            await send({"type": "http.response.body", "body": event.encode("utf-8"), "more_body": True})
+
+    await emit(narration.start())
+    if reply is not None:
+        await emit(*narration.feed(reply), *narration.finish({}))
+        return
+
+    scheduler = webui.LLM_SCHEDULER
+    try:
+        ticket = scheduler.enqueue(session_id)
+        try:
+            deadline = time.time() + scheduler.queue_timeout
+            while not await ticket.wait_async(1):
+                if time.time() > deadline:
+                    scheduler.expire(ticket)
+                await emit(webui.sse_event("queued", {"position": ticket.position()}))
+        except BaseException:
+            # Also runs when the client disconnects while queued
+            ticket.release()
+            raise
+    except SchedulerBusy as e:
+        await emit(narration.busy(e))
+        return
+
+    with ticket:
+        meta = {}
+        tokens = async_stream_ai_response(prompt, model, censored, context=context, meta=meta, session_id=session_id)
+        try:
+            async for token in tokens:
+                await emit(*narration.feed(token))
+        finally:
+            # Close the Ollama request now if the stream is cancelled between tokens
+            await tokens.aclose()
+        await emit(*narration.finish(meta))
+
+
+async def serve_stream(scope, receive, send, open_stream):
+    """Serve a streamed turn as a coroutine.
+
+    The form is checked and the turn registered in a thread-pool hop inside
+    the Flask request context; the scheduler wait and the tokens are then
+    streamed from the event loop, so a queued or generating stream holds no
+    thread. A client that disconnects cancels the stream, which releases its
+    scheduler ticket and closes the Ollama request.
+    """
+    body = await read_body(receive)
+    ctx = await push_request_context(scope, body)
+    try:
+        def open_turn():
+            response = app.preprocess_request()
+            stream = None
+            if response is None:
+                stream = open_stream(request.form)
+                if isinstance(stream, dict) and open_stream is webui.open_command_stream and webui.profiling_requested():
+                    # Profiled turns run blocking on this thread so the profilers see all of it
+                    response, stream = webui.profile_stream(stream), None
+                elif isinstance(stream, dict):
+                    stream["session_id"] = webui.get_session_id()
+                    response = Response(mimetype="text/event-stream", headers=webui.STREAM_HEADERS)
+                else:
+                    response, stream = stream, None
+            # Saving the session may write to SQLite
+            return stream, app.process_response(app.make_response(response))
+
+        try:
+            stream, response = await asyncio.to_thread(open_turn)
+        except Exception as e:
+            logging.exception(f"Error serving {scope['path']}: {e}")
+            stream, response = None, app.make_response(({"status": "error", "message": "Internal server error"}, 500))
+        await send({
+            "type": "http.response.start",
+            "status": response.status_code,
+            "headers": encode_headers(response.headers.items())
+        })
+        if stream is None:
+            await send({"type": "http.response.body", "body": response.get_data()})
+            return
+
+        streaming = asyncio.create_task(stream_narration(send, **stream))
+        watcher = asyncio.create_task(wait_for_disconnect(receive))
+        try:
+            await asyncio.wait({streaming, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            streaming.cancel()
+            watcher.cancel()
+        if streaming.done() and not streaming.cancelled():
+            if streaming.exception() is not None:
+                logging.error(f"Error streaming {scope['path']}: {streaming.exception()}")
+            await send({"type": "http.response.body", "body": b""})
+    finally:
+        ctx.pop()
+
+
+async def serve_wsgi(scope, receive, send):
+    """Run the Flask app on the WSGI thread pool, streaming its body as it is produced.
+
+    Sending to a closed connection does not fail, so the client's
+    http.disconnect is watched for instead: the worker thread then stops at
+    the next chunk and closes the response, which runs the generator's
+    cleanup (releasing a scheduler ticket, closing a followed log).
+    """
+    body = await read_body(receive)
+    environ = build_environ(scope, body)
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    disconnected = threading.Event()
+
+    def emit(*event):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    def start_response(status, headers, exc_info=None):
+        emit("start", int(status.split(" ", 1)[0]), headers)
+        return lambda data: emit("body", data)
+
+    def run():
+        try:
+            result = app(environ, start_response)
+            try:
+                for chunk in result:
+                    if disconnected.is_set():
+                        break
+                    if chunk:
+                        emit("body", chunk)
+            finally:
+                if hasattr(result, "close"):
+                    result.close()
+        except Exception as e:
+            logging.exception(f"Error serving {scope['path']}: {e}")
+            emit("error")
+        else:
+            emit("end")
+
+    loop.run_in_executor(WSGI_EXECUTOR, run)
+    watcher = asyncio.create_task(wait_for_disconnect(receive))
+    watcher.add_done_callback(lambda task: disconnected.set())
+
+    started = False
+    try:
+        while True:
+            event = await events.get()
+            kind = event[0]
+            if kind in ("end", "error"):
+                if not disconnected.is_set():
+                    if not started:
+                        await send({"type": "http.response.start", "status": 500, "headers": [(b"content-type", b"text/plain")]})
+                    await send({"type": "http.response.body", "body": b""})
+                return
+            if disconnected.is_set():
+                continue
+            if kind == "start":
+                await send({"type": "http.response.start", "status": event[1], "headers": encode_headers(event[2])})
+                started = True
+            else:
+                await send({"type": "http.response.body", "body": event[1], "more_body": True})
+    finally:
+        watcher.cancel()
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if _client is not None:
+                await _client.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+# Game loop endpoints served as coroutines; everything else goes to the Flask app
+ASYNC_TURNS = {
+    ("POST", "/setup"): webui.setup_turn,
+    ("POST", "/command"): webui.command_turn
+}
+ASYNC_STREAMS = {
+    ("POST", "/setup/stream"): webui.open_setup_stream,
+    ("POST", "/command/stream"): webui.open_command_stream
+}
+
+
+async def application(scope, receive, send):
+    """ASGI application"""
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    route = (scope["method"], scope["path"])
+    if route in ASYNC_TURNS:
+        await serve_turn(scope, receive, send, ASYNC_TURNS[route])
+    elif route in ASYNC_STREAMS:
+        await serve_stream(scope, receive, send, ASYNC_STREAMS[route])
+    elif route == ("GET", "/health"):
+        await serve_health(send)
+    else:
+        await serve_wsgi(scope, receive, send)
+
+
+def main():
+    import uvicorn
+
+    port = int(os.environ.get('PORT', 5000))
+    print(f"Starting RPG Adventure WebUI on port {port}...")
+    webui.startup_checks()
+    uvicorn.run(application, host=os.environ.get('HOST', '0.0.0.0'), port=port, log_level="warning")
+
+
+if __name__ == '__main__':
+    main()
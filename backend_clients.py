@@ -0,0 +1,79 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 10))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3.05))
+
+
+class BackendClient:
+    """Keep-alive HTTP client with its own connection pool for one backend.
+
+    A single instance is shared by all request threads; urllib3's pools are
+    thread-safe, and the counters here are guarded by a lock.
+    """
+
+    def __init__(self, name, pool_size=HTTP_POOL_SIZE, connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=60):
+        self.name = name
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+
+    def request(self, method, url, timeout=None, **kwargs):
+        """Send a request; timeout is the read timeout in seconds"""
+        with self._lock:
+            self._requests += 1
+        try:
+            return self.session.request(
+                method,
+                url,
+                timeout=(self.connect_timeout, timeout or self.read_timeout),
+                **kwargs
+            )
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self._errors += 1
+            raise
+
+    def get(self, url, timeout=None, **kwargs):
+        return self.request("GET", url, timeout=timeout, **kwargs)
+
+    def post(self, url, timeout=None, **kwargs):
+        return self.request("POST", url, timeout=timeout, **kwargs)
+
+    def stats(self):
+        """Pool hits (reused connections) and misses (new connections)"""
+        pools = self.adapter.poolmanager.pools
+        opened = 0
+        pooled_requests = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+                pooled_requests += pool.num_requests
+        with self._lock:
+            total, errors = self._requests, self._errors
+        return {
+            "requests": total,
+            "errors": errors,
+            "pool_hits": max(pooled_requests - opened, 0),
+            "pool_misses": opened,
+            "pool_size": self.pool_size
+        }
+
+
+OLLAMA_CLIENT = BackendClient("ollama", read_timeout=60)
+ALLTALK_CLIENT = BackendClient("alltalk", read_timeout=10)
+
+
+def get_pool_stats():
+    """Connection pool statistics for every backend client"""
+    return {client.name: client.stats() for client in (OLLAMA_CLIENT, ALLTALK_CLIENT)}
@@ -0,0 +1,76 @@
+"""Compare prompt-eval cost of full-history prompts against KV context reuse.
+
+Plays the same scripted adventure twice against a running Ollama instance:
+once resending the whole history every turn (the old behaviour) and once
+continuing from the `context` returned by the previous turn. Prints the
+prompt tokens evaluated and prompt-eval time for each turn.
+
+    python -m benchmarks.kv_context --model llama3:instruct --turns 12
+"""
+import argparse
+import requests
+
+from app import DM_SYSTEM_PROMPT, build_generation_payload
+
+ACTIONS = [
+    "I draw my sword and step into the torchlit hall",
+    "I ask the old guard what happened here",
+    "I search the fallen soldier's pack",
+    "I follow the bloody footprints toward the stairs",
+    "I call out to whoever is hiding upstairs",
+    "I light a lantern and study the strange runes on the wall",
+    "I offer the frightened child some bread",
+    "I barricade the door with a heavy table",
+    "I climb onto the roof to look for the invaders",
+    "I signal the rangers with my horn",
+    "I bend the story so that the gate holds",
+    "I lead the villagers into the cellar",
+]
+
+
+def generate(url, model, prompt, context=None):
+    payload = build_generation_payload(prompt, model, context=context)
+    payload["options"]["seed"] = 42
+    response = requests.post(f"{url}/api/generate", json=payload, timeout=300)
+    response.raise_for_status()
+    return response.json()
+
+
+def play(url, model, turns, reuse_context):
+    system_prompt = DM_SYSTEM_PROMPT.format(character_name="Alex", role="Knight", genre="Fantasy")
+    conversation = "### Adventure Setting ###\nGenre: Fantasy\nPlayer Character: Alex the Knight\n"
+    context = None
+    results = []
+    for turn in range(turns):
+        line = f"Player: {ACTIONS[turn % len(ACTIONS)]}\nDungeon Master:"
+        if reuse_context and context:
+            reply = generate(url, model, "\n" + line, context)
+        else:
+            reply = generate(url, model, system_prompt + "\n\n" + conversation + "\n" + line)
+        context = reply.get("context")
+        conversation += "\n" + line + " " + reply.get("response", "").strip()
+        results.append((reply.get("prompt_eval_count") or 0, (reply.get("prompt_eval_duration") or 0) / 1e6))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:11434")
+    parser.add_argument("--model", default="llama3:instruct")
+    parser.add_argument("--turns", type=int, default=10)
+    args = parser.parse_args()
+
+    full = play(args.url, args.model, args.turns, reuse_context=False)
+    reused = play(args.url, args.model, args.turns, reuse_context=True)
+
+    print(f"{'turn':>4} | {'full tokens':>11} {'full ms':>9} | {'ctx tokens':>10} {'ctx ms':>9} | {'saved ms':>9}")
+    for turn, ((full_tokens, full_ms), (ctx_tokens, ctx_ms)) in enumerate(zip(full, reused), 1):
+        print(f"{turn:>4} | {full_tokens:>11} {full_ms:>9.1f} | {ctx_tokens:>10} {ctx_ms:>9.1f} | {full_ms - ctx_ms:>9.1f}")
+    full_total = sum(ms for _, ms in full)
+    ctx_total = sum(ms for _, ms in reused)
+    print(f"prompt eval total: full {full_total:.1f} ms, context reuse {ctx_total:.1f} ms, "
+          f"saved {full_total - ctx_total:.1f} ms ({(full_total - ctx_total) / max(args.turns, 1):.1f} ms/turn)")
+
+
+if __name__ == "__main__":
+    main()
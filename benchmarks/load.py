@@ -0,0 +1,246 @@
+"""Load-test the web UI against stub Ollama and AllTalk servers.
+
+Starts the stubs from benchmarks.stubs and the app (app.py or asgi.py) in
+a subprocess pointed at them. It then drives --players concurrent simulated
+players, each with its own cookie jar, through GET /, POST /setup and
+--turns POST /command calls. With --stream, setup and turns go through
+/setup/stream and /command/stream instead, each with its finish call.
+It reports p50/p95/p99 latency per endpoint, requests per second and the
+server's resident memory. Nothing is needed beyond this repo, so it runs
+offline; it exits non-zero when the error rate exceeds --max-error-rate.
+
+    python -m benchmarks.load --players 20 --turns 5 --server asgi
+    python -m benchmarks.load --players 50 --stream --latency 0.5 --env LLM_MAX_CONCURRENT=8
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks import stubs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ACTIONS = [
+    "I draw my sword and step into the torchlit hall",
+    "I ask the old guard what happened here",
+    "I search the fallen soldier's pack",
+    "I follow the bloody footprints toward the stairs",
+    "I light a lantern and study the strange runes on the wall",
+    "I barricade the door with a heavy table",
+]
+GENRES = ["1", "2", "3", "4"]
+ROLES = ["Knight", "Mage", "Hacker", "Scavenger"]
+
+
+class Results:
+    """Latencies and failures per endpoint, shared by the player threads"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, seconds, ok):
+        with self.lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def total(self):
+        return sum(len(values) for values in self.latencies.values())
+
+    def total_errors(self):
+        return sum(self.errors.values())
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(server, port, ollama_url, alltalk_url, extra_env, workdir):
+    env = dict(os.environ)
+    env.update({
+        "PORT": str(port),
+        "HOST": "127.0.0.1",
+        "OLLAMA_URLS": ollama_url,
+        "TTS_API_URL": f"{alltalk_url}/api/tts-generate",
+        "TTS_AUDIO_URL": f"{alltalk_url}/outputs",
+        "PYTHONPATH": ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    env.update(extra_env)
+    script = os.path.join(ROOT, "asgi.py" if server == "asgi" else "app.py")
+    # The app writes its log, TTS cache and journals to the working directory
+    return subprocess.Popen([sys.executable, script], cwd=workdir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_up(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if requests.get(f"{url}/health", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server did not answer {url}/health within {timeout}s")
+
+
+def memory(pid):
+    """(resident, peak resident) bytes of a process, from /proc; None where that isn't available"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["VmRSS"].split()[0]) * 1024, int(fields["VmHWM"].split()[0]) * 1024
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def timed(results, endpoint, call):
+    start = time.perf_counter()
+    try:
+        response = call()
+        ok = response.status_code < 400
+        if ok and "json" in response.headers.get("Content-Type", ""):
+            ok = response.json().get("status") != "error"
+    except requests.RequestException:
+        response, ok = None, False
+    results.record(endpoint, time.perf_counter() - start, ok)
+    return response if ok else None
+
+
+def streamed(results, client, url, path, form):
+    """Time a whole streamed turn: the token stream plus the finish call that saves it"""
+    start = time.perf_counter()
+    ok = False
+    try:
+        response = client.post(f"{url}{path}", data=form, timeout=120)
+        turn_ids = [json.loads(line[6:]).get("turn_id") for line in response.text.splitlines()
+                    if line.startswith("data:") and "turn_id" in line]
+        if response.status_code < 400 and turn_ids:
+            finish = client.post(f"{url}/command/stream/finish", data={"turn_id": turn_ids[-1]}, timeout=60)
+            ok = finish.status_code < 400 and finish.json().get("status") != "error"
+    except (requests.RequestException, ValueError):
+        pass
+    results.record(f"POST {path}", time.perf_counter() - start, ok)
+    return ok
+
+
+def play(url, player, turns, stream, results, start_barrier):
+    client = requests.Session()
+    rng = random.Random(player)
+    start_barrier.wait()
+    if timed(results, "GET /", lambda: client.get(f"{url}/", timeout=60)) is None:
+        return
+    setup = {"genre": rng.choice(GENRES), "role": rng.choice(ROLES), "character_name": f"Player{player}"}
+    if stream:
+        if not streamed(results, client, url, "/setup/stream", setup):
+            return
+    elif timed(results, "POST /setup", lambda: client.post(f"{url}/setup", data=setup, timeout=120)) is None:
+        return
+    for turn in range(turns):
+        command = {"command": ACTIONS[(player + turn) % len(ACTIONS)]}
+        if stream:
+            streamed(results, client, url, "/command/stream", command)
+        else:
+            timed(results, "POST /command", lambda: client.post(f"{url}/command", data=command, timeout=120))
+
+
+def report(results, elapsed, memory_before, memory_after):
+    print(f"{'endpoint':<24} {'requests':>8} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for endpoint, values in results.latencies.items():
+        values = sorted(values)
+        print(f"{endpoint:<24} {len(values):>8} {results.errors.get(endpoint, 0):>6}"
+              f" {percentile(values, 0.50) * 1000:>9.1f} {percentile(values, 0.95) * 1000:>9.1f}"
+              f" {percentile(values, 0.99) * 1000:>9.1f} {values[-1] * 1000:>9.1f}")
+    print(f"{results.total()} requests in {elapsed:.2f} s: {results.total() / elapsed:.1f} requests/s, {results.total_errors()} errors")
+    if memory_before and memory_after:
+        print(f"server memory: {memory_before[0] / 2**20:.1f} MiB before, {memory_after[0] / 2**20:.1f} MiB after,"
+              f" peak {memory_after[1] / 2**20:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=5, help="commands per player after setup")
+    parser.add_argument("--server", choices=("flask", "asgi"), default="asgi")
+    parser.add_argument("--stream", action="store_true", help="play setup and turns through the streaming endpoints")
+    parser.add_argument("--latency", type=float, default=0.1, help="stub Ollama seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--reply-tokens", type=int, default=60)
+    parser.add_argument("--tts-latency", type=float, default=0.05)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra server environment")
+    parser.add_argument("--url", help="load an already running server instead of starting one")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    ollama = alltalk = process = workdir = None
+    url = args.url
+    if url is None:
+        ollama = stubs.start_ollama(latency=args.latency, tokens_per_second=args.tokens_per_second, reply_tokens=args.reply_tokens)
+        alltalk = stubs.start_alltalk(latency=args.tts_latency)
+        extra_env = dict(item.split("=", 1) for item in args.env)
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        workdir = tempfile.mkdtemp(prefix="rpg-load-")
+        process = start_server(args.server, port, ollama.url, alltalk.url, extra_env, workdir)
+
+    try:
+        if process is not None:
+            wait_until_up(url, process)
+            print(f"{args.server} server on {url}")
+        memory_before = memory(process.pid) if process is not None else None
+
+        results = Results()
+        barrier = threading.Barrier(args.players + 1)
+        players = [threading.Thread(target=play, args=(url, player, args.turns, args.stream, results, barrier))
+                   for player in range(args.players)]
+        for player in players:
+            player.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for player in players:
+            player.join()
+        elapsed = time.perf_counter() - start
+
+        memory_after = memory(process.pid) if process is not None else None
+        report(results, elapsed, memory_before, memory_after)
+        if ollama is not None:
+            print(f"stub requests: Ollama {ollama.requests}, AllTalk {alltalk.requests}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    error_rate = results.total_errors() / max(results.total(), 1)
+    if error_rate > args.max_error_rate:
+        print(f"Error rate {error_rate:.1%} is above {args.max_error_rate:.1%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
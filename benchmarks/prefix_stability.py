@@ -0,0 +1,77 @@
+"""Check that consecutive turns share a byte-identical prompt prefix.
+
+Backends cache the evaluated prompt prefix, so everything before the world
+state block must stay unchanged from one turn to the next. This plays a
+scripted adventure through the app's prompt assembly (no Ollama needed),
+reports how much of each prompt is reusable, and exits non-zero if the
+prefix changed between turns. Past the token budget the history is trimmed
+in blocks; those turns are counted separately and may change the prefix.
+
+    python -m benchmarks.prefix_stability --turns 20
+"""
+import argparse
+import os
+import sys
+
+import app
+
+ACTIONS = [
+    "I search the ruined chapel",
+    "I ask the innkeeper about the missing caravan",
+    "create npc Brother Aldric",
+    "I follow the tracks into the forest",
+    "suddenly, a storm rolls over the hills",
+    "I trade my dagger for a map",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+
+    # Exercise the full-history layout, not the KV continuation
+    app.KV_CONTEXT_REUSE = False
+    failures = 0
+    trims = 0
+    with app.app.test_request_context():
+        app.init_session()
+        app.session.update({
+            "character_name": "Alex",
+            "role": "Knight",
+            "selected_genre": "Fantasy",
+            "ollama_model": "llama3:instruct",
+            "conversation": "### Adventure Setting ###\nGenre: Fantasy\n\n\nDungeon Master: The gates burn.",
+        })
+        previous = None
+        for turn in range(args.turns):
+            action = ACTIONS[turn % len(ACTIONS)]
+            if action.startswith("create "):
+                app.get_world().create("ally", action.split(" ", 2)[2])
+                app.bump_world_version()
+                continue
+            formatted = app.process_narrative_command(action)
+            prompt, _ = app.build_command_prompt(formatted)
+            stable = prompt[:prompt.index("Current World State:")]
+            trimmed = app.session['prompt_usage']['turns_trimmed']
+            trims += bool(trimmed)
+            if previous is not None:
+                ok = prompt.startswith(previous) or trimmed
+                failures += not ok
+                reusable = len(os.path.commonprefix([previous, prompt]))
+                note = f"  TRIMMED {trimmed} TURNS" if trimmed else "" if ok else "  PREFIX CHANGED"
+                print(f"turn {turn:>3}: prompt {len(prompt):>6} bytes, reusable prefix {reusable:>6} bytes"
+                      f" ({reusable / len(prompt):.0%}){note}")
+            previous = stable
+            reply = f"The world answers your choice number {turn}. A guard joins you."
+            app.session['conversation'] += "\n" + formatted + "\nDungeon Master: " + reply
+            app.update_world_state(action, reply, app.get_world())
+
+    if failures:
+        print(f"{failures} turn(s) broke the prompt prefix")
+        sys.exit(1)
+    print(f"prompt prefix stable across all turns except {trims} history trim(s)")
+
+
+if __name__ == "__main__":
+    main()
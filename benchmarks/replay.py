@@ -0,0 +1,217 @@
+"""Replay recorded player sessions against a running instance and compare builds.
+
+Record traces by running the app with TRACE_DIR=traces; each run writes
+its own file, and several can be replayed together. Each recorded session replays on its own thread with its own cookies:
+GET / first, then its /setup, /command and settings requests with the
+recorded spacing, divided by --speed (0 sends each request as soon as the
+previous answer arrives). Streamed turns are finished like the browser
+does. Idle stretches longer than --max-gap are shortened to it. The report
+gives latency per endpoint, plus the backend calls made during the
+replay, read from the instance's /metrics.
+
+    python -m benchmarks.replay traces/*.trace.gz --url http://localhost:5000 --speed 4 --output base.json
+    python -m benchmarks.replay traces/*.trace.gz --url http://localhost:5001 --speed 4 --output new.json
+    python -m benchmarks.replay --compare base.json new.json
+"""
+import argparse
+import json
+import math
+import threading
+import time
+
+import requests
+
+from benchmarks.load import Results, percentile
+from trace_recorder import read_trace
+
+STREAMED = {"/setup/stream", "/command/stream"}
+# Counters from /metrics that count calls to the backends and the work they did
+BACKEND_SERIES = (
+    "rpg_ollama_request_seconds_count",
+    "rpg_ollama_errors_total",
+    "rpg_ollama_prompt_tokens_total",
+    "rpg_ollama_eval_tokens_total",
+    "rpg_stage_seconds_count",
+)
+
+
+def schedule(events, speed, max_gap):
+    """Group events by session, each with its send offset in seconds from the start of the replay"""
+    sessions = {}
+    offset = 0.0
+    previous = None
+    for event in events:
+        if previous is not None:
+            offset += min(event["time"] - previous, max_gap)
+        previous = event["time"]
+        sessions.setdefault(event["s"], []).append((offset / speed if speed else 0.0, event))
+    return sessions
+
+
+def scrape(url):
+    """Counter values from a /metrics page, keyed by series name with labels"""
+    values = {}
+    try:
+        response = requests.get(f"{url}/metrics", timeout=10)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"Could not read {url}/metrics: {e}")
+        return values
+    for line in response.text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        series, _, value = line.rpartition(" ")
+        if series.startswith(BACKEND_SERIES):
+            values[series] = float(value)
+    return values
+
+
+def send(client, url, event, model):
+    """Send one recorded request; True when it succeeded"""
+    path = event["p"]
+    form = dict(event["f"])
+    if model and "model" in form:
+        form["model"] = model
+    response = client.post(f"{url}{path}", data=form, timeout=300)
+    if response.status_code >= 400:
+        return False
+    if path in STREAMED and response.headers.get("Content-Type", "").startswith("text/event-stream"):
+        turn_ids = [json.loads(line[6:]).get("turn_id") for line in response.text.splitlines()
+                    if line.startswith("data:") and "turn_id" in line]
+        if not turn_ids:
+            return False
+        response = client.post(f"{url}/command/stream/finish", data={"turn_id": turn_ids[-1]}, timeout=60)
+        if response.status_code >= 400:
+            return False
+    if "json" in response.headers.get("Content-Type", ""):
+        return response.json().get("status") != "error"
+    return True
+
+
+def replay_session(url, timeline, model, started, results):
+    client = requests.Session()
+    try:
+        client.get(f"{url}/", timeout=60)
+    except requests.RequestException:
+        pass
+    for offset, event in timeline:
+        delay = started + offset - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        start = time.perf_counter()
+        try:
+            ok = send(client, url, event, model)
+        except (requests.RequestException, ValueError):
+            ok = False
+        results.record(event["p"], time.perf_counter() - start, ok)
+
+
+def replay(args):
+    events = read_trace(*args.traces)
+    sessions = schedule(events, args.speed, args.max_gap)
+    if args.sessions:
+        sessions = dict(list(sessions.items())[:args.sessions])
+    print(f"Replaying {sum(len(timeline) for timeline in sessions.values())} requests from {len(sessions)} sessions"
+          f" at {'full speed' if not args.speed else f'{args.speed:g}x'}")
+
+    before = scrape(args.url)
+    results = Results()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=replay_session, args=(args.url, timeline, args.model, started, results))
+               for timeline in sessions.values()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    after = scrape(args.url)
+
+    summary = {
+        "traces": args.traces,
+        "url": args.url,
+        "speed": args.speed,
+        "elapsed": round(elapsed, 3),
+        "endpoints": {},
+        "backend": {series: value - before.get(series, 0) for series, value in after.items()
+                    if value != before.get(series, 0)}
+    }
+    for endpoint, values in sorted(results.latencies.items()):
+        values = sorted(values)
+        summary["endpoints"][endpoint] = {
+            "requests": len(values),
+            "errors": results.errors.get(endpoint, 0),
+            "p50": percentile(values, 0.50),
+            "p95": percentile(values, 0.95),
+            "p99": percentile(values, 0.99),
+            "mean": sum(values) / len(values)
+        }
+    return summary
+
+
+def print_summary(summary):
+    print(f"{'endpoint':<20} {'requests':>8} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for endpoint, stats in summary["endpoints"].items():
+        print(f"{endpoint:<20} {stats['requests']:>8} {stats['errors']:>6} {stats['p50'] * 1000:>9.1f}"
+              f" {stats['p95'] * 1000:>9.1f} {stats['p99'] * 1000:>9.1f}")
+    print(f"replayed in {summary['elapsed']:.2f} s")
+    for series, value in sorted(summary["backend"].items()):
+        print(f"  {series} +{value:g}")
+
+
+def change(base, new):
+    if not base:
+        return "" if not new else "   new"
+    return f"{(new - base) / base:>+7.1%}"
+
+
+def compare(base_path, new_path):
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"base: {base['url']} ({base_path}), new: {new['url']} ({new_path})")
+    print(f"{'endpoint':<20} {'stat':<5} {'base ms':>9} {'new ms':>9} {'change':>8}")
+    for endpoint in sorted(set(base["endpoints"]) | set(new["endpoints"])):
+        old_stats = base["endpoints"].get(endpoint, {})
+        new_stats = new["endpoints"].get(endpoint, {})
+        for stat in ("p50", "p95", "p99"):
+            old_value = old_stats.get(stat, math.nan) * 1000
+            new_value = new_stats.get(stat, math.nan) * 1000
+            print(f"{endpoint:<20} {stat:<5} {old_value:>9.1f} {new_value:>9.1f} {change(old_value, new_value):>8}")
+        if old_stats.get("errors") or new_stats.get("errors"):
+            print(f"{endpoint:<20} {'errors':<5} {old_stats.get('errors', 0):>9} {new_stats.get('errors', 0):>9}")
+
+    print(f"{'backend calls':<56} {'base':>9} {'new':>9} {'change':>8}")
+    for series in sorted(set(base["backend"]) | set(new["backend"])):
+        old_value = base["backend"].get(series, 0)
+        new_value = new["backend"].get(series, 0)
+        print(f"{series:<56} {old_value:>9g} {new_value:>9g} {change(old_value, new_value):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("traces", nargs="*", help="trace files recorded with TRACE_DIR")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 for recorded timing, 10 for ten times faster, 0 for no waiting")
+    parser.add_argument("--max-gap", type=float, default=30.0, help="longest pause kept between requests, in recorded seconds")
+    parser.add_argument("--sessions", type=int, help="replay only the first N sessions")
+    parser.add_argument("--model", help="replace recorded model choices with this model")
+    parser.add_argument("--output", help="write the summary as JSON, for --compare")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two --output summaries")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if not args.traces:
+        parser.error("trace files are required unless --compare is given")
+
+    summary = replay(args)
+    print_summary(summary)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
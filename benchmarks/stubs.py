@@ -0,0 +1,185 @@
+"""Local stand-ins for Ollama and AllTalk, for benchmarks that must run offline.
+
+The Ollama stub answers /api/tags and /api/generate, streaming or not,
+after `latency` seconds of "prompt evaluation" and then `tokens_per_second`
+for `reply_tokens` tokens. It reports the same eval counters a real Ollama
+does. The AllTalk stub answers /api/tts-generate, /api/get-voices and
+serves a short silent WAV from /outputs/<name>.wav.
+
+    python -m benchmarks.stubs --latency 0.2 --tokens-per-second 40
+"""
+import argparse
+import io
+import json
+import sys
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "The torchlight gutters as the iron door grinds open. Beyond it a narrow stair "
+    "spirals down into the dark, and somewhere below a guard joins the chorus of "
+    "distant voices. You discover a hidden map folded inside your boot."
+).split()
+
+VOICES = ["FemaleBritishAccent_WhyLucyWhy_Voice_2.wav", "MaleAmericanAccent_WhyLucyWhy_Voice_1.wav"]
+
+
+def silent_wav(seconds=0.2, rate=16000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(b"\0\0" * int(seconds * rate))
+    return buffer.getvalue()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-stream are expected under load
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "StubServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type="application/json", status=200):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def count(self):
+        path = self.path.split("?")[0]
+        if path.startswith("/outputs/"):
+            path = "/outputs/"
+        with self.server.lock:
+            self.server.requests[path] = self.server.requests.get(path, 0) + 1
+
+
+class OllamaHandler(StubHandler):
+    def do_GET(self):
+        self.count()
+        if self.path.startswith("/api/tags"):
+            self.send_body({"models": [{"name": model, "model": model} for model in self.server.models]})
+        else:
+            self.send_body(b"Ollama is running", "text/plain")
+
+    def do_POST(self):
+        self.count()
+        request = json.loads(self.read_body() or b"{}")
+        if not self.path.startswith("/api/generate"):
+            self.send_body({"error": "not found"}, status=404)
+            return
+
+        config = self.server.config
+        tokens = [WORDS[i % len(WORDS)] + " " for i in range(config["reply_tokens"])]
+        eval_seconds = len(tokens) / config["tokens_per_second"]
+        final = {
+            "model": request.get("model"),
+            "done": True,
+            "context": [1, 2, 3],
+            "prompt_eval_count": len(request.get("prompt", "")) // 4,
+            "prompt_eval_duration": int(config["latency"] * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(eval_seconds * 1e9)
+        }
+        time.sleep(config["latency"])
+
+        if not request.get("stream", True):
+            time.sleep(eval_seconds)
+            self.send_body(dict(final, response="".join(tokens)))
+            return
+
+        # One JSON object per line, as chunked transfer encoding
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in tokens:
+            time.sleep(1 / config["tokens_per_second"])
+            self.write_chunk({"model": request.get("model"), "response": token, "done": False})
+        self.write_chunk(dict(final, response=""))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, data):
+        line = json.dumps(data).encode("utf-8") + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+
+class AllTalkHandler(StubHandler):
+    def do_GET(self):
+        self.count()
+        if self.path.startswith("/api/get-voices"):
+            self.send_body([{"voice": voice} for voice in VOICES])
+        elif self.path.startswith("/outputs/"):
+            self.send_body(self.server.wav, "audio/wav")
+        else:
+            self.send_body(b"AllTalk stub", "text/plain")
+
+    def do_POST(self):
+        self.count()
+        self.read_body()
+        time.sleep(self.server.config["tts_latency"])
+        self.send_body({"status": "generate-success"})
+
+
+def start(handler, port=0, **attributes):
+    """Serve handler on a daemon thread; returns the server (its url attribute is the base URL)"""
+    server = StubServer(("127.0.0.1", port), handler)
+    server.lock = threading.Lock()
+    server.requests = {}
+    for name, value in attributes.items():
+        setattr(server, name, value)
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, name=f"{handler.__name__}-stub", daemon=True).start()
+    return server
+
+
+def start_ollama(port=0, latency=0.1, tokens_per_second=50.0, reply_tokens=60, models=("stub:latest",)):
+    config = {"latency": latency, "tokens_per_second": tokens_per_second, "reply_tokens": reply_tokens}
+    return start(OllamaHandler, port, config=config, models=list(models))
+
+
+def start_alltalk(port=0, latency=0.05):
+    return start(AllTalkHandler, port, config={"tts_latency": latency}, wav=silent_wav())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ollama-port", type=int, default=11434)
+    parser.add_argument("--alltalk-port", type=int, default=7851)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--reply-tokens", type=int, default=60)
+    parser.add_argument("--tts-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    ollama = start_ollama(args.ollama_port, args.latency, args.tokens_per_second, args.reply_tokens)
+    alltalk = start_alltalk(args.alltalk_port, args.tts_latency)
+    print(f"Ollama stub on {ollama.url}, AllTalk stub on {alltalk.url}; Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
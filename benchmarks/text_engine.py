@@ -0,0 +1,85 @@
+"""Compare the compiled TextEngine with the old per-word loops on long replies.
+
+The legacy functions below are the pre-TextEngine implementations of
+banword masking and key-phrase detection, kept here for comparison.
+Before timing anything, the TextEngine results are checked: categories
+must match the legacy loop, and masking must match intended_censor. The
+legacy loop masked in list order, so a shorter banned phrase could break
+up a longer one ("blonde on blonde action" became "blonde on ****");
+TextEngine masks the longest phrase whole.
+
+    python -m benchmarks.text_engine --words 600 --repeat 50
+"""
+import argparse
+import random
+import re
+import timeit
+
+import app
+
+
+def legacy_censor(text):
+    for word in app.BANWORDS:
+        if word:
+            pattern = re.compile(r'\b' + re.escape(word) + r'\b', re.IGNORECASE)
+            text = pattern.sub('****', text)
+    return text
+
+
+def intended_censor(text):
+    """The legacy loop with the longest banned phrases masked first"""
+    for word in sorted(app.BANWORDS, key=len, reverse=True):
+        if word:
+            pattern = re.compile(r'\b' + re.escape(word) + r'\b', re.IGNORECASE)
+            text = pattern.sub('****', text)
+    return text
+
+
+def legacy_categories(response):
+    categories = set()
+    for category, phrases in app.KEY_PHRASES.items():
+        for phrase in phrases:
+            if phrase in response.lower():
+                categories.add(category)
+                break
+    return categories
+
+
+def make_reply(words, seed=7):
+    rng = random.Random(seed)
+    vocab = (
+        "the torchlight flickers across ancient stone as a hooded stranger joins you "
+        "beside the gate while distant guards shout and the fabric bends around "
+        "your outstretched hand revealing a hidden stair you enter carefully"
+    ).split()
+    vocab += rng.sample(app.BANWORDS, min(5, len(app.BANWORDS)))
+    return " ".join(rng.choice(vocab) for _ in range(words)) + "."
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=600)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    reply = make_reply(args.words)
+    assert legacy_categories(reply) == app.TEXT_ENGINE.detect_categories(reply)
+    assert intended_censor(reply) == app.TEXT_ENGINE.censor(reply)
+    every_phrase = " ".join(app.BANWORDS)
+    assert intended_censor(every_phrase) == app.TEXT_ENGINE.censor(every_phrase)
+    assert app.TEXT_ENGINE.censor("Blonde on blonde action, twice.") == "****, twice."
+
+    cases = [
+        ("censor (legacy loop)", lambda: legacy_censor(reply)),
+        ("censor (TextEngine)", lambda: app.TEXT_ENGINE.censor(reply)),
+        ("categories (legacy loop)", lambda: legacy_categories(reply)),
+        ("categories (TextEngine)", lambda: app.TEXT_ENGINE.detect_categories(reply)),
+    ]
+    print(f"reply: {args.words} words, {len(reply)} chars, {len(app.BANWORDS)} banned words")
+    for name, func in cases:
+        seconds = min(timeit.repeat(func, number=args.repeat, repeat=3)) / args.repeat
+        print(f"{name:<32} {seconds * 1000:>8.3f} ms/reply")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Compare the WorldState model with the old free-form player_choices dict.
+
+Plays the same scripted adventure into both representations, then reports
+the memory each holds and the time to serialize and load it the way a
+server-side session store does (JSON for the dict, to_bytes for
+WorldState). The legacy functions below are the pre-WorldState
+implementations, kept here for comparison.
+
+    python -m benchmarks.world_state --turns 500 --repeat 200
+"""
+import argparse
+import datetime
+import json
+import sys
+import timeit
+import tracemalloc
+from collections import defaultdict
+
+import app
+from world_state import WorldState
+
+ACTIONS = [
+    "I draw my sword and step into the torchlit hall",
+    "create npc Brother Aldric",
+    "I search the fallen soldier's pack",
+    "create item Moonsilver Key",
+    "I follow the bloody footprints toward the stairs",
+    "create location The Drowned Chapel",
+    "I bend the story so that the gate holds",
+    "create faction Ashen Wardens",
+]
+
+REPLIES = [
+    "A hooded stranger joins you beside the gate while the guards shout in alarm.",
+    "You find a rusted amulet and enter the crypt as the fabric bends around you.",
+    "The thieves guild watches from the rooftops; a mercenary attacks you without warning.",
+    "You arrive at the ruined keep and discover a hidden stair leading down.",
+]
+
+
+def legacy_player_choices():
+    return {
+        "allies": [],
+        "enemies": [],
+        "discoveries": [],
+        "reputation": 0,
+        "resources": {},
+        "factions": defaultdict(int),
+        "completed_quests": [],
+        "active_quests": [],
+        "world_events": [],
+        "consequences": [],
+        "player_creations": []
+    }
+
+
+def legacy_update(action, response, player_choices):
+    timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+    player_choices['consequences'].append(f"[{timestamp}] {action} → {response[:100]}...")
+    if len(player_choices['consequences']) > 5:
+        player_choices['consequences'] = player_choices['consequences'][-5:]
+    categories = app.TEXT_ENGINE.detect_categories(response)
+    for category in app.KEY_PHRASES:
+        if category in categories:
+            player_choices['world_events'].append(f"{timestamp}: {category.upper()} event")
+    if "reality" in categories:
+        player_choices['world_events'].append(f"{timestamp}: REALITY ALTERED")
+
+
+def legacy_create(entity_type, entity_name, player_choices):
+    if entity_type in ["npc", "character", "ally"]:
+        player_choices['allies'].append(entity_name)
+        player_choices['player_creations'].append(f"{entity_name} (NPC)")
+    elif entity_type in ["location", "place"]:
+        player_choices['discoveries'].append(entity_name)
+        player_choices['player_creations'].append(f"{entity_name} (Location)")
+    elif entity_type in ["item", "object", "artifact"]:
+        player_choices['resources'][entity_name] = 1
+        player_choices['player_creations'].append(f"{entity_name} (Item)")
+    elif entity_type in ["faction", "group"]:
+        player_choices['factions'][entity_name] = 0
+        player_choices['player_creations'].append(f"{entity_name} (Faction)")
+    if len(player_choices['player_creations']) > 5:
+        player_choices['player_creations'] = player_choices['player_creations'][-5:]
+
+
+def legacy_render(player_choices):
+    state = [
+        "### Current World State ###",
+        f"Allies: {', '.join(player_choices['allies']) if player_choices['allies'] else 'None'}",
+        f"Enemies: {', '.join(player_choices['enemies']) if player_choices['enemies'] else 'None'}",
+        f"Reputation: {player_choices['reputation']}",
+        f"Active Quests: {', '.join(player_choices['active_quests']) if player_choices['active_quests'] else 'None'}",
+        f"Completed Quests: {', '.join(player_choices['completed_quests']) if player_choices['completed_quests'] else 'None'}",
+    ]
+    if player_choices['resources']:
+        state.append("Resources:")
+        for resource, amount in player_choices['resources'].items():
+            state.append(f"  - {resource}: {amount}")
+    if player_choices['factions']:
+        state.append("Faction Relationships:")
+        for faction, level in player_choices['factions'].items():
+            state.append(f"  - {faction}: {'+' if level > 0 else ''}{level}")
+    for title, key in (("Recent World Events:", 'world_events'), ("Recent Consequences:", 'consequences'), ("Player Creations:", 'player_creations')):
+        if player_choices[key]:
+            state.append(title)
+            for entry in player_choices[key][-3:]:
+                state.append(f"  - {entry}")
+    return "\n".join(state)
+
+
+def play(turns, legacy):
+    state = legacy_player_choices() if legacy else WorldState()
+    for turn in range(turns):
+        action = ACTIONS[turn % len(ACTIONS)]
+        if action.startswith("create "):
+            _, entity_type, name = action.split(" ", 2)
+            name = f"{name} {turn}"
+            if legacy:
+                legacy_create(entity_type, name, state)
+            else:
+                state.create(entity_type, name)
+            continue
+        reply = REPLIES[turn % len(REPLIES)]
+        if legacy:
+            legacy_update(action, reply, state)
+        else:
+            app.update_world_state(action, reply, state)
+    return state
+
+
+def measure_memory(turns, legacy):
+    tracemalloc.start()
+    state = play(turns, legacy)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return state, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    # update_world_state bumps the session's world version, so it needs a request context
+    with app.app.test_request_context():
+        legacy, legacy_bytes = measure_memory(args.turns, legacy=True)
+        world, world_bytes = measure_memory(args.turns, legacy=False)
+
+    legacy_blob = json.dumps(legacy)
+    world_blob = world.to_bytes()
+    assert WorldState.from_bytes(world_blob) == world
+
+    cases = [
+        ("serialize (dict, JSON)", lambda: json.dumps(legacy)),
+        ("serialize (WorldState)", lambda: world.to_bytes()),
+        ("load (dict, JSON)", lambda: json.loads(legacy_blob)),
+        ("load (WorldState)", lambda: WorldState.from_bytes(world_blob)),
+        ("render (dict)", lambda: legacy_render(legacy)),
+        ("render (WorldState)", lambda: world.render()),
+    ]
+    print(f"{args.turns} turns")
+    print(f"{'memory (dict)':<28} {legacy_bytes:>10} bytes, {len(legacy_blob):>8} bytes stored")
+    print(f"{'memory (WorldState)':<28} {world_bytes:>10} bytes, {len(world_blob):>8} bytes stored")
+    for name, func in cases:
+        seconds = min(timeit.repeat(func, number=args.repeat, repeat=3)) / args.repeat
+        print(f"{name:<28} {seconds * 1e6:>10.1f} us")
+
+    if world_bytes >= legacy_bytes:
+        print("WorldState did not use less memory")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
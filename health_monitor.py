@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """Stops calls to a backend after repeated failures.
+
+    closed    -> calls go through; consecutive failures are counted
+    open      -> calls are refused until reset_timeout has passed
+    half-open -> one trial call is let through; its outcome closes or reopens
+    """
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.time() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def is_open(self):
+        """True while calls should be skipped without trying the backend"""
+        return self.state == OPEN
+
+    def allow_request(self):
+        """Check whether a call may go through, claiming the half-open trial if due"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if time.time() - self._opened_at < self.reset_timeout:
+                return False
+            if self._trial_in_flight:
+                return False
+            self._state = HALF_OPEN
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logging.info(f"Circuit breaker '{self.name}' closed")
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._open()
+
+    def trip(self):
+        """Open the breaker immediately, e.g. after a failed health probe"""
+        with self._lock:
+            self._open()
+
+    def _open(self):
+        if self._state != OPEN:
+            logging.warning(f"Circuit breaker '{self.name}' opened")
+        self._state = OPEN
+        self._opened_at = time.time()
+        self._trial_in_flight = False
+
+    def snapshot(self):
+        state = self.state
+        with self._lock:
+            return {"state": state, "failures": self._failures}
+
+
+class HealthMonitor:
+    """Probes backends on a background thread and caches the results"""
+
+    def __init__(self, interval=10):
+        self.interval = interval
+        self._checks = {}
+        self._results = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def register(self, name, check, breaker=None):
+        """Register a probe returning a dict with "status": "up" or "down" """
+        self._checks[name] = (check, breaker)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="health-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def refresh(self, name):
+        """Run one probe now and feed its breaker"""
+        check, breaker = self._checks[name]
+        try:
+            result = check()
+        except Exception as e:
+            result = {"status": "down", "error": str(e)}
+        result = dict(result, checked_at=time.time())
+        with self._lock:
+            self._results[name] = result
+        if breaker is not None:
+            if result.get("status") == "up":
+                breaker.record_success()
+            else:
+                breaker.trip()
+        return result
+
+    def status(self, name):
+        """Latest cached probe result, with breaker state"""
+        with self._lock:
+            result = dict(self._results.get(name) or {"status": "unknown"})
+        if "checked_at" in result:
+            result["age"] = round(time.time() - result.pop("checked_at"), 1)
+        breaker = self._checks[name][1]
+        if breaker is not None:
+            result["breaker"] = breaker.state
+        return result
+
+    def _run(self):
+        while not self._stop.is_set():
+            for name in list(self._checks):
+                self.refresh(name)
+            self._stop.wait(self.interval)
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import struct
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+
+# Frame: payload length, record kind, flags; then the JSON payload
+FRAME = struct.Struct(">IBB")
+HEADER = ord("H")  # journal metadata, always the first record
+SNAPSHOT = ord("S")  # full adventure state
+TURN = ord("T")  # changes since the previous record
+COMPRESSED = 1
+
+JOURNAL_ID_PATTERN = re.compile(r'^[0-9a-f]{12}$')
+
+
+class AdventureJournal:
+    """Append-only per-adventure save files.
+
+    Each adventure is one file of length-prefixed records: a header, a full
+    snapshot, then one small record per turn holding only what changed (new
+    conversation text and the world-state keys that differ). Every
+    `snapshot_every` records, and on checkpoint(), a full snapshot is
+    written instead, so load() decodes at most that many records: it skips
+    to the last snapshot using the frame lengths alone.
+
+    A state is a dict with a "conversation" string, a "player_choices" dict
+    and any other JSON-serializable fields.
+    """
+
+    def __init__(self, directory, snapshot_every=50, compress=True, max_cached=1000):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.compress = compress
+        self.max_cached = max_cached
+        # journal id -> (records since the last snapshot, length and digest of the last written
+        # conversation, digest of each serialized field); metadata only, the text stays on disk
+        self._last = OrderedDict()
+        self._locks = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, journal_id):
+        return os.path.join(self.directory, f"{journal_id}.journal")
+
+    def create(self, state, **meta):
+        """Start a journal for a new adventure; returns its id"""
+        journal_id = uuid.uuid4().hex[:12]
+        with self._journal_lock(journal_id):
+            self._append(journal_id, HEADER, dict(meta, created=time.time()))
+            self._write_snapshot(journal_id, state)
+        return journal_id
+
+    def record(self, journal_id, state):
+        """Append the changes since the last record, or a snapshot when one is due"""
+        with self._journal_lock(journal_id):
+            last = self._last.get(journal_id)
+            if last is None or last[0] + 1 >= self.snapshot_every:
+                # After a restart there is nothing to diff against
+                self._write_snapshot(journal_id, state)
+                return
+            count, length, conversation_digest, fields = last
+            current = self._serialize(state)
+
+            new_conversation = state.get("conversation", "")
+            if len(new_conversation) >= length and digest(new_conversation[:length]) == conversation_digest:
+                cut = length
+            else:
+                # A rewritten ending, e.g. /redo: read the last state back and keep the common part
+                previous = self._replay(journal_id)
+                if previous is None:
+                    self._write_snapshot(journal_id, state)
+                    return
+                cut = common_prefix_length(previous.get("conversation", ""), new_conversation)
+
+            delta = {
+                "cut": cut,
+                "text": new_conversation[cut:],
+                "set": {key: state_value(state, key) for key, value in current.items() if fields.get(key) != value},
+                "unset": [key for key in fields if key not in current]
+            }
+            self._append(journal_id, TURN, delta)
+            self._remember(journal_id, count + 1, new_conversation, current)
+
+    def checkpoint(self, journal_id, state):
+        """Write a full snapshot now"""
+        with self._journal_lock(journal_id):
+            self._write_snapshot(journal_id, state)
+
+    def exists(self, journal_id):
+        return bool(JOURNAL_ID_PATTERN.match(journal_id or "")) and os.path.exists(self.path(journal_id))
+
+    def load(self, journal_id):
+        """Rebuild the latest state of a journal, or None if there is none"""
+        if not self.exists(journal_id):
+            return None
+        with self._journal_lock(journal_id):
+            return self._replay(journal_id)
+
+    def info(self, journal_id):
+        """Header metadata plus the number of turns and the last write time"""
+        if not self.exists(journal_id):
+            return None
+        path = self.path(journal_id)
+        with open(path, 'rb') as f:
+            frames = scan(f)
+            if not frames or frames[0][0] != HEADER:
+                return None
+            _, flags, offset, length = frames[0]
+            f.seek(offset)
+            meta = decode(f.read(length), flags)
+        return dict(meta, id=journal_id, records=len(frames) - 1, updated=os.path.getmtime(path))
+
+    def _replay(self, journal_id):
+        # Called with the journal's lock held
+        with open(self.path(journal_id), 'rb') as f:
+            frames = scan(f)
+            snapshot_at = max((i for i, (kind, _, _, _) in enumerate(frames) if kind == SNAPSHOT), default=None)
+            if snapshot_at is None:
+                return None
+
+            state = None
+            for kind, flags, offset, length in frames[snapshot_at:]:
+                f.seek(offset)
+                payload = decode(f.read(length), flags)
+                if kind == SNAPSHOT:
+                    state = payload
+                elif kind == TURN:
+                    apply_delta(state, payload)
+        return state
+
+    def _write_snapshot(self, journal_id, state):
+        # Called with the journal's lock held
+        if journal_id not in self._last:
+            self._repair(journal_id)
+        self._append(journal_id, SNAPSHOT, state)
+        self._remember(journal_id, 0, state.get("conversation", ""), self._serialize(state))
+
+    def _repair(self, journal_id):
+        # Cut off a torn last record so the next one starts on a frame boundary
+        path = self.path(journal_id)
+        if not os.path.exists(path):
+            return
+        with open(path, 'r+b') as f:
+            frames = scan(f)
+            end = frames[-1][2] + frames[-1][3] if frames else 0
+            if end < os.fstat(f.fileno()).st_size:
+                f.truncate(end)
+
+    def _append(self, journal_id, kind, payload):
+        data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        flags = 0
+        if self.compress:
+            data = zlib.compress(data)
+            flags |= COMPRESSED
+        with open(self.path(journal_id), 'ab') as f:
+            f.write(FRAME.pack(len(data), kind, flags) + data)
+
+    def _serialize(self, state):
+        # Everything but the conversation, one digest per top-level key and per world-state key
+        fields = {}
+        for key, value in state.items():
+            if key == "conversation":
+                continue
+            if key == "player_choices":
+                for choice, choice_value in value.items():
+                    fields[f"player_choices.{choice}"] = digest(json.dumps(choice_value, sort_keys=True))
+            else:
+                fields[key] = digest(json.dumps(value, sort_keys=True))
+        return fields
+
+    def _remember(self, journal_id, count, conversation, fields):
+        with self._lock:
+            self._last[journal_id] = (count, len(conversation), digest(conversation), fields)
+            self._last.move_to_end(journal_id)
+            while len(self._last) > self.max_cached:
+                old_id, _ = self._last.popitem(last=False)
+                self._locks.pop(old_id, None)
+
+    def _journal_lock(self, journal_id):
+        with self._lock:
+            return self._locks.setdefault(journal_id, threading.Lock())
+
+
+def digest(text):
+    """Short fingerprint of a string, to tell whether it changed without keeping it"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+def state_value(state, key):
+    """Look up a field name produced by AdventureJournal._serialize"""
+    if key.startswith("player_choices."):
+        return state["player_choices"][key.split(".", 1)[1]]
+    return state[key]
+
+
+def apply_delta(state, delta):
+    state["conversation"] = state.get("conversation", "")[:delta["cut"]] + delta["text"]
+    for key, value in delta["set"].items():
+        if key.startswith("player_choices."):
+            state.setdefault("player_choices", {})[key.split(".", 1)[1]] = value
+        else:
+            state[key] = value
+    for key in delta["unset"]:
+        if key.startswith("player_choices."):
+            state.get("player_choices", {}).pop(key.split(".", 1)[1], None)
+        else:
+            state.pop(key, None)
+
+
+def scan(f):
+    """List (kind, flags, offset, length) of every complete frame, reading only the frame headers"""
+    frames = []
+    offset = 0
+    size = os.fstat(f.fileno()).st_size
+    while offset + FRAME.size <= size:
+        f.seek(offset)
+        length, kind, flags = FRAME.unpack(f.read(FRAME.size))
+        start = offset + FRAME.size
+        if start + length > size:
+            # Torn write at the end, e.g. the process died mid-append
+            logging.warning(f"Ignoring incomplete journal record at offset {offset}")
+            break
+        frames.append((kind, flags, start, length))
+        offset = start + length
+    return frames
+
+
+def decode(data, flags):
+    if flags & COMPRESSED:
+        data = zlib.decompress(data)
+    return json.loads(data)
+
+
+def common_prefix_length(a, b):
+    """Length of the longest common prefix, found by bisection on slice compares"""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[:mid] == b[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
@@ -0,0 +1,269 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+
+QUEUED = "queued"
+ACTIVE = "active"
+DONE = "done"
+
+
+class SchedulerBusy(Exception):
+    """The generation queue is full, or a queued request waited too long"""
+
+    def __init__(self, message, retry_after=5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """One generation's place in the scheduler: queued, then active, then done.
+
+    Use it as a context manager, or call release() when the generation ends;
+    releasing a ticket that is still queued takes it out of the queue.
+    """
+
+    def __init__(self, scheduler, key, background=False):
+        self.scheduler = scheduler
+        self.key = key
+        self.background = background
+        self.state = QUEUED
+        self.enqueued_at = time.time()
+        self.granted_at = None
+        self._event = threading.Event()
+        self._futures = []
+
+    @property
+    def granted(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the ticket is granted; False on timeout"""
+        return self._event.wait(timeout)
+
+    async def wait_async(self, timeout=None):
+        """Wait on the event loop until the ticket is granted; False on timeout"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.scheduler._lock:
+            if self.granted:
+                return True
+            self._futures.append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return self.granted
+
+    def position(self):
+        """1-based place in the queue, or 0 once granted"""
+        return self.scheduler._position(self)
+
+    def release(self):
+        self.scheduler._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class LLMScheduler:
+    """Fair admission control in front of the model backend.
+
+    At most `max_concurrent` generations run at once and at most one per
+    session. Waiting requests are queued per session and sessions are served
+    round-robin, so one busy player can't starve the others. The queue holds
+    at most `max_queue` requests (and `max_per_session` per session,
+    counting the running one); beyond that requests are refused right away
+    with SchedulerBusy.
+
+    Background requests (speculative work nobody is waiting on yet) have a
+    queue of their own. They only get a slot while no player request is
+    waiting, and never the last free one, so a player arriving later
+    doesn't queue behind them. With a single slot there is no spare one, so
+    background requests are refused outright.
+    """
+
+    def __init__(self, max_concurrent=2, max_queue=32, max_per_session=2, queue_timeout=60):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_per_session = max_per_session
+        self.queue_timeout = queue_timeout
+        self._queues = OrderedDict()  # session key -> deque of queued tickets, in round-robin order
+        self._background = OrderedDict()  # the same for background tickets
+        self._running = set()  # session keys with an active generation
+        self._queued = 0
+        self._active = 0
+        self._background_queued = 0
+        self._background_active = 0
+        self._waits = deque(maxlen=500)  # recent player queue wait times in seconds
+        self._granted = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._lock = threading.Lock()
+
+    def check(self, key):
+        """Raise SchedulerBusy if a request for this session would be refused now"""
+        with self._lock:
+            self._check(key)
+
+    def enqueue(self, key, background=False):
+        """Queue a generation for a session; returns its Ticket (possibly already granted)"""
+        with self._lock:
+            self._check(key, background)
+            ticket = Ticket(self, key, background)
+            if background:
+                self._background.setdefault(key, deque()).append(ticket)
+                self._background_queued += 1
+            else:
+                self._queues.setdefault(key, deque()).append(ticket)
+                self._queued += 1
+            self._dispatch()
+        return ticket
+
+    def acquire(self, key, timeout=None, background=False):
+        """Block until a generation slot is free; raises SchedulerBusy if the wait times out"""
+        ticket = self.enqueue(key, background)
+        if not ticket.wait(self.queue_timeout if timeout is None else timeout):
+            self.expire(ticket)
+        return ticket
+
+    async def acquire_async(self, key, timeout=None, background=False):
+        """Wait on the event loop for a generation slot; raises SchedulerBusy on timeout"""
+        ticket = self.enqueue(key, background)
+        try:
+            granted = await ticket.wait_async(self.queue_timeout if timeout is None else timeout)
+        except BaseException:
+            # Cancelled, e.g. the client went away while queued
+            ticket.release()
+            raise
+        if not granted:
+            self.expire(ticket)
+        return ticket
+
+    def stats(self):
+        """Queue depth, running generations and recent wait times"""
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "active": self._active,
+                "queued": self._queued,
+                "sessions_waiting": len(self._queues),
+                "background_active": self._background_active,
+                "background_queued": self._background_queued,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "granted": self._granted,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+                "wait_p50": round(waits[len(waits) // 2], 3) if waits else 0.0,
+                "wait_p95": round(waits[int(len(waits) * 0.95)], 3) if waits else 0.0,
+                "wait_max": round(waits[-1], 3) if waits else 0.0
+            }
+
+    def _check(self, key, background=False):
+        # Called with the lock held
+        if background and self.max_concurrent < 2:
+            self._rejected += 1
+            raise SchedulerBusy("No slot to spare for background work.")
+        queues = self._background if background else self._queues
+        outstanding = len(queues.get(key, ())) + (1 if key in self._running else 0)
+        if outstanding >= self.max_per_session:
+            self._rejected += 1
+            raise SchedulerBusy("Your previous action is still being narrated.", retry_after=2)
+        if self._queued + (self._background_queued if background else 0) >= self.max_queue:
+            self._rejected += 1
+            raise SchedulerBusy("The Dungeon Master is busy with other players. Please try again in a moment.")
+
+    def expire(self, ticket):
+        """Give up on a ticket that is still queued, raising SchedulerBusy"""
+        with self._lock:
+            expired = ticket.state == QUEUED
+            if expired:
+                self._timed_out += 1
+        if expired:
+            ticket.release()
+            raise SchedulerBusy("The Dungeon Master is busy with other players. Please try again in a moment.")
+
+    def _dispatch(self):
+        # Called with the lock held; grant slots round-robin across sessions
+        while self._active < self.max_concurrent:
+            queues = self._queues
+            key = next((key for key in queues if key not in self._running), None)
+            if key is None:
+                # Background work never takes the last free slot, nor runs while players wait
+                if self._queued or self._active >= self.max_concurrent - 1:
+                    return
+                queues = self._background
+                key = next((key for key in queues if key not in self._running), None)
+                if key is None:
+                    return
+            queue = queues[key]
+            ticket = queue.popleft()
+            if queue:
+                queues.move_to_end(key)
+            else:
+                del queues[key]
+            if ticket.background:
+                self._background_queued -= 1
+                self._background_active += 1
+            else:
+                self._queued -= 1
+            self._active += 1
+            self._running.add(key)
+            ticket.state = ACTIVE
+            ticket.granted_at = time.time()
+            self._granted += 1
+            if not ticket.background:
+                self._waits.append(ticket.granted_at - ticket.enqueued_at)
+            ticket._event.set()
+            for loop, future in ticket._futures:
+                loop.call_soon_threadsafe(_resolve, future)
+            ticket._futures = []
+
+    def _release(self, ticket):
+        with self._lock:
+            if ticket.state == QUEUED:
+                queues = self._background if ticket.background else self._queues
+                queue = queues.get(ticket.key)
+                if queue is not None and ticket in queue:
+                    queue.remove(ticket)
+                    if ticket.background:
+                        self._background_queued -= 1
+                    else:
+                        self._queued -= 1
+                    if not queue:
+                        del queues[ticket.key]
+            elif ticket.state == ACTIVE:
+                self._active -= 1
+                if ticket.background:
+                    self._background_active -= 1
+                self._running.discard(ticket.key)
+                self._dispatch()
+            ticket.state = DONE
+
+    def _position(self, ticket):
+        with self._lock:
+            if ticket.state != QUEUED:
+                return 0
+            # Serving order: one ticket per session per round, sessions in round-robin order;
+            # background tickets come after every player ticket
+            queues = list(self._queues.values())
+            position = 0
+            if ticket.background:
+                queues = list(self._background.values())
+                position = self._queued
+            for depth in range(max(len(queue) for queue in queues)):
+                for queue in queues:
+                    if depth < len(queue):
+                        position += 1
+                        if queue[depth] is ticket:
+                            return position
+            return position
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(True)
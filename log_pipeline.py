@@ -0,0 +1,145 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import time
+
+# Chatty libraries whose records are dropped before they are even created
+THIRD_PARTY_LOGGERS = ("urllib3", "requests", "httpx", "httpcore", "werkzeug", "asyncio")
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks the logging thread: records are dropped when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class ThirdPartyFilter(logging.Filter):
+    """Apply a separate minimum level to records that don't come from our own (root) logger"""
+
+    def __init__(self, level):
+        super().__init__()
+        self.level = level
+
+    def filter(self, record):
+        return record.name == "root" or record.levelno >= self.level
+
+
+def configure_logging(filename, level=logging.DEBUG, third_party_level=logging.WARNING,
+                      max_bytes=10 * 1024 * 1024, backups=5, queue_size=10000,
+                      fmt='%(asctime)s - %(levelname)s - %(message)s'):
+    """Send all logging through a queue to a size-rotated file written by one listener thread.
+
+    Request threads only format the record and put it on the queue; the
+    file I/O happens on the listener thread. Returns the queue handler
+    (its `dropped` count is the number of records lost to a full queue).
+    """
+    level, third_party_level = to_level(level), to_level(third_party_level)
+    file_handler = logging.handlers.RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter(fmt))
+
+    queue_handler = DroppingQueueHandler(queue.Queue(queue_size))
+    queue_handler.addFilter(ThirdPartyFilter(third_party_level))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    for name in THIRD_PARTY_LOGGERS:
+        logging.getLogger(name).setLevel(max(level, third_party_level))
+
+    listener = logging.handlers.QueueListener(queue_handler.queue, file_handler)
+    listener.start()
+    # Flush what is still queued on exit
+    atexit.register(listener.stop)
+    return queue_handler
+
+
+def to_level(level):
+    """A level number from a number or a level name"""
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).upper())
+    if not isinstance(value, int):
+        raise ValueError(f"Unknown log level {level!r}")
+    return value
+
+
+def tail_lines(path, count, block_size=8192):
+    """Last `count` lines of a file, read backwards from the end in blocks.
+
+    Returns (lines, offset), where offset is the end of the file as read,
+    for follow() to continue from.
+    """
+    with open(path, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        data = b""
+        # One newline more than asked for, since the file normally ends with one
+        while position > 0 and data.count(b"\n") <= count:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    lines = data.decode('utf-8', errors='replace').splitlines()
+    if position > 0:
+        # The first line is probably cut off
+        lines = lines[1:]
+    return lines[-count:] if count > 0 else [], end
+
+
+def follow(path, offset, poll_interval=0.5, idle_after=15, duration=None):
+    """Yield lines appended to a file from offset on, like `tail -f`.
+
+    Yields None after `idle_after` seconds without a new line (for
+    keepalives) and stops after `duration` seconds. A rotated or truncated
+    file is reopened from the start.
+    """
+    deadline = time.monotonic() + duration if duration else None
+    f = open(path, 'rb')
+    try:
+        f.seek(offset)
+        pending = b""
+        idle_since = time.monotonic()
+        while deadline is None or time.monotonic() < deadline:
+            data = f.read()
+            if data:
+                pending += data
+                *lines, pending = pending.split(b"\n")
+                for line in lines:
+                    yield line.decode('utf-8', errors='replace')
+                if lines:
+                    idle_since = time.monotonic()
+                continue
+
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # Between the rename and the new file during a rotation
+                stat = None
+            if stat is not None and (stat.st_ino != os.fstat(f.fileno()).st_ino or stat.st_size < f.tell()):
+                # Finish what was written to the old file before it was rotated away
+                for line in (pending + f.read()).split(b"\n"):
+                    if line:
+                        yield line.decode('utf-8', errors='replace')
+                f.close()
+                f = open(path, 'rb')
+                pending = b""
+                continue
+
+            if time.monotonic() - idle_since >= idle_after:
+                idle_since = time.monotonic()
+                yield None
+            time.sleep(poll_interval)
+    finally:
+        f.close()
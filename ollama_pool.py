@@ -0,0 +1,124 @@
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from health_monitor import CircuitBreaker
+
+
+class OllamaBackend:
+    """One Ollama server: its breaker, installed models and in-flight generations"""
+
+    def __init__(self, url, failure_threshold=3, reset_timeout=30):
+        self.url = url.rstrip('/')
+        self.api_url = f"{self.url}/api/generate"
+        self.tags_url = f"{self.url}/api/tags"
+        self.breaker = CircuitBreaker(f"ollama {self.url}", failure_threshold, reset_timeout)
+        self.models = {}  # installed model names, in the order Ollama lists them
+        self.outstanding = 0
+        self.status = "unknown"
+
+
+class OllamaPool:
+    """Routes generations across several Ollama servers.
+
+    Each generation goes to the healthy backend with the fewest outstanding
+    requests that has the model installed, according to the merged
+    /api/tags view from the last probe. A session sticks to the backend it
+    was first sent to while that backend stays usable, so Ollama's cache of
+    the session's prompt prefix is reused.
+    """
+
+    def __init__(self, urls, failure_threshold=3, reset_timeout=30, max_sticky=10000):
+        self.backends = [OllamaBackend(url, failure_threshold, reset_timeout) for url in urls]
+        self.max_sticky = max_sticky
+        self._sticky = OrderedDict()  # session id -> backend url, least recently used first
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        """True while every backend's breaker is open, i.e. skip the AI entirely"""
+        return all(backend.breaker.is_open() for backend in self.backends)
+
+    def choose(self, model, session_id=None):
+        """Pick a backend for a generation, or None if none will take it.
+
+        Claims the backend's half-open trial call if its breaker is due one.
+        """
+        with self._lock:
+            candidates = [backend for backend in self.backends if not backend.breaker.is_open()]
+            # Prefer backends known to have the model; if none lists it, the tags may be stale
+            with_model = [backend for backend in candidates if model in backend.models]
+            candidates = with_model or candidates
+
+            sticky_url = self._sticky.get(session_id) if session_id else None
+            candidates.sort(key=lambda backend: (backend.url != sticky_url, backend.outstanding))
+            for backend in candidates:
+                if backend.breaker.allow_request():
+                    if session_id:
+                        self._sticky[session_id] = backend.url
+                        self._sticky.move_to_end(session_id)
+                        while len(self._sticky) > self.max_sticky:
+                            self._sticky.popitem(last=False)
+                    return backend
+        return None
+
+    @contextmanager
+    def lease(self, backend):
+        """Count a generation as outstanding on a backend while it runs"""
+        with self._lock:
+            backend.outstanding += 1
+        try:
+            yield backend
+        finally:
+            with self._lock:
+                backend.outstanding -= 1
+
+    def refresh(self, client):
+        """Probe every backend's /api/tags, updating models and breakers.
+
+        Returns a health summary: "up" while at least one backend answers.
+        """
+        for backend in self.backends:
+            try:
+                response = client.get(backend.tags_url, timeout=3)
+                response.raise_for_status()
+                models = dict.fromkeys(model['model'] for model in response.json().get('models', []) if 'model' in model)
+            except Exception as e:
+                if backend.status != "down":
+                    logging.warning(f"Ollama backend {backend.url} is down: {e}")
+                backend.status = "down"
+                backend.breaker.trip()
+                continue
+            with self._lock:
+                backend.models = models
+            backend.status = "up"
+            backend.breaker.record_success()
+
+        up = [backend for backend in self.backends if backend.status == "up"]
+        return {
+            "status": "up" if up else "down",
+            "models": self.models()[:3],
+            "backends": self.snapshot()
+        }
+
+    def models(self):
+        """Models installed on any backend that answered the last probe"""
+        with self._lock:
+            merged = {}
+            for backend in self.backends:
+                if backend.status == "up":
+                    merged.update(backend.models)
+        return list(merged)
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                {
+                    "url": backend.url,
+                    "status": backend.status,
+                    "breaker": backend.breaker.state,
+                    "outstanding": backend.outstanding,
+                    "models": len(backend.models)
+                }
+                for backend in self.backends
+            ]
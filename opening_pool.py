@@ -0,0 +1,111 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class OpeningPool:
+    """Ready-made opening narrations, up to `size` per (model, genre, role, censored).
+
+    take() hands out a stored opening right away and asks for a replacement.
+    A single background thread refills the requested keys round-robin, one
+    opening per key per round, by calling `generate(key)`. generate
+    returns the opening text, or None when it could not make one (the key is
+    then left alone until it is asked for again). invalidate() drops every
+    stored opening, including ones still being generated.
+    """
+
+    def __init__(self, generate, size=3, retry_delay=5):
+        self.generate = generate
+        self.size = size
+        self.retry_delay = retry_delay
+        self._entries = {}  # key -> deque of openings, oldest first
+        self._wanted = OrderedDict()  # keys waiting for a refill, in round-robin order
+        self._epoch = 0  # bumped by invalidate() so in-flight results are discarded
+        self._hits = 0
+        self._misses = 0
+        self._generated = 0
+        self._failed = 0
+        self._invalidations = 0
+        self._thread = None
+        self._cond = threading.Condition()
+
+    def take(self, key):
+        """Pop a stored opening for key, or None; either way the key is refilled"""
+        with self._cond:
+            entries = self._entries.get(key)
+            opening = entries.popleft() if entries else None
+            if opening is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+            self._request(key)
+        return opening
+
+    def fill(self, keys):
+        """Ask for openings for keys without taking any, e.g. before players arrive"""
+        with self._cond:
+            for key in keys:
+                self._request(key)
+
+    def invalidate(self):
+        """Forget every stored opening, e.g. after the model list changed"""
+        with self._cond:
+            self._entries.clear()
+            self._wanted.clear()
+            self._epoch += 1
+            self._invalidations += 1
+
+    def stats(self):
+        with self._cond:
+            lookups = self._hits + self._misses
+            return {
+                "size": self.size,
+                "keys": len(self._entries),
+                "ready": sum(len(entries) for entries in self._entries.values()),
+                "wanted": len(self._wanted),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+                "generated": self._generated,
+                "failed": self._failed,
+                "invalidations": self._invalidations
+            }
+
+    def _request(self, key):
+        # Called with the lock held
+        if len(self._entries.get(key, ())) >= self.size:
+            return
+        self._wanted[key] = None
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="opening-pool", daemon=True)
+            self._thread.start()
+        self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._wanted:
+                    self._cond.wait()
+                key, _ = self._wanted.popitem(last=False)
+                epoch = self._epoch
+
+            try:
+                opening = self.generate(key)
+            except Exception as e:
+                logging.error(f"Opening generation failed for {key}: {e}")
+                opening = None
+
+            with self._cond:
+                if opening is None:
+                    self._failed += 1
+                elif epoch == self._epoch:
+                    entries = self._entries.setdefault(key, deque())
+                    entries.append(opening)
+                    self._generated += 1
+                    if len(entries) < self.size:
+                        self._wanted[key] = None
+
+            if opening is None:
+                # Don't spin while the backend is down or the scheduler is full
+                time.sleep(self.retry_delay)
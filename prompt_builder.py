@@ -0,0 +1,100 @@
+import re
+
+# Conversation lines that open a new player turn ("Player:" or "Player (narrative command):")
+TURN_START = re.compile(r'^Player(?: \([^)]*\))?:')
+OMITTED_MARKER = "[Earlier events omitted]"
+
+
+def estimate_tokens(text):
+    """Cheap token estimate: roughly four characters per token for English prose"""
+    return (len(text) + 3) // 4
+
+
+def split_turns(conversation):
+    """Split a conversation into (setting, turns).
+
+    The setting is everything before the first "Dungeon Master:" line (the
+    adventure header written by /setup). Each turn is the text of one
+    exchange; the opening narration is the first turn.
+    """
+    lines = conversation.split("\n")
+    setting_end = 0
+    while setting_end < len(lines) and not lines[setting_end].startswith("Dungeon Master:"):
+        if TURN_START.match(lines[setting_end]):
+            break
+        setting_end += 1
+
+    turns = []
+    current = []
+    for line in lines[setting_end:]:
+        if TURN_START.match(line) and current:
+            turns.append("\n".join(current))
+            current = []
+        current.append(line)
+    if current:
+        turns.append("\n".join(current))
+    return "\n".join(lines[:setting_end]), turns
+
+
+def build_prompt(system_prompt, conversation, tail, budget, pinned_turns=4, overhead=0, state="", cut=0, trim_fraction=0.25):
+    """Assemble system prompt, conversation history, state and tail within a token budget.
+
+    The system prompt, the adventure setting, the state block, the tail
+    (player input and cue) and the latest `pinned_turns` turns are always
+    kept. Turns before `cut` have already been dropped. The history only
+    grows until the prompt would go over budget; then older turns are
+    dropped in one block, oldest first, until a `trim_fraction` of the budget
+    is free again. Between trims, consecutive prompts share the same prefix
+    up to the state block, so the backend's prompt cache keeps working.
+
+    Returns (prompt, usage) where usage counts the tokens of each section;
+    usage["cut"] is the cut point to pass in with the next prompt.
+    """
+    setting, turns = split_turns(conversation)
+    system_tokens = estimate_tokens(system_prompt)
+    setting_tokens = estimate_tokens(setting)
+    state_tokens = estimate_tokens(state)
+    tail_tokens = estimate_tokens(tail)
+    marker_tokens = estimate_tokens(OMITTED_MARKER) + 1
+
+    # The conversation may have been shortened (e.g. /redo) since the cut was made
+    max_cut = max(len(turns) - max(pinned_turns, 0), 0)
+    cut = min(max(cut, 0), max_cut)
+    costs = [estimate_tokens(turn) + 1 for turn in turns]
+    fixed = overhead + system_tokens + setting_tokens + state_tokens + tail_tokens
+    history_tokens = sum(costs[cut:]) + (marker_tokens if cut else 0)
+
+    trimmed = 0
+    if fixed + history_tokens > budget:
+        target = budget - int(budget * trim_fraction)
+        while cut < max_cut and fixed + history_tokens > target:
+            if not cut:
+                history_tokens += marker_tokens
+            history_tokens -= costs[cut]
+            cut += 1
+            trimmed += 1
+
+    history = []
+    if setting:
+        history.append(setting)
+    if cut:
+        history.append(OMITTED_MARKER)
+    history.extend(turns[cut:])
+    if state:
+        history.append(state)
+
+    prompt = system_prompt + "\n\n" + "\n".join(history) + "\n" + tail
+    usage = {
+        "budget": budget,
+        "system": system_tokens,
+        "setting": setting_tokens,
+        "history": history_tokens,
+        "state": state_tokens,
+        "input": tail_tokens,
+        "total": estimate_tokens(prompt) + overhead,
+        "turns_kept": len(turns) - cut,
+        "turns_dropped": cut,
+        "turns_trimmed": trimmed,
+        "cut": cut
+    }
+    return prompt, usage
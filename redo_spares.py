@@ -0,0 +1,72 @@
+import threading
+from collections import OrderedDict, deque
+
+
+class SpareReplies:
+    """Alternative Dungeon Master replies kept per session for /redo.
+
+    Spares belong to one point in a session's story, identified by a
+    fingerprint of the prompt that would regenerate the last reply. Starting
+    a new batch for a different fingerprint drops the old spares, and spares
+    that finish for an outdated fingerprint are discarded. At most
+    `max_sessions` sessions are tracked, least recently used first out.
+    """
+
+    def __init__(self, max_sessions=1000):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # session id -> (fingerprint, deque of spares)
+        self._hits = 0
+        self._misses = 0
+        self._stored = 0
+        self._discarded = 0
+        self._lock = threading.Lock()
+
+    def reset(self, session_id, fingerprint):
+        """Make fingerprint the session's current story point, keeping spares already made for it"""
+        with self._lock:
+            current = self._sessions.get(session_id)
+            if current is None or current[0] != fingerprint:
+                self._sessions[session_id] = (fingerprint, deque())
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def wanted(self, session_id, fingerprint):
+        """True while spares for fingerprint would still be used"""
+        with self._lock:
+            current = self._sessions.get(session_id)
+            return current is not None and current[0] == fingerprint
+
+    def add(self, session_id, fingerprint, spare):
+        """Store a finished spare; False if the story has moved on"""
+        with self._lock:
+            current = self._sessions.get(session_id)
+            if current is None or current[0] != fingerprint:
+                self._discarded += 1
+                return False
+            current[1].append(spare)
+            self._stored += 1
+            return True
+
+    def take(self, session_id, fingerprint):
+        """Pop the next spare for the session's current story point, or None"""
+        with self._lock:
+            current = self._sessions.get(session_id)
+            if current is not None and current[0] == fingerprint and current[1]:
+                self._hits += 1
+                return current[1].popleft()
+            self._misses += 1
+            return None
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "sessions": len(self._sessions),
+                "ready": sum(len(spares) for _, spares in self._sessions.values()),
+                "stored": self._stored,
+                "discarded": self._discarded,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0
+            }
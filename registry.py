@@ -0,0 +1,88 @@
+import logging
+import threading
+import time
+
+
+class Registry:
+    """Process-wide cached list (installed models, TTS voices) shared by all sessions.
+
+    The first read loads the list; after `ttl` seconds reads keep returning
+    the cached copy while one background thread reloads it. Concurrent
+    refreshes are single-flight: callers that arrive while a load is running
+    wait for that load instead of starting their own. A failed or empty load
+    keeps the last good list. `on_change(new_list)` is called after a reload
+    replaced a previously loaded list with a different one.
+    """
+
+    def __init__(self, name, loader, ttl=300, fallback=None, on_change=None):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.fallback = list(fallback or [])
+        self.on_change = on_change
+        self._value = None
+        self._loaded_at = 0
+        self._loads = 0
+        self._inflight = None  # Event set when the running load finishes
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the cached list, loading it on first use and refreshing it when stale"""
+        with self._lock:
+            value = self._value
+            stale = time.time() - self._loaded_at > self.ttl
+        if value is None:
+            return self.refresh()
+        if stale:
+            self.refresh(wait=False)
+        return value
+
+    def refresh(self, wait=True):
+        """Reload the list, joining a load already in flight"""
+        with self._lock:
+            inflight = self._inflight
+            if inflight is None:
+                inflight = self._inflight = threading.Event()
+                leader = True
+            else:
+                leader = False
+
+        if leader:
+            if wait:
+                self._load(inflight)
+            else:
+                threading.Thread(target=self._load, args=(inflight,), name=f"{self.name}-refresh", daemon=True).start()
+        elif wait:
+            inflight.wait()
+
+        with self._lock:
+            return self._value if self._value is not None else list(self.fallback)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "items": len(self._value or []),
+                "age": round(time.time() - self._loaded_at, 1) if self._loaded_at else None,
+                "loads": self._loads,
+                "refreshing": self._inflight is not None
+            }
+
+    def _load(self, inflight):
+        try:
+            value = list(self.loader() or [])
+        except Exception as e:
+            logging.error(f"Failed to load {self.name}: {e}")
+            value = []
+        with self._lock:
+            changed = bool(value) and self._value is not None and value != self._value
+            if value or self._value is None:
+                self._value = value or list(self.fallback)
+            self._loaded_at = time.time()
+            self._loads += 1
+            self._inflight = None
+        inflight.set()
+        if changed and self.on_change is not None:
+            try:
+                self.on_change(value)
+            except Exception as e:
+                logging.error(f"{self.name} change handler failed: {e}")
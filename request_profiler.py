@@ -0,0 +1,112 @@
+import cProfile
+import datetime
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+
+class StackSampler:
+    """Samples one thread's Python stack every `interval` seconds from a helper thread.
+
+    Stacks are kept as folded lines ("outer;inner;leaf"), the input format
+    of flamegraph.pl and speedscope, with how often each was seen.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """Profile single calls on demand: folded stack samples plus a cProfile dump.
+
+    Nothing is installed until profile() is called, so there is no cost
+    for requests that aren't profiled. Each profile is written as
+    <id>.folded and <id>.prof in `directory`; only the newest `max_profiles`
+    are kept.
+    """
+
+    def __init__(self, directory, max_profiles=20, interval=0.005):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    def profile(self, func, label="request"):
+        """Run func() in this thread under both profilers; returns (result, profile id)"""
+        profile_id = f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{label}_{uuid.uuid4().hex[:4]}"
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        with StackSampler(threading.get_ident(), self.interval) as sampler:
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler already owns this thread; keep the samples only
+                profiler = None
+            try:
+                result = func()
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        elapsed = time.perf_counter() - start
+
+        try:
+            self._write(profile_id, sampler, profiler)
+            logging.info(f"Profiled {label} in {elapsed:.3f}s: {os.path.join(self.directory, profile_id)}.folded")
+        except Exception as e:
+            logging.error(f"Could not write profile {profile_id}: {e}")
+        return result, profile_id
+
+    def _write(self, profile_id, sampler, profiler):
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            base = os.path.join(self.directory, profile_id)
+            with open(f"{base}.folded", "w") as f:
+                f.write(sampler.folded())
+            if profiler is not None:
+                profiler.dump_stats(f"{base}.prof")
+            self._prune()
+
+    def _prune(self):
+        # Called with the lock held: drop the oldest profiles past max_profiles
+        profiles = {}
+        for name in os.listdir(self.directory):
+            stem, ext = os.path.splitext(name)
+            if ext in (".folded", ".prof"):
+                profiles.setdefault(stem, []).append(os.path.join(self.directory, name))
+        # Ids start with their timestamp, so they sort oldest first
+        for stem in sorted(profiles)[:-self.max_profiles or None]:
+            for path in profiles[stem]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
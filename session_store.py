@@ -0,0 +1,326 @@
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask.sessions import SessionInterface, SessionMixin
+
+# Values that can change without going through __setitem__ (e.g. list.append)
+MUTABLE_TYPES = (dict, list)
+
+# Classes stored in their own binary encoding (to_bytes/from_bytes) instead of JSON, by tag
+BINARY_TYPES = {}
+
+
+def register_binary_type(tag, cls):
+    """Let sessions hold instances of cls; the SQLite store keeps them as tagged blobs"""
+    BINARY_TYPES[tag.encode()] = cls
+
+
+def encode_value(value):
+    for tag, cls in BINARY_TYPES.items():
+        if isinstance(value, cls):
+            return tag + b"\0" + value.to_bytes()
+    return json.dumps(value)
+
+
+def decode_value(raw):
+    if isinstance(raw, bytes):
+        tag, data = raw.split(b"\0", 1)
+        return BINARY_TYPES[tag].from_bytes(data)
+    return json.loads(raw)
+
+
+def snapshot_value(value):
+    """Serialized copy of a value that can change in place, or None"""
+    if isinstance(value, MUTABLE_TYPES):
+        return json.dumps(value, sort_keys=True)
+    if isinstance(value, tuple(BINARY_TYPES.values())):
+        return value.to_bytes()
+    return None
+
+
+class ServerSession(dict, SessionMixin):
+    """Session dict that remembers which keys were written or removed"""
+
+    def __init__(self, initial=None, sid=None, new=False, snapshot=None):
+        super().__init__(initial or {})
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.dirty = set()
+        # Serialized copies of mutable values, used to spot in-place changes
+        self.snapshot = snapshot or {}
+        self.loaded_keys = set(self.keys())
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.dirty.add(key)
+        self.modified = True
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.dirty.discard(key)
+        self.modified = True
+
+    def clear(self):
+        super().clear()
+        self.dirty.clear()
+        self.modified = True
+
+    def pop(self, key, *default):
+        self.dirty.discard(key)
+        if key in self:
+            self.modified = True
+        return super().pop(key, *default)
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.dirty.discard(key)
+        self.modified = True
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def changes(self, track_nested=True):
+        """Return (changed values, removed keys) since the session was loaded"""
+        changed = {}
+        for key, value in self.items():
+            if key in self.dirty:
+                changed[key] = value
+            elif track_nested:
+                serialized = snapshot_value(value)
+                if serialized is not None and serialized != self.snapshot.get(key):
+                    changed[key] = value
+        removed = self.loaded_keys - set(self.keys())
+        return changed, removed
+
+
+class MemorySessionStore:
+    """In-process LRU session store with TTL eviction"""
+
+    # Values are kept as live objects, so in-place changes need no re-save
+    track_nested = False
+
+    def __init__(self, max_sessions=1000, ttl=86400):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()  # sid -> (values, last access)
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is None:
+                return None
+            values, accessed = entry
+            if time.time() - accessed > self.ttl:
+                del self._sessions[sid]
+                return None
+            self._sessions[sid] = (values, time.time())
+            self._sessions.move_to_end(sid)
+            return dict(values)
+
+    def save(self, sid, changed, removed, values=None):
+        """Apply a session's changes; values is the whole session.
+
+        A session evicted since it was loaded is stored again from values;
+        without them it stays out, since the changes alone are only part of it.
+        """
+        with self._lock:
+            if sid in self._sessions:
+                stored = self._sessions[sid][0]
+                stored.update(changed)
+                for key in removed:
+                    stored.pop(key, None)
+            elif values is not None:
+                stored = dict(values)
+            else:
+                return
+            self._sessions[sid] = (stored, time.time())
+            self._sessions.move_to_end(sid)
+            self._evict()
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def _evict(self):
+        # Expired sessions are the oldest, so they sit at the front
+        now = time.time()
+        while self._sessions:
+            sid, (values, accessed) = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - accessed <= self.ttl:
+                break
+            del self._sessions[sid]
+
+
+class SQLiteSessionStore:
+    """SQLite-backed session store that survives restarts.
+
+    Each session key is its own row, so a request only rewrites the keys it
+    changed. Recently used sessions are served from an in-process LRU.
+    """
+
+    track_nested = True
+
+    def __init__(self, path="sessions.db", ttl=86400, cache_size=1000):
+        self.path = path
+        self.ttl = ttl
+        self.cache = MemorySessionStore(max_sessions=cache_size, ttl=ttl)
+        self._local = threading.local()
+        self._last_purge = 0
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "sid TEXT PRIMARY KEY, accessed REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_data ("
+                "sid TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (sid, key))"
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, sid):
+        values = self.cache.load(sid)
+        if values is not None:
+            return values
+        conn = self._connection()
+        row = conn.execute("SELECT accessed FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        if row is None or time.time() - row[0] > self.ttl:
+            return None
+        rows = conn.execute("SELECT key, value FROM session_data WHERE sid = ?", (sid,)).fetchall()
+        values = {key: decode_value(value) for key, value in rows}
+        self.cache.save(sid, values, (), values)
+        return dict(values)
+
+    def save(self, sid, changed, removed, values=None):
+        # Only a cached session is updated in the cache; the rows hold the rest
+        self.cache.save(sid, changed, removed)
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO sessions (sid, accessed) VALUES (?, ?) "
+                "ON CONFLICT(sid) DO UPDATE SET accessed = excluded.accessed",
+                (sid, time.time())
+            )
+            if changed:
+                conn.executemany(
+                    "INSERT INTO session_data (sid, key, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT(sid, key) DO UPDATE SET value = excluded.value",
+                    [(sid, key, encode_value(value)) for key, value in changed.items()]
+                )
+            if removed:
+                conn.executemany(
+                    "DELETE FROM session_data WHERE sid = ? AND key = ?",
+                    [(sid, key) for key in removed]
+                )
+        self._purge_expired()
+
+    def delete(self, sid):
+        self.cache.delete(sid)
+        with self._connection() as conn:
+            conn.execute("DELETE FROM session_data WHERE sid = ?", (sid,))
+            conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def _purge_expired(self):
+        now = time.time()
+        if now - self._last_purge < 300:
+            return
+        self._last_purge = now
+        cutoff = now - self.ttl
+        with self._connection() as conn:
+            conn.execute(
+                "DELETE FROM session_data WHERE sid IN (SELECT sid FROM sessions WHERE accessed < ?)",
+                (cutoff,)
+            )
+            conn.execute("DELETE FROM sessions WHERE accessed < ?", (cutoff,))
+
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session interface that keeps only a session id in the cookie"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            try:
+                values = self.store.load(sid)
+            except Exception as e:
+                logging.error(f"Error loading session {sid[:8]}: {e}")
+                values = None
+            if values is not None:
+                snapshot = {}
+                if self.store.track_nested:
+                    snapshot = {key: snapshot_value(value) for key, value in values.items()}
+                return ServerSession(values, sid=sid, snapshot=snapshot)
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session and not session.new:
+            if session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if not session:
+            return
+
+        changed, removed = session.changes(self.store.track_nested)
+        if changed or removed or session.new:
+            self.store.save(session.sid, changed, removed, session)
+
+        if session.new or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+
+def create_session_interface(backend=None):
+    """Build the session interface selected by SESSION_BACKEND, or None for cookies"""
+    backend = (backend or os.getenv('SESSION_BACKEND', 'memory')).lower()
+    ttl = int(os.getenv('SESSION_TTL', 86400))
+    max_sessions = int(os.getenv('SESSION_MAX_ENTRIES', 1000))
+
+    if backend == "cookie":
+        return None
+    if backend == "sqlite":
+        store = SQLiteSessionStore(
+            path=os.getenv('SESSION_DB_PATH', 'sessions.db'),
+            ttl=ttl,
+            cache_size=max_sessions
+        )
+    else:
+        store = MemorySessionStore(max_sessions=max_sessions, ttl=ttl)
+    logging.info(f"Using {backend} session backend")
+    return ServerSessionInterface(store)
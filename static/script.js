@@ -60,6 +60,8 @@ document.addEventListener('DOMContentLoaded', function() {
         const conversationDiv = document.getElementById('conversation');
         const consequenceText = document.getElementById('consequence-text');
         const worldStateContent = document.getElementById('world-state-content');
+        // World state version the page shows; the server skips the text while it is unchanged
+        let worldVersion = '';
         const ttsPlayer = document.getElementById('tts-player');
         const censoredBtn = document.getElementById('censored-btn');
         const redoBtn = document.getElementById('redo-btn');
@@ -70,6 +72,168 @@ document.addEventListener('DOMContentLoaded', function() {
         // Add initial DM message
         addMessage('dm', 'Welcome to your adventure!');
         
+        // Read a server-sent event stream from a fetch response
+        function readEventStream(response, onEvent) {
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            
+            function pump() {
+                return reader.read().then(({ done, value }) => {
+                    if (done) return;
+                    buffer += decoder.decode(value, { stream: true });
+                    let boundary;
+                    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                        const rawEvent = buffer.slice(0, boundary);
+                        buffer = buffer.slice(boundary + 2);
+                        let eventName = 'message';
+                        let data = '';
+                        rawEvent.split('\n').forEach(line => {
+                            if (line.startsWith('event: ')) eventName = line.slice(7);
+                            else if (line.startsWith('data: ')) data += line.slice(6);
+                        });
+                        onEvent(eventName, data ? JSON.parse(data) : {});
+                    }
+                    return pump();
+                });
+            }
+            return pump();
+        }
+        
+        // Narration plays as a playlist of per-sentence clips synthesized in the background
+        let ttsPlaylist = null;
+        
+        function playClip(audioUrl, autoplay) {
+            ttsPlayer.src = audioUrl;
+            ttsPlayer.classList.remove('hidden');
+            if (autoplay) {
+                ttsPlayer.play().catch(e => console.error("Play failed:", e));
+            }
+        }
+        
+        // Move to the next finished clip of the playlist, skipping failed ones
+        function advancePlaylist(autoplay) {
+            const playlist = ttsPlaylist;
+            while (playlist && playlist.next < playlist.clips.length) {
+                const clip = playlist.clips[playlist.next];
+                if (clip.status === 'pending') return;
+                playlist.next += 1;
+                if (clip.status === 'done') {
+                    playClip(clip.audio_url, autoplay);
+                    return;
+                }
+            }
+        }
+        
+        function pollPlaylist(playlist) {
+            fetch(`/tts/${playlist.id}`)
+                .then(response => response.json())
+                .then(job => {
+                    if (ttsPlaylist !== playlist || !job.clips) return;
+                    playlist.clips = job.clips;
+                    // Start the first clip as soon as it is ready; later ones follow on 'ended'
+                    if (playlist.next === 0 || ttsPlayer.ended) {
+                        advancePlaylist(true);
+                    }
+                    if (job.status === 'pending' || playlist.next < playlist.clips.length) {
+                        setTimeout(() => pollPlaylist(playlist), 400);
+                    }
+                })
+                .catch(error => console.error('TTS error:', error));
+        }
+        
+        ttsPlayer.addEventListener('ended', () => advancePlaylist(true));
+        
+        // Load narration audio: a single clip, or a background TTS playlist
+        function loadTts(data) {
+            if (data.audio_url) {
+                ttsPlaylist = null;
+                playClip(data.audio_url, true);
+            } else if (data.tts_job && (!ttsPlaylist || ttsPlaylist.id !== data.tts_job)) {
+                ttsPlaylist = { id: data.tts_job, clips: [], next: 0 };
+                pollPlaylist(ttsPlaylist);
+            }
+        }
+        
+        // Show the result of a finished turn
+        function showTurnResult(data, messageText) {
+            if (data.status === 'success') {
+                // Add DM response
+                if (messageText) {
+                    messageText.textContent = data.message;
+                } else {
+                    addMessage('dm', data.message);
+                }
+                
+                // Update consequence display
+                consequenceText.textContent = data.consequence;
+                
+                // Update world state
+                if (data.world_version !== undefined) {
+                    worldVersion = data.world_version;
+                }
+                if (data.world_state) {
+                    worldStateContent.innerHTML = data.world_state.replace(/\n/g, '<br>');
+                }
+                
+                // Play TTS if available
+                loadTts(data);
+            } else {
+                addMessage('system', data.message || 'Error processing command');
+            }
+        }
+        
+        // Stream the narration for a regular command as it is generated
+        function streamCommand(command) {
+            const messageText = addMessage('dm', '');
+            let narration = '';
+            let turnId = null;
+            
+            fetch('/command/stream', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/x-www-form-urlencoded',
+                },
+                body: `command=${encodeURIComponent(command)}`
+            })
+            .then(response => {
+                const contentType = response.headers.get('Content-Type') || '';
+                if (!contentType.startsWith('text/event-stream')) {
+                    return response.json().then(data => { throw data; });
+                }
+                return readEventStream(response, (eventName, data) => {
+                    if (eventName === 'token') {
+                        narration += data.text;
+                        messageText.textContent = narration;
+                        conversationDiv.scrollTop = conversationDiv.scrollHeight;
+                    } else if (eventName === 'queued') {
+                        messageText.textContent = `The Dungeon Master is busy with other players... (position ${data.position} in queue)`;
+                    } else if (eventName === 'busy') {
+                        throw data;
+                    } else if (eventName === 'start') {
+                        // Narration audio starts while the rest of the reply streams
+                        loadTts(data);
+                    } else if (eventName === 'done') {
+                        turnId = data.turn_id;
+                    }
+                });
+            })
+            .then(() => fetch('/command/stream/finish', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/x-www-form-urlencoded',
+                },
+                body: `turn_id=${encodeURIComponent(turnId || '')}&world_version=${worldVersion}`
+            }))
+            .then(response => response.json())
+            .then(data => showTurnResult(data, messageText))
+            .catch(error => {
+                messageText.parentElement.remove();
+                addMessage('system', (error && error.message) || 'Error processing command');
+                console.error('Error:', error);
+            });
+        }
+        
         // Submit command
         function submitCommand() {
             const command = commandInput.value.trim();
@@ -80,38 +244,22 @@ document.addEventListener('DOMContentLoaded', function() {
             // Add player message to conversation
             addMessage('player', command);
             
+            // Regular actions stream; special and create commands answer at once
+            if (!command.startsWith('/') && !command.toLowerCase().startsWith('create ')) {
+                streamCommand(command);
+                return;
+            }
+            
             // Send command to server
             fetch('/command', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/x-www-form-urlencoded',
                 },
-                body: `command=${encodeURIComponent(command)}`
+                body: `command=${encodeURIComponent(command)}&world_version=${worldVersion}`
             })
             .then(response => response.json())
-            .then(data => {
-                if (data.status === 'success') {
-                    // Add DM response
-                    addMessage('dm', data.message);
-                    
-                    // Update consequence display
-                    consequenceText.textContent = data.consequence;
-                    
-                    // Update world state
-                    if (data.world_state) {
-                        worldStateContent.innerHTML = data.world_state.replace(/\n/g, '<br>');
-                    }
-                    
-                    // Play TTS if available
-                    if (data.audio_url) {
-                        ttsPlayer.src = data.audio_url;
-                        ttsPlayer.classList.remove('hidden');
-                        ttsPlayer.play();
-                    }
-                } else {
-                    addMessage('system', data.message || 'Error processing command');
-                }
-            })
+            .then(data => showTurnResult(data))
             .catch(error => {
                 addMessage('system', 'Error processing command');
                 console.error('Error:', error);
@@ -163,6 +311,7 @@ document.addEventListener('DOMContentLoaded', function() {
             
             // Scroll to bottom
             conversationDiv.scrollTop = conversationDiv.scrollHeight;
+            return textDiv;
         }
         
         // Button handlers
@@ -199,11 +348,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     addMessage('dm', data.message);
                     
                     // Play TTS if available
-                    if (data.audio_url) {
-                        ttsPlayer.src = data.audio_url;
-                        ttsPlayer.classList.remove('hidden');
-                        ttsPlayer.play();
-                    }
+                    loadTts(data);
                 } else {
                     addMessage('system', data.message);
                 }
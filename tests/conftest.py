@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app reads its configuration at import: keep its files out of the tree and its backends offline
+WORKDIR = tempfile.mkdtemp(prefix="rpg-tests-")
+os.environ.update({
+    "LOG_FILE": os.path.join(WORKDIR, "test.log"),
+    "JOURNAL_DIR": os.path.join(WORKDIR, "journals"),
+    "TTS_CACHE_MAX_MB": "0",
+    "OLLAMA_URLS": "http://127.0.0.1:9",
+    "TTS_API_URL": "http://127.0.0.1:9/api/tts-generate",
+    "SESSION_BACKEND": "memory",
+    "OPENING_POOL_SIZE": "0",
+    "REDO_SPARES": "0",
+})
+
+
+@pytest.fixture
+def webui(monkeypatch):
+    import app
+    # Ollama counts as up; tests replace get_ai_response with canned replies
+    monkeypatch.setattr(app.OLLAMA_POOL, "is_open", lambda: False)
+    return app
+
+
+@pytest.fixture
+def client(webui):
+    client = webui.app.test_client()
+    client.get("/")
+    return client
@@ -0,0 +1,92 @@
+import threading
+
+OPENING = "The gates burn as the siege begins. A guard joins you."
+FAILURE = "AI failed to respond after multiple attempts."
+
+
+def start_adventure(client, webui, monkeypatch):
+    monkeypatch.setattr(webui, "get_ai_response", lambda *args, **kwargs: OPENING)
+    response = client.post("/setup", data={"genre": "1", "role": "Knight", "character_name": "Alex"})
+    assert response.get_json()["status"] == "success"
+
+
+def test_failed_reply_is_replaced_by_the_fallback(client, webui, monkeypatch):
+    start_adventure(client, webui, monkeypatch)
+    for failure in (FAILURE, "No AI model selected. Please choose a model first."):
+        monkeypatch.setattr(webui, "get_ai_response", lambda *args, failure=failure, **kwargs: failure)
+        data = client.post("/command", data={"command": "I open the gate"}).get_json()
+        assert data["status"] == "success"
+        assert data["message"] != failure
+        with client.session_transaction() as session:
+            assert failure not in session["conversation"]
+            assert session["last_ai_reply"] == data["message"]
+
+
+def test_unfinished_stream_can_be_finished_later(client, webui, monkeypatch):
+    start_adventure(client, webui, monkeypatch)
+    turn_id = webui.register_stream("command", user_input="I wait", formatted_input="Player: I wait")
+    with client.session_transaction() as session:
+        session["pending_stream"] = turn_id
+
+    response = client.post("/command/stream/finish", data={"turn_id": turn_id})
+    assert response.status_code == 409
+    with client.session_transaction() as session:
+        assert session["pending_stream"] == turn_id
+
+    with webui.PENDING_STREAMS_LOCK:
+        webui.PENDING_STREAMS[turn_id].update(text="The rain stops. A guard joins you.", done=True)
+    data = client.post("/command/stream/finish", data={"turn_id": turn_id}).get_json()
+    assert data["status"] == "success"
+    assert data["message"].startswith("The rain stops.")
+    assert turn_id not in webui.PENDING_STREAMS
+    assert client.post("/command/stream/finish", data={"turn_id": turn_id}).status_code == 400
+
+
+def test_log_followers_are_capped(client, webui, monkeypatch):
+    monkeypatch.setattr(webui, "LOG_FOLLOWERS", threading.BoundedSemaphore(1))
+    first = client.get("/logs?follow=1", buffered=False)
+    assert first.status_code == 200
+    assert client.get("/logs?follow=1").status_code == 429
+    first.close()
+    second = client.get("/logs?follow=1", buffered=False)
+    assert second.status_code == 200
+    second.close()
+
+
+def test_prompt_prefix_is_stable_past_the_budget(client, webui, monkeypatch):
+    start_adventure(client, webui, monkeypatch)
+    monkeypatch.setattr(webui, "KV_CONTEXT_REUSE", False)
+    monkeypatch.setattr(webui, "get_context_tokens", lambda model: 1600)
+    prompts = []
+
+    def reply(prompt, *args, **kwargs):
+        prompts.append(prompt)
+        return f"The road bends at marker {len(prompts)}. A guard joins you."
+
+    monkeypatch.setattr(webui, "get_ai_response", reply)
+    trims = []
+    for turn in range(60):
+        assert client.post("/command", data={"command": f"I take step {turn}"}).status_code == 200
+        with client.session_transaction() as session:
+            if session["prompt_usage"]["turns_trimmed"]:
+                trims.append(turn)
+    assert len(trims) > 1
+
+    # Between trims each prompt extends the previous one's prefix byte for byte
+    for turn, (previous, prompt) in enumerate(zip(prompts, prompts[1:]), 1):
+        if turn not in trims:
+            assert prompt.startswith(previous[:previous.index("Current World State:")])
+    assert min(later - earlier for earlier, later in zip(trims, trims[1:])) >= 5
+
+
+def test_journal_only_loads_in_the_session_that_started_it(client, webui, monkeypatch):
+    start_adventure(client, webui, monkeypatch)
+    with client.session_transaction() as session:
+        journal_id = session["journal_id"]
+    assert client.post("/command", data={"command": f"/load {journal_id}"}).get_json()["status"] == "success"
+
+    other = webui.app.test_client()
+    other.get("/")
+    start_adventure(other, webui, monkeypatch)
+    data = other.post("/command", data={"command": f"/load {journal_id}"}).get_json()
+    assert data["status"] == "error"
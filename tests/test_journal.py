@@ -0,0 +1,25 @@
+from journal import AdventureJournal
+
+
+def state(conversation, **choices):
+    return {"conversation": conversation, "character_name": "Alex", "player_choices": choices}
+
+
+def test_turns_and_rewritten_endings_load_back(tmp_path):
+    journal = AdventureJournal(str(tmp_path), snapshot_every=50)
+    journal_id = journal.create(state("The gates burn."), owner="player")
+    journal.record(journal_id, state("The gates burn. A guard joins you.", allies=["guard"]))
+    # /redo rewrites the last reply
+    journal.record(journal_id, state("The gates burn. A wolf howls.", allies=["guard"]))
+    journal.record(journal_id, state("The gates burn. A wolf howls. Rain falls."))
+
+    assert journal.load(journal_id) == state("The gates burn. A wolf howls. Rain falls.")
+    assert journal.info(journal_id)["owner"] == "player"
+    assert journal.info(journal_id)["records"] == 4
+
+
+def test_index_keeps_no_conversation_text(tmp_path):
+    journal = AdventureJournal(str(tmp_path))
+    journal_id = journal.create(state("The gates burn. " * 100))
+    journal.record(journal_id, state("The gates burn. " * 101))
+    assert "The gates burn." not in repr(journal._last[journal_id])
@@ -0,0 +1,25 @@
+import pytest
+
+from llm_scheduler import LLMScheduler, SchedulerBusy
+
+
+def test_single_slot_refuses_background_work():
+    scheduler = LLMScheduler(max_concurrent=1)
+    with pytest.raises(SchedulerBusy):
+        scheduler.enqueue("spare", background=True)
+    player = scheduler.enqueue("player")
+    assert player.granted
+    assert scheduler.stats()["background_active"] == 0
+
+
+def test_background_keeps_the_last_slot_free():
+    scheduler = LLMScheduler(max_concurrent=2)
+    spare = scheduler.enqueue("spare", background=True)
+    assert spare.granted
+    second = scheduler.enqueue("spare2", background=True)
+    assert not second.granted
+    player = scheduler.enqueue("player")
+    assert player.granted
+    spare.release()
+    player.release()
+    assert second.granted
@@ -0,0 +1,59 @@
+from prompt_builder import OMITTED_MARKER, build_prompt, estimate_tokens
+
+SYSTEM = "You are the Dungeon Master of a fantasy adventure. " * 4
+SETTING = "### Adventure Setting ###\nGenre: Fantasy\n"
+BUDGET = 800
+
+
+def play(turns, budget=BUDGET, pinned_turns=4):
+    """Build one prompt per turn the way the app does, carrying the cut from turn to turn"""
+    conversation = SETTING + "\n\nDungeon Master: The gates burn."
+    cut = 0
+    prompts = []
+    for turn in range(turns):
+        tail = f"Player: I take step {turn}\nDungeon Master:"
+        state = f"Current World State:\nTurn {turn}"
+        prompt, usage = build_prompt(SYSTEM, conversation, tail, budget, pinned_turns, state=state, cut=cut)
+        cut = usage["cut"]
+        prompts.append((prompt, usage))
+        conversation += f"\nPlayer: I take step {turn}\nDungeon Master: The road bends at marker {turn}. A guard joins you."
+    return prompts
+
+
+def stable_prefix(prompt):
+    return prompt[:prompt.index("Current World State:")]
+
+
+def test_prompt_stays_within_budget_past_the_limit():
+    for prompt, usage in play(300):
+        assert estimate_tokens(prompt) <= BUDGET
+        assert usage["total"] <= BUDGET
+
+
+def test_prefix_only_changes_when_a_block_is_trimmed():
+    prompts = play(300)
+    trims = []
+    for turn, ((previous, _), (prompt, usage)) in enumerate(zip(prompts, prompts[1:]), 1):
+        if usage["turns_trimmed"]:
+            trims.append(turn)
+            continue
+        assert prompt.startswith(stable_prefix(previous))
+    # Each trim frees a quarter of the budget, so trims are many turns apart
+    assert len(trims) > 1
+    assert min(later - earlier for earlier, later in zip(trims, trims[1:])) >= 5
+
+
+def test_trim_keeps_setting_marker_and_pinned_turns():
+    prompt, usage = play(300)[-1]
+    assert usage["turns_dropped"] == usage["cut"] > 0
+    assert prompt.startswith(SYSTEM + "\n\n" + SETTING)
+    assert OMITTED_MARKER in prompt
+    assert "I take step 298" in prompt
+    assert usage["turns_kept"] >= 4
+
+
+def test_cut_is_clamped_to_a_shorter_conversation():
+    conversation = SETTING + "\n\nDungeon Master: The gates burn.\nPlayer: I wait\nDungeon Master: Nothing happens."
+    prompt, usage = build_prompt(SYSTEM, conversation, "Dungeon Master:", BUDGET, pinned_turns=1, cut=50)
+    assert usage["cut"] == 1
+    assert "Nothing happens." in prompt
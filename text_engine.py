@@ -0,0 +1,70 @@
+import re
+
+
+def trie_pattern(words):
+    """Build a regex alternation from a character trie of the given words.
+
+    Shared prefixes are matched once, so the regex engine does not retry
+    every word at every position the way a flat "a|b|c" alternation does.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    return _node_pattern(trie)
+
+
+def _node_pattern(node):
+    ends_here = '' in node
+    branches = [re.escape(char) + _node_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if ends_here:
+        # Greedy, so the longest word wins and shorter ones are tried on backtrack
+        body = '(?:' + body + ')?'
+    return body
+
+
+class TextEngine:
+    """Precompiled matcher for banned words, key phrases and narrative triggers.
+
+    Built once from the word lists. Banned words are masked by one trie regex
+    (whole words only); where banned phrases overlap, the longest one is
+    masked as a whole. Key phrases keep the old substring semantics and are
+    checked against a single lowercased copy of the reply, which is faster in
+    CPython than any regex over the same phrases.
+    """
+
+    def __init__(self, banwords, key_phrases, triggers):
+        phrase_categories = {}
+        for category, phrases in key_phrases.items():
+            for phrase in phrases:
+                phrase_categories.setdefault(phrase.lower(), []).append(category)
+        self.phrase_categories = list(phrase_categories.items())
+
+        banwords = sorted({word.lower() for word in banwords if word})
+        self.ban_pattern = re.compile(r'\b' + trie_pattern(banwords) + r'\b', re.IGNORECASE) if banwords else None
+        triggers = sorted({trigger.lower() for trigger in triggers})
+        self.trigger_pattern = re.compile(trie_pattern(triggers), re.IGNORECASE) if triggers else None
+
+    def censor(self, text):
+        """Mask banned words"""
+        if self.ban_pattern is None:
+            return text
+        return self.ban_pattern.sub('****', text)
+
+    def detect_categories(self, text):
+        """Return the set of key-phrase categories mentioned in the text"""
+        lowered = text.lower()
+        return {
+            category
+            for phrase, categories in self.phrase_categories if phrase in lowered
+            for category in categories
+        }
+
+    def match_trigger(self, text):
+        """True if the text starts with a narrative trigger"""
+        return bool(self.trigger_pattern and self.trigger_pattern.match(text))
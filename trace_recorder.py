@@ -0,0 +1,95 @@
+import atexit
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+
+
+class TraceRecorder:
+    """Opt-in capture of what players send, for replaying real traffic later.
+
+    Each recorded request is one JSON line: seconds since the recorder
+    started ("t"), an anonymized session id ("s"), the path ("p") and the
+    form fields ("f"). Lines go to a gzip file that is flushed after every
+    record, so a crash loses at most the record being written. The first
+    line is a header holding the wall-clock start time. Write one file per
+    run: session ids are salted per recorder, and a file that was not
+    closed cleanly can't be appended to.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._salt = os.urandom(8)
+        self._started = time.time()
+        self._records = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._write({"trace": 1, "started": self._started})
+        atexit.register(self.close)
+
+    def record(self, session_id, path, form):
+        entry = {
+            "t": round(time.time() - self._started, 3),
+            "s": hashlib.blake2b(session_id.encode('utf-8'), digest_size=5, key=self._salt).hexdigest(),
+            "p": path,
+            "f": form
+        }
+        with self._lock:
+            self._write(entry)
+            self._records += 1
+
+    def stats(self):
+        with self._lock:
+            return {"path": self.path, "records": self._records}
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + "\n")
+        self._file.flush()
+
+
+def read_trace(*paths):
+    """Every recorded request of the trace files as dicts with an absolute "time", oldest first.
+
+    A file whose recorder was killed ends without a gzip trailer; it is
+    read up to its last flushed record.
+    """
+    events = []
+    for path in paths:
+        events.extend(read_trace_file(path))
+    events.sort(key=lambda entry: entry["time"])
+    return events
+
+
+def read_trace_file(path):
+    events = []
+    started = 0.0
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logging.warning(f"Skipping unreadable trace line in {path}")
+                    continue
+                if "trace" in entry:
+                    started = entry["started"]
+                    continue
+                entry["time"] = started + entry["t"]
+                events.append(entry)
+    except EOFError:
+        logging.info(f"Trace {path} was not closed cleanly; read {len(events)} records")
+    except (zlib.error, gzip.BadGzipFile) as e:
+        logging.warning(f"Trace {path} is damaged after {len(events)} records: {e}")
+    return events
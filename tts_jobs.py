@@ -0,0 +1,102 @@
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Playlist:
+    """Ordered TTS clips for one reply, synthesized as its sentences arrive"""
+
+    def __init__(self, synthesize, parallel):
+        self.synthesize = synthesize
+        self.parallel = parallel
+        self.clips = []  # one {"status", "audio_url"} per chunk, in reply order
+        self.queued = deque()
+        self.in_flight = 0
+        self.closed = False
+        self.created = time.time()
+
+    def finished(self):
+        return self.closed and not self.queued and self.in_flight == 0
+
+
+class TTSJobQueue:
+    """Runs TTS synthesis on a worker pool, one playlist of clips per reply.
+
+    Each playlist synthesizes at most `parallel` clips at a time so one long
+    reply can't occupy every worker; clips are queued in reply order.
+    """
+
+    def __init__(self, workers=2, parallel=2, ttl=600):
+        self.parallel = parallel
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts")
+        self._playlists = {}
+        self._lock = threading.Lock()
+
+    def create(self, func, *args):
+        """Start an empty playlist whose clips are made by func(text, *args)"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            # Forget playlists nobody asked about in time
+            expired = [key for key, playlist in self._playlists.items() if now - playlist.created > self.ttl]
+            for key in expired:
+                del self._playlists[key]
+            self._playlists[job_id] = Playlist(lambda text: func(text, *args), self.parallel)
+        return job_id
+
+    def add(self, job_id, text):
+        """Queue the next chunk of text for a playlist"""
+        if not text.strip():
+            return
+        with self._lock:
+            playlist = self._playlists.get(job_id)
+            if playlist is None or playlist.closed:
+                return
+            playlist.clips.append({"status": "pending", "audio_url": None})
+            playlist.queued.append((len(playlist.clips) - 1, text))
+            self._pump(playlist)
+
+    def close(self, job_id):
+        """Mark a playlist complete; no more clips will be added"""
+        with self._lock:
+            playlist = self._playlists.get(job_id)
+            if playlist is not None:
+                playlist.closed = True
+
+    def status(self, job_id):
+        """Return the playlist state as a dict, or None for an unknown job"""
+        with self._lock:
+            playlist = self._playlists.get(job_id)
+            if playlist is None:
+                return None
+            return {
+                "status": "done" if playlist.finished() else "pending",
+                "clips": [dict(clip) for clip in playlist.clips]
+            }
+
+    def pending(self):
+        """Number of playlists still synthesizing or open"""
+        with self._lock:
+            return sum(1 for playlist in self._playlists.values() if not playlist.finished())
+
+    def _pump(self, playlist):
+        # Called with the lock held
+        while playlist.queued and playlist.in_flight < playlist.parallel:
+            index, text = playlist.queued.popleft()
+            playlist.in_flight += 1
+            self._executor.submit(self._run, playlist, index, text)
+
+    def _run(self, playlist, index, text):
+        try:
+            audio_url = playlist.synthesize(text)
+        except Exception as e:
+            logging.error(f"TTS clip failed: {e}")
+            audio_url = None
+        with self._lock:
+            playlist.clips[index] = {"status": "done" if audio_url else "error", "audio_url": audio_url}
+            playlist.in_flight -= 1
+            self._pump(playlist)
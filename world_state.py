@@ -0,0 +1,230 @@
+import struct
+import time
+from collections import deque
+from itertools import islice
+
+MAX_ENTRIES = 50  # allies, enemies, discoveries, quests, resources and factions
+MAX_EVENTS = 20
+MAX_RECENT = 5  # consequences and player creations
+
+FORMAT_VERSION = 1
+HEAD = struct.Struct(">Bi")  # format version, reputation
+
+NAME_LISTS = ("allies", "enemies", "discoveries", "active_quests", "completed_quests", "player_creations")
+COUNTERS = ("resources", "factions")
+TIMED_LISTS = ("world_events", "consequences")
+
+CREATE_TYPES = {
+    "npc": ("allies", "NPC"),
+    "character": ("allies", "NPC"),
+    "ally": ("allies", "NPC"),
+    "location": ("discoveries", "Location"),
+    "place": ("discoveries", "Location"),
+    "item": ("resources", "Item"),
+    "object": ("resources", "Item"),
+    "artifact": ("resources", "Item"),
+    "faction": ("factions", "Faction"),
+    "group": ("factions", "Faction"),
+}
+
+
+class WorldState:
+    """A character's persistent world: allies, quests, resources, recent events.
+
+    Every collection is bounded: name lists keep their last MAX_ENTRIES
+    names, counters their MAX_ENTRIES most recently added keys, world events
+    the last MAX_EVENTS and consequences and creations the last MAX_RECENT.
+    Events and consequences are (unix time, text) pairs; the clock time is
+    only formatted when rendering. to_bytes() is a compact binary encoding
+    for session storage; to_dict() is the JSON form used by journals.
+    """
+
+    __slots__ = ("reputation",) + NAME_LISTS + COUNTERS + TIMED_LISTS
+
+    def __init__(self):
+        self.reputation = 0
+        self.allies = deque(maxlen=MAX_ENTRIES)
+        self.enemies = deque(maxlen=MAX_ENTRIES)
+        self.discoveries = deque(maxlen=MAX_ENTRIES)
+        self.active_quests = deque(maxlen=MAX_ENTRIES)
+        self.completed_quests = deque(maxlen=MAX_ENTRIES)
+        self.player_creations = deque(maxlen=MAX_RECENT)
+        self.resources = {}
+        self.factions = {}
+        self.world_events = deque(maxlen=MAX_EVENTS)
+        self.consequences = deque(maxlen=MAX_RECENT)
+
+    def record_consequence(self, text, stamp=None):
+        """Remember what an action led to; stamp=0 leaves the entry without a clock time"""
+        self.consequences.append((int(time.time()) if stamp is None else stamp, text))
+
+    def record_event(self, text, stamp=None):
+        self.world_events.append((int(time.time()) if stamp is None else stamp, text))
+
+    def create(self, entity_type, name):
+        """Add a player-created entity (`create npc Bob`); False for an unknown type"""
+        target = CREATE_TYPES.get(entity_type)
+        if target is None:
+            return False
+        field, label = target
+        if field in COUNTERS:
+            set_counter(getattr(self, field), name, 1 if field == "resources" else 0)
+        else:
+            getattr(self, field).append(name)
+        self.player_creations.append(f"{name} ({label})")
+        return True
+
+    def consequence_lines(self):
+        return [format_timed(stamp, text, "[{}] ") for stamp, text in self.consequences]
+
+    def render(self):
+        """Text block shown to the player and sent to the model"""
+        state = [
+            "### Current World State ###",
+            f"Allies: {', '.join(self.allies) if self.allies else 'None'}",
+            f"Enemies: {', '.join(self.enemies) if self.enemies else 'None'}",
+            f"Reputation: {self.reputation}",
+            f"Active Quests: {', '.join(self.active_quests) if self.active_quests else 'None'}",
+            f"Completed Quests: {', '.join(self.completed_quests) if self.completed_quests else 'None'}",
+        ]
+
+        if self.resources:
+            state.append("Resources:")
+            state.extend(f"  - {resource}: {amount}" for resource, amount in self.resources.items())
+
+        if self.factions:
+            state.append("Faction Relationships:")
+            state.extend(f"  - {faction}: {'+' if level > 0 else ''}{level}" for faction, level in self.factions.items())
+
+        if self.world_events:
+            state.append("Recent World Events:")
+            state.extend(f"  - {format_timed(stamp, text, '{}: ')}" for stamp, text in recent(self.world_events, 3))
+
+        if self.consequences:
+            state.append("Recent Consequences:")
+            state.extend(f"  - {format_timed(stamp, text, '[{}] ')}" for stamp, text in recent(self.consequences, 3))
+
+        if self.player_creations:
+            state.append("Player Creations:")
+            state.extend(f"  - {creation}" for creation in recent(self.player_creations, 3))
+
+        return "\n".join(state)
+
+    def to_dict(self):
+        data = {"reputation": self.reputation}
+        for field in NAME_LISTS:
+            data[field] = list(getattr(self, field))
+        for field in COUNTERS:
+            data[field] = dict(getattr(self, field))
+        for field in TIMED_LISTS:
+            data[field] = [list(entry) for entry in getattr(self, field)]
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build from to_dict() output, or from the old free-form player_choices dict"""
+        world = cls()
+        world.reputation = int(data.get("reputation") or 0)
+        for field in NAME_LISTS:
+            getattr(world, field).extend(data.get(field) or [])
+        for field in COUNTERS:
+            counter = getattr(world, field)
+            for name, value in (data.get(field) or {}).items():
+                set_counter(counter, name, int(value))
+        for field in TIMED_LISTS:
+            # Old dicts hold preformatted strings; keep them as untimed text
+            getattr(world, field).extend(
+                (0, entry) if isinstance(entry, str) else (int(entry[0]), entry[1])
+                for entry in data.get(field) or []
+            )
+        return world
+
+    def to_bytes(self):
+        """Binary form: header, entry counts, counter values, timestamps, string lengths, one UTF-8 blob"""
+        counts = []
+        numbers = []
+        stamps = []
+        strings = []
+        for field in NAME_LISTS:
+            values = getattr(self, field)
+            counts.append(len(values))
+            strings.extend(values)
+        for field in COUNTERS:
+            counter = getattr(self, field)
+            counts.append(len(counter))
+            strings.extend(counter)
+            numbers.extend(counter.values())
+        for field in TIMED_LISTS:
+            entries = getattr(self, field)
+            counts.append(len(entries))
+            for stamp, text in entries:
+                stamps.append(stamp)
+                strings.append(text)
+        return b"".join((
+            HEAD.pack(FORMAT_VERSION, self.reputation),
+            struct.pack(f">{len(counts)}H", *counts),
+            struct.pack(f">{len(numbers)}i{len(stamps)}I{len(strings)}I", *numbers, *stamps, *map(len, strings)),
+            "".join(strings).encode("utf-8")
+        ))
+
+    @classmethod
+    def from_bytes(cls, data):
+        version, reputation = HEAD.unpack_from(data, 0)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unknown world state format {version}")
+        offset = HEAD.size
+        fields = NAME_LISTS + COUNTERS + TIMED_LISTS
+        counts = struct.unpack_from(f">{len(fields)}H", data, offset)
+        offset += 2 * len(fields)
+
+        by_field = dict(zip(fields, counts))
+        total_numbers = sum(by_field[field] for field in COUNTERS)
+        total_stamps = sum(by_field[field] for field in TIMED_LISTS)
+        total_strings = sum(counts)
+        layout = f">{total_numbers}i{total_stamps}I{total_strings}I"
+        values = struct.unpack_from(layout, data, offset)
+        offset += struct.calcsize(layout)
+        numbers = iter(values[:total_numbers])
+        stamps = iter(values[total_numbers:total_numbers + total_stamps])
+
+        # Strings are sliced out of one decoded blob by their character lengths
+        text = data[offset:].decode("utf-8")
+        strings = []
+        start = 0
+        for length in values[total_numbers + total_stamps:]:
+            strings.append(text[start:start + length])
+            start += length
+        strings = iter(strings)
+
+        world = cls()
+        world.reputation = reputation
+        for field in NAME_LISTS:
+            getattr(world, field).extend(islice(strings, by_field[field]))
+        for field in COUNTERS:
+            counter = getattr(world, field)
+            for _ in range(by_field[field]):
+                counter[next(strings)] = next(numbers)
+        for field in TIMED_LISTS:
+            getattr(world, field).extend(zip(islice(stamps, by_field[field]), strings))
+        return world
+
+    def __eq__(self, other):
+        return isinstance(other, WorldState) and self.to_dict() == other.to_dict()
+
+
+def set_counter(counter, name, value):
+    """Set a bounded counter entry, dropping the oldest key past MAX_ENTRIES"""
+    counter.pop(name, None)
+    counter[name] = value
+    while len(counter) > MAX_ENTRIES:
+        del counter[next(iter(counter))]
+
+
+def recent(values, count):
+    return list(values)[-count:]
+
+
+def format_timed(stamp, text, prefix):
+    if not stamp:
+        return text
+    return prefix.format(time.strftime("%H:%M:%S", time.localtime(stamp))) + text